@@ -1,14 +1,34 @@
 import os
 import ssl
+import click
 from flask import Flask
 from flask_cors import CORS
 from pathlib import Path
 from dotenv import load_dotenv
-from database import get_connection
+from database import get_connection, get_pool_stats
 
 # Importar configuraciones y utilidades
 from config import Config
 from utils.json_encoder import CustomJSONProvider
+from utils.datetime_utils import get_current_datetime
+from utils.admin_cache import get_admin_cache_stats
+from utils.instrumentacion import instalar_instrumentacion
+from utils.metricas import instalar_metricas
+from utils.horas_ledger import DDL_HORAS_DIARIAS, reconstruir_ledger
+from utils.door_client import get_door_client, door_configured
+from utils.presence import ensure_presence_tables, reconciliar_presencia, TIPO_AYUDANTE, TIPO_ESTUDIANTE
+from utils.eventos import ensure_eventos_table
+from utils.escaneos import ensure_escaneos_table
+from utils.cumplimiento_semana import (
+    ensure_cumplimiento_semana_table, semana_materializada, materializar_semana
+)
+from utils.explain_check import verificar_indices
+from utils.datos_sinteticos import generar_datos, limpiar_datos_sinteticos
+from utils.cumplimiento_reportes import backfill_historial
+from utils.retencion import (
+    TABLAS_RETENCION, ensure_archivo_tables, crear_vistas, particionar_tabla, crear_particiones_futuras,
+    archivar_semestre, semestres_vencidos
+)
 
 # Importar blueprints de rutas
 from routes.auth import auth_bp
@@ -19,6 +39,9 @@ from routes.cumplimiento import cumplimiento_bp
 from routes.horas import horas_bp
 from routes.estado import estado_bp
 from routes.lector import lector_bp
+from routes.eventos import eventos_bp
+from routes.exportar import exportar_bp
+from routes.metricas import metricas_bp
 
 # Importar nuevos blueprints de estudiantes
 from routes.estudiantes import estudiantes_bp
@@ -26,7 +49,9 @@ from routes.qr import qr_bp
 from routes.registros_estudiantes import registros_estudiantes_bp
 
 # Importar tareas programadas
-from tasks.scheduled_tasks import configurar_tarea_cierre_diario, configurar_reinicio_semanal
+from tasks.scheduled_tasks import (
+    iniciar_tareas_programadas, ejecutar_tarea, ensure_tareas_ejecuciones_table, TAREAS
+)
 
 # Cargar variables de entorno (.env si existe, si no .env.example)
 base_path = Path(__file__).parent
@@ -56,6 +81,11 @@ def create_app():
     # Configurar JSON encoder personalizado
     app.json_provider_class = CustomJSONProvider
     app.json = CustomJSONProvider(app)
+
+    # Consultas por petición (Server-Timing y detector de N+1)
+    instalar_instrumentacion(app)
+    # Métricas Prometheus (/api/metrics)
+    instalar_metricas(app)
     
     # Registrar blueprints
     app.register_blueprint(auth_bp, url_prefix='/api')
@@ -66,13 +96,27 @@ def create_app():
     app.register_blueprint(horas_bp, url_prefix='/api')
     app.register_blueprint(estado_bp, url_prefix='/api')
     app.register_blueprint(lector_bp, url_prefix='/api')
+    app.register_blueprint(eventos_bp, url_prefix='/api')
+    app.register_blueprint(exportar_bp, url_prefix='/api')
+    app.register_blueprint(metricas_bp, url_prefix='/api')
     ensure_estado_table()
+    ensure_horas_table()
+    ensure_presencia()
+    ensure_eventos()
+    ensure_escaneos()
+    ensure_cumplimiento_semana()
+    ensure_tareas_ejecuciones()
+    ensure_archivo_registros()
 
     # Registrar blueprints de estudiantes
     app.register_blueprint(estudiantes_bp, url_prefix='/api/estudiantes')
     app.register_blueprint(qr_bp, url_prefix='/api')
     app.register_blueprint(registros_estudiantes_bp, url_prefix='/api/estudiantes')
 
+    # Abrir la conexión persistente con la puerta al iniciar el worker
+    if door_configured():
+        get_door_client().start()
+
     # Health check endpoint
     @app.route('/api/health')
     def health_check():
@@ -81,9 +125,165 @@ def create_app():
             'status': 'OK',
             'timestamp': datetime.now().isoformat(),
             'message': 'API unificada funcionando correctamente',
-            'services': ['ayudantes', 'estudiantes', 'qr', 'registros']
+            'services': ['ayudantes', 'estudiantes', 'qr', 'registros'],
+            'db_pool': get_pool_stats(),
+            'admin_cache': get_admin_cache_stats()
         }
     
+    @app.cli.command('reconstruir-horas')
+    @click.option('--email', default=None, help='Reconstruir sólo este usuario')
+    def reconstruir_horas_command(email):
+        """Recalcula el libro horas_diarias desde el historial de registros"""
+        conn = get_connection()
+        try:
+            filas = reconstruir_ledger(conn, email=email)
+        finally:
+            conn.close()
+        click.echo(f"Libro de horas reconstruido: {filas} filas")
+
+    @app.cli.command('materializar-cumplimiento')
+    def materializar_cumplimiento_command():
+        """Reconstruye cumplimiento_semana para la semana actual"""
+        conn = get_connection()
+        try:
+            bloques = materializar_semana(conn)
+        finally:
+            conn.close()
+        click.echo(f"Cumplimiento materializado: {bloques} bloques")
+
+    @app.cli.command('backfill-cumplimiento')
+    @click.option('--desde', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Primer día (YYYY-MM-DD)')
+    @click.option('--hasta', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Último día (YYYY-MM-DD)')
+    @click.option('--email', 'emails', multiple=True, help='Limitar a estos ayudantes (repetible)')
+    @click.option('--procesos', default=os.cpu_count() or 1, show_default=True,
+                  help='Procesos para evaluar usuarios en paralelo')
+    def backfill_cumplimiento_command(desde, hasta, emails, procesos):
+        """Reconstruye historial_cumplimiento de semanas pasadas desde los registros"""
+        conn = get_connection()
+        try:
+            resultado = backfill_historial(
+                conn, desde.date(), hasta.date(), emails=list(emails) or None, procesos=procesos
+            )
+        finally:
+            conn.close()
+        click.echo(f"Historial reconstruido: {resultado['semanas']} semanas, {resultado['filas']} filas")
+
+    @app.cli.command('ejecutar-tarea')
+    @click.argument('nombre', type=click.Choice(sorted(TAREAS)))
+    def ejecutar_tarea_command(nombre):
+        """Ejecuta ahora una tarea programada (con lock e historial, como el scheduler)"""
+        resultado = ejecutar_tarea(nombre, programada=get_current_datetime().replace(microsecond=0))
+        click.echo(f"Tarea {nombre}: {resultado}")
+
+    @app.cli.command('generar-datos')
+    @click.option('--ayudantes', default=40, show_default=True, help='Ayudantes con horario asignado')
+    @click.option('--estudiantes', default=800, show_default=True, help='Estudiantes registrados')
+    @click.option('--dias', default=120, show_default=True, help='Días de historia hasta ayer')
+    @click.option('--asistencia', default=0.9, show_default=True, help='Probabilidad de asistir a un bloque')
+    @click.option('--tasa-visita', default=0.3, show_default=True, help='Visitas diarias por estudiante')
+    @click.option('--semilla', default=1, show_default=True, help='Semilla del generador')
+    @click.option('--limpiar', is_flag=True, help='Eliminar antes los datos sintéticos anteriores')
+    def generar_datos_command(ayudantes, estudiantes, dias, asistencia, tasa_visita, semilla, limpiar):
+        """Genera datos sintéticos (@sintetico.test) para pruebas de carga"""
+        if limpiar:
+            for tabla, filas in limpiar_datos_sinteticos().items():
+                click.echo(f"Eliminadas {filas} filas de {tabla}")
+        insertados = generar_datos(
+            ayudantes=ayudantes, estudiantes=estudiantes, dias=dias,
+            asistencia=asistencia, tasa_visita=tasa_visita, semilla=semilla
+        )
+        for tabla, filas in insertados.items():
+            click.echo(f"Insertadas {filas} filas en {tabla}")
+
+        conn = get_connection()
+        try:
+            click.echo(f"Libro de horas reconstruido: {reconstruir_ledger(conn)} filas")
+            for tipo in (TIPO_AYUDANTE, TIPO_ESTUDIANTE):
+                click.echo(f"Presencia {tipo}: {reconciliar_presencia(conn, tipo)['despues']} dentro")
+        finally:
+            conn.close()
+
+    @app.cli.command('reconciliar-presencia')
+    @click.option('--tipo', type=click.Choice(['ayudantes', 'estudiantes', 'todos']), default='todos',
+                  show_default=True, help='Población a reconciliar')
+    def reconciliar_presencia_command(tipo):
+        """Recalcula el índice de presencia desde los registros del día"""
+        tipos = {
+            'ayudantes': [TIPO_AYUDANTE],
+            'estudiantes': [TIPO_ESTUDIANTE],
+            'todos': [TIPO_AYUDANTE, TIPO_ESTUDIANTE]
+        }[tipo]
+        conn = get_connection()
+        try:
+            for tipo_usuario in tipos:
+                resultado = reconciliar_presencia(conn, tipo_usuario)
+                click.echo(f"Presencia {tipo_usuario}: {resultado['antes']} -> {resultado['despues']} dentro")
+        finally:
+            conn.close()
+
+    @app.cli.command('mantener-particiones')
+    @click.option('--meses', default=None, type=int, help='Meses futuros con partición (por defecto PARTICIONES_MESES_ADELANTE)')
+    @click.option('--convertir', is_flag=True, help='Particionar primero las tablas que aún no lo están (reconstruye la tabla)')
+    def mantener_particiones_command(meses, convertir):
+        """Crea de antemano las particiones mensuales de registros y EST_registros y redefine las vistas históricas"""
+        conn = get_connection()
+        try:
+            for vista in crear_vistas(conn, reemplazar=True):
+                click.echo(f"{vista}: vista actualizada")
+            for tabla in TABLAS_RETENCION:
+                if convertir:
+                    creadas = particionar_tabla(conn, tabla, meses_adelante=meses)
+                    if creadas:
+                        click.echo(f"{tabla}: particionada en {creadas} meses")
+                nuevas = crear_particiones_futuras(conn, tabla, meses_adelante=meses)
+                if nuevas is None:
+                    click.echo(f"{tabla}: sin particionar (use --convertir)")
+                else:
+                    click.echo(f"{tabla}: {len(nuevas)} particiones nuevas {' '.join(nuevas)}".rstrip())
+        finally:
+            conn.close()
+
+    @app.cli.command('archivar-registros')
+    @click.option('--semestre', 'semestres', multiple=True,
+                  help='Semestre cerrado a archivar, AAAA-1 o AAAA-2 (repetible; por defecto los vencidos)')
+    @click.option('--tabla', type=click.Choice(list(TABLAS_RETENCION)), default=None, help='Sólo esta tabla')
+    @click.option('--directorio', default=None, help='Exportar además a CSV gzip (por defecto ARCHIVO_DIR)')
+    def archivar_registros_command(semestres, tabla, directorio):
+        """Mueve semestres cerrados a las tablas de archivo"""
+        directorio = directorio or Config.ARCHIVO_DIR or None
+        conn = get_connection()
+        try:
+            for nombre in ([tabla] if tabla else TABLAS_RETENCION):
+                for etiqueta in (semestres or semestres_vencidos(conn, nombre)):
+                    try:
+                        r = archivar_semestre(conn, nombre, etiqueta, directorio=directorio)
+                    except ValueError as e:
+                        raise click.BadParameter(str(e), param_hint='--semestre')
+                    detalle = f", {len(r['particiones_eliminadas'])} particiones eliminadas" if r['particiones_eliminadas'] else ''
+                    archivo = f", archivo {r['archivo']}" if r['archivo'] else ''
+                    click.echo(f"{nombre} {etiqueta}: {r['filas']} filas archivadas{detalle}{archivo}")
+        finally:
+            conn.close()
+
+    @app.cli.command('verificar-indices')
+    def verificar_indices_command():
+        """Verifica con EXPLAIN que los filtros por fecha usan los índices"""
+        conn = get_connection()
+        try:
+            resultados = verificar_indices(conn)
+        finally:
+            conn.close()
+
+        for r in resultados:
+            estado = 'OK   ' if r['ok'] else 'FALLA'
+            detalle = r.get('error') or f"key={r['key']} partes={r['used_key_parts']} posibles={r['possible_keys']}"
+            if r.get('partitions'):
+                detalle += f" particiones={','.join(r['partitions'])}"
+            click.echo(f"{estado} {r['nombre']}: {detalle}")
+
+        if not all(r['ok'] for r in resultados):
+            raise SystemExit(1)
+
     return app
 
 def ensure_estado_table():
@@ -109,21 +309,95 @@ def ensure_estado_table():
     except Exception as e:
         print(f"ADVERTENCIA: no se pudo asegurar la tabla estado_usuarios: {e}")
 
+def ensure_horas_table():
+    """Crea la tabla horas_diarias si no existe."""
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(DDL_HORAS_DIARIAS)
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar la tabla horas_diarias: {e}")
+
+def ensure_presencia():
+    """Crea e inicializa las tablas del índice de presencia si no existen."""
+    try:
+        conn = get_connection()
+        ensure_presence_tables(conn)
+        conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar el índice de presencia: {e}")
+
+def ensure_eventos():
+    """Crea la tabla de eventos SSE si no existe."""
+    try:
+        conn = get_connection()
+        ensure_eventos_table(conn)
+        conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar la tabla de eventos: {e}")
+
+def ensure_escaneos():
+    """Crea la tabla de antirrebote de escaneos si no existe."""
+    try:
+        conn = get_connection()
+        ensure_escaneos_table(conn)
+        conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar la tabla escaneo_reciente: {e}")
+
+def ensure_cumplimiento_semana():
+    """Crea la tabla cumplimiento_semana y materializa la semana actual si está vacía."""
+    try:
+        conn = get_connection()
+        try:
+            ensure_cumplimiento_semana_table(conn)
+            if not semana_materializada(conn):
+                materializar_semana(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar la tabla cumplimiento_semana: {e}")
+
+def ensure_tareas_ejecuciones():
+    """Crea la tabla del historial de tareas programadas si no existe."""
+    try:
+        conn = get_connection()
+        try:
+            ensure_tareas_ejecuciones_table(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar la tabla tareas_ejecuciones: {e}")
+
+def ensure_archivo_registros():
+    """
+    Crea las tablas de archivo y las vistas históricas que falten. Las particiones
+    sólo se crean aquí si falta la del mes actual (instalación nueva o tarea
+    mensual sin ejecutar); si no, quedan para la tarea y el comando de mantenimiento.
+    """
+    try:
+        conn = get_connection()
+        try:
+            estado = ensure_archivo_tables(conn)
+            for tabla in estado['sin_particionar']:
+                print(f"ADVERTENCIA: {tabla} no está particionada; ejecute "
+                      f"'flask --app app mantener-particiones --convertir' fuera de horario")
+            for tabla in estado['sin_mes_actual']:
+                crear_particiones_futuras(conn, tabla)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"ADVERTENCIA: no se pudo asegurar el archivo de registros: {e}")
+
 # Crear la aplicación
 app = create_app()
 
 if __name__ == '__main__':
     # Configurar tareas programadas
-    try:
-        import apscheduler
-        configurar_tarea_cierre_diario()
-        configurar_reinicio_semanal()
-        print("Tareas programadas configuradas correctamente:")
-        print("- Cierre automático: diariamente a las 23:59")
-        print("- Reinicio semanal: domingos a las 23:55")
-    except ImportError:
-        print("ADVERTENCIA: No se pudieron configurar las tareas programadas.")
-        print("Instale 'apscheduler' con: pip install apscheduler")
+    if Config.TAREAS_PROGRAMADAS:
+        iniciar_tareas_programadas()
     
     # Configurar SSL solo si están disponibles los certificados
     cert_path = 'certificate.pem'
@@ -17,12 +17,53 @@ class Config:
     JWT_SECRET = os.getenv('JWT_SECRET')
     READER_QR_SECRET = os.getenv('READER_QR_SECRET')
     READER_STATION_ID = os.getenv('READER_STATION_ID', 'lector-web')
+    # Incluir tiempos por etapa en la respuesta de /lector/validar
+    READER_DEBUG_TIMINGS = os.getenv('READER_DEBUG_TIMINGS', 'false').lower() == 'true'
+    # Tokens del lector ya usados: 'memoria' (por worker) o 'sqlite' (compartido en la máquina)
+    READER_NONCE_BACKEND = os.getenv('READER_NONCE_BACKEND', 'memoria').lower()
+    READER_NONCE_DB = os.getenv('READER_NONCE_DB', '/tmp/lector_nonces.sqlite3')
+    READER_NONCE_MAX = int(os.getenv('READER_NONCE_MAX', 50000))
+    # Segundos que se recuerda un token sin `exp`
+    READER_NONCE_TTL = int(os.getenv('READER_NONCE_TTL', 120))
+    # Ventana en segundos en que otro escaneo del mismo email se considera repetido
+    SCAN_DEBOUNCE_SEGUNDOS = float(os.getenv('SCAN_DEBOUNCE_SEGUNDOS', 5))
+    # Segundos durante los que un escaneo con la misma clave que el último aceptado se considera repetido
+    SCAN_IDEMPOTENCIA_SEGUNDOS = float(os.getenv('SCAN_IDEMPOTENCIA_SEGUNDOS', 300))
+    # Minutos entre barridos de estados dependientes de la hora en cumplimiento_semana
+    CUMPLIMIENTO_BARRIDO_MINUTOS = int(os.getenv('CUMPLIMIENTO_BARRIDO_MINUTOS', 5))
+    # Hora (HH:MM[:SS]) de las Salidas del cierre diario; vacía = hora en que corre el cierre
+    CIERRE_HORA = os.getenv('CIERRE_HORA', '')
+    # Cerrar a los ayudantes a la hora de fin de su último bloque del día (si entraron antes)
+    CIERRE_FIN_BLOQUE = os.getenv('CIERRE_FIN_BLOQUE', 'false').lower() == 'true'
+    # Iniciar el scheduler de tareas en cada worker (un lock en MySQL elige quién ejecuta)
+    TAREAS_PROGRAMADAS = os.getenv('TAREAS_PROGRAMADAS', 'true').lower() == 'true'
+    # Segundos de atraso con que todavía se ejecuta un disparo perdido
+    TAREAS_MISFIRE_SEGUNDOS = int(os.getenv('TAREAS_MISFIRE_SEGUNDOS', 300))
+    # Máximo de ejecuciones perdidas por tarea que se recuperan al iniciar
+    TAREAS_RECUPERAR_MAX = int(os.getenv('TAREAS_RECUPERAR_MAX', 7))
+    # Días que se conservan las filas de tareas_ejecuciones (siempre queda la última de cada tarea)
+    TAREAS_RETENCION_DIAS = int(os.getenv('TAREAS_RETENCION_DIAS', 30))
+    # Meses futuros con partición creada de antemano en registros y EST_registros
+    PARTICIONES_MESES_ADELANTE = int(os.getenv('PARTICIONES_MESES_ADELANTE', 3))
+    # Semestres (incluido el actual) que se mantienen en las tablas vivas
+    ARCHIVO_SEMESTRES_VIVOS = int(os.getenv('ARCHIVO_SEMESTRES_VIVOS', 2))
+    # Archivar los semestres vencidos en la tarea mensual de mantenimiento
+    ARCHIVO_AUTOMATICO = os.getenv('ARCHIVO_AUTOMATICO', 'false').lower() == 'true'
+    # Directorio para los CSV gzip de cada semestre archivado; vacío = sólo tablas de archivo
+    ARCHIVO_DIR = os.getenv('ARCHIVO_DIR', '')
+    # Caché de tokens y admins autenticados (segundos de antigüedad máxima; 0 = desactivada)
+    ADMIN_CACHE_TTL = float(os.getenv('ADMIN_CACHE_TTL', 60))
+    ADMIN_CACHE_MAX = int(os.getenv('ADMIN_CACHE_MAX', 1024))
 
     # Control de puerta (ESPHOME) - Configuración simplificada
     DOOR_HOST = os.getenv('ESPHOME_HOST', '10.0.5.5')
     DOOR_PORT = int(os.getenv('ESPHOME_PORT', '6053'))
     DOOR_DEVICE_NAME = os.getenv('ESPHOME_DEVICE_NAME', 'arturito')
     DOOR_API_KEY = os.getenv('ESPHOME_TOKEN')
+    DOOR_BUTTON_NAME = os.getenv('ESPHOME_BUTTON_NAME', 'Abrir')
+    DOOR_COMMAND_TIMEOUT = float(os.getenv('ESPHOME_COMMAND_TIMEOUT', '3'))
+    # Sólo para pruebas locales con utils/fake_esphome.py (sin cifrado Noise)
+    DOOR_PLAINTEXT = os.getenv('ESPHOME_PLAINTEXT', 'false').lower() == 'true'
 
     # Base de datos
     DB_HOST = os.getenv('MYSQL_HOST')
@@ -32,8 +73,25 @@ class Config:
     DB_PORT = int(os.getenv('MYSQL_PORT', 3306))
     DB_CHARSET = os.getenv('DB_CHARSET', 'utf8mb4')
 
-    # Servidor
-    SERVER_URL = 'https://acceso.informaticauaint.com'
+    # Pool de conexiones (por worker)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', 300))
+    DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+    DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 30))
+
+    # Eventos en tiempo real (SSE)
+    EVENTOS_POLL_INTERVAL = float(os.getenv('EVENTOS_POLL_INTERVAL', 0.5))
+    EVENTOS_HEARTBEAT = float(os.getenv('EVENTOS_HEARTBEAT', 15))
+    EVENTOS_RETRY_MS = int(os.getenv('EVENTOS_RETRY_MS', 3000))
+    EVENTOS_REPLAY_MAX = int(os.getenv('EVENTOS_REPLAY_MAX', 1000))
+    EVENTOS_RETENCION_HORAS = int(os.getenv('EVENTOS_RETENCION_HORAS', 24))
+
+    # Instrumentación de consultas por petición
+    CONSULTAS_PRESUPUESTO = int(os.getenv('CONSULTAS_PRESUPUESTO', 50))
+    CONSULTAS_REPETICION_MAX = int(os.getenv('CONSULTAS_REPETICION_MAX', 10))
+    CONSULTAS_LOG = os.getenv('CONSULTAS_LOG', 'false').lower() == 'true'
+    CONSULTAS_ESTRICTO = os.getenv('CONSULTAS_ESTRICTO', 'false').lower() == 'true'
 
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
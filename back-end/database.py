@@ -1,6 +1,39 @@
+import os
+import threading
+import time
+from collections import deque
 import pymysql
 from config import Config
 
+# Hooks llamados tras cada consulta: hook(sql, duracion_segundos, filas)
+_hooks_consulta = []
+
+def agregar_hook_consulta(hook):
+    """Registra una función que recibe (sql, duracion_segundos, filas) de cada consulta"""
+    _hooks_consulta.append(hook)
+
+class CursorMedido(pymysql.cursors.DictCursor):
+    """
+    DictCursor que informa la duración de cada `execute` a los hooks registrados.
+
+    `executemany` de PyMySQL envía los INSERT en lotes llamando a `execute`, por
+    lo que cada viaje a la base de datos se informa una sola vez.
+    """
+
+    def execute(self, query, args=None):
+        if not _hooks_consulta:
+            return super().execute(query, args)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            duracion = time.perf_counter() - inicio
+            for hook in _hooks_consulta:
+                try:
+                    hook(query, duracion, self.rowcount)
+                except Exception as e:
+                    print(f"Error en hook de consulta: {e}")
+
 def get_db_config():
     """Obtiene la configuración de la base de datos"""
     return {
@@ -10,9 +43,265 @@ def get_db_config():
         'database': Config.DB_NAME,
         'port': Config.DB_PORT,
         'charset': Config.DB_CHARSET,
-        'cursorclass': pymysql.cursors.DictCursor
+        'cursorclass': CursorMedido
     }
 
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión del pool dentro del tiempo de espera"""
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool.
+
+    Se comporta como una conexión PyMySQL normal (cursor, commit, rollback, ...)
+    pero `close()` la devuelve al pool en lugar de cerrar el socket.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._closed = False
+
+    def close(self):
+        """Devuelve la conexión al pool (idempotente)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._raw, self._created_at)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __getattr__(self, name):
+        if self.__dict__.get('_closed', True):
+            raise pymysql.err.InterfaceError(0, 'La conexión ya fue devuelta al pool')
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad para handlers que retornan antes de cerrar la conexión
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones PyMySQL, seguro entre hilos.
+
+    - `max_size`: máximo de conexiones abiertas (en uso + ociosas).
+    - `timeout`: segundos máximos esperando una conexión libre.
+    - `max_idle`: segundos que una conexión puede quedar ociosa antes de descartarse.
+    - `max_lifetime`: segundos máximos de vida de una conexión física.
+    - `ping_after`: segundos ociosa tras los cuales se verifica con ping antes de prestarla.
+    """
+
+    def __init__(self, connect_args, max_size=10, timeout=10.0, max_idle=300.0,
+                 max_lifetime=1800.0, ping_after=30.0):
+        self.connect_args = connect_args
+        self.max_size = max(1, int(max_size))
+        self.timeout = float(timeout)
+        self.max_idle = float(max_idle)
+        self.max_lifetime = float(max_lifetime)
+        self.ping_after = float(ping_after)
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (raw, created_at, last_used)
+        self._total = 0
+        self._in_use = 0
+
+        # Estadísticas
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        return pymysql.connect(**self.connect_args)
+
+    def _discard(self, raw):
+        self._discarded += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _expired(self, created_at, last_used, now):
+        if self.max_lifetime and now - created_at >= self.max_lifetime:
+            return True
+        if self.max_idle and now - last_used >= self.max_idle:
+            return True
+        return False
+
+    def acquire(self):
+        """Obtiene una conexión del pool, creando una nueva si hay cupo"""
+        start = time.monotonic()
+        raw = None
+        created_at = None
+        last_used = None
+        waited = False
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    candidate, c_at, l_used = self._idle.pop()
+                    if self._expired(c_at, l_used, now):
+                        self._total -= 1
+                        self._discard(candidate)
+                        continue
+                    raw, created_at, last_used = candidate, c_at, l_used
+                    break
+
+                if raw is not None:
+                    break
+
+                if self._total < self.max_size:
+                    # Reservar cupo; la conexión se crea fuera del lock
+                    self._total += 1
+                    break
+
+                remaining = self.timeout - (now - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Sin conexiones disponibles tras {self.timeout:.1f}s "
+                        f"(en uso: {self._in_use}/{self.max_size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._checkouts += 1
+            wait_time = time.monotonic() - start
+            if waited:
+                self._waits += 1
+            self._wait_total += wait_time
+            self._wait_max = max(self._wait_max, wait_time)
+
+        try:
+            if raw is not None and time.monotonic() - last_used >= self.ping_after:
+                # Health check: verificar que el servidor no haya cerrado la conexión
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self._discard(raw)
+                    raw = None
+
+            if raw is None:
+                raw = self._connect()
+                created_at = time.monotonic()
+                with self._cond:
+                    self._created += 1
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        """Recibe una conexión devuelta por `PooledConnection.close()`"""
+        keep = raw.open
+        if keep:
+            try:
+                # Descartar transacciones pendientes para no filtrar estado ni snapshots
+                raw.rollback()
+            except Exception:
+                keep = False
+
+        now = time.monotonic()
+        if keep and self.max_lifetime and now - created_at >= self.max_lifetime:
+            keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((raw, created_at, now))
+            else:
+                self._total -= 1
+                self._discard(raw)
+            self._cond.notify()
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas"""
+        with self._cond:
+            while self._idle:
+                raw, _, _ = self._idle.pop()
+                self._total -= 1
+                self._discard(raw)
+
+    def stats(self):
+        """Estadísticas del pool para monitoreo"""
+        with self._cond:
+            return {
+                'pid': os.getpid(),
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'total': self._total,
+                'checkouts': self._checkouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'timeouts': self._timeouts,
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_time_max_ms': round(self._wait_max * 1000, 3)
+            }
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Retorna el pool del proceso actual (uno por worker de gunicorn)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Tras un fork no se reutilizan los sockets heredados del proceso padre
+                _pool = ConnectionPool(
+                    get_db_config(),
+                    max_size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    max_idle=Config.DB_POOL_MAX_IDLE,
+                    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                    ping_after=Config.DB_POOL_PING_AFTER
+                )
+                _pool_pid = pid
+    return _pool
+
+def get_pool_stats():
+    """Estadísticas del pool del worker actual"""
+    return get_pool().stats()
+
 def get_connection():
-    """Crea y retorna una nueva conexión a la base de datos"""
-    return pymysql.connect(**get_db_config())
\ No newline at end of file
+    """Obtiene una conexión del pool; `close()` la devuelve al pool"""
+    return get_pool().acquire()
+
+def get_streaming_connection():
+    """
+    Conexión dedicada (fuera del pool) con cursor sin buffer (SSCursor).
+
+    Para exportaciones largas: las filas se leen del socket a medida que se
+    consumen, sin cargar el resultado completo en memoria. Se cierra con
+    `close()` al terminar y no ocupa un lugar del pool durante la descarga.
+    """
+    config = get_db_config()
+    config['cursorclass'] = pymysql.cursors.SSCursor
+    return pymysql.connect(**config)
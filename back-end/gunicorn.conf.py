@@ -0,0 +1,22 @@
+# gunicorn.conf.py - Hooks de gunicorn (se carga automáticamente desde el directorio de trabajo)
+import os
+import shutil
+
+def on_starting(server):
+    """Vacía el directorio de métricas multiproceso de ejecuciones anteriores"""
+    directorio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directorio:
+        shutil.rmtree(directorio, ignore_errors=True)
+        os.makedirs(directorio, exist_ok=True)
+
+def child_exit(server, worker):
+    """Descarta los gauges del worker que terminó"""
+    from utils.metricas import marcar_worker_terminado
+    marcar_worker_terminado(worker.pid)
+
+def post_worker_init(worker):
+    """Inicia las tareas programadas; el lock en MySQL hace que sólo un worker ejecute cada disparo"""
+    from config import Config
+    if Config.TAREAS_PROGRAMADAS:
+        from tasks.scheduled_tasks import iniciar_tareas_programadas
+        iniciar_tareas_programadas()
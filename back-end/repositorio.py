@@ -0,0 +1,87 @@
+# repositorio.py - Capa de acceso a datos sobre el pool de conexiones
+"""
+Lecturas, escrituras y unidades de trabajo explícitas sobre `database`.
+
+- `consulta()`: varias lecturas con una sola conexión del pool.
+- `transaccion()`: varias sentencias en una conexión y una transacción;
+  commit al salir del bloque, rollback si se lanza una excepción.
+- `leer`, `leer_uno`, `escribir`, `escribir_muchos`: una sentencia suelta.
+
+Las filas son diccionarios (DictCursor). Los helpers que reciben un cursor
+(`publicar_registro`, `registrar_movimiento`, ...) usan `uow.cursor`.
+La duración de cada sentencia se informa a los hooks de
+`database.agregar_hook_consulta`.
+"""
+from contextlib import contextmanager
+from database import get_connection
+
+class UnidadDeTrabajo:
+    """Sentencias sobre una conexión prestada por el pool"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    def leer(self, sql, params=None):
+        """Todas las filas de una consulta"""
+        self.cursor.execute(sql, params or ())
+        return list(self.cursor.fetchall())
+
+    def leer_uno(self, sql, params=None):
+        """Primera fila de una consulta o None"""
+        self.cursor.execute(sql, params or ())
+        return self.cursor.fetchone()
+
+    def escribir(self, sql, params=None):
+        """INSERT/UPDATE/DELETE; retorna filas afectadas y último id insertado"""
+        self.cursor.execute(sql, params or ())
+        return {
+            'affected_rows': self.cursor.rowcount,
+            'last_insert_id': self.cursor.lastrowid
+        }
+
+    def escribir_muchos(self, sql, filas):
+        """Misma sentencia para muchas filas (los INSERT se envían en lotes)"""
+        filas = list(filas)
+        if not filas:
+            return 0
+        self.cursor.executemany(sql, filas)
+        return self.cursor.rowcount
+
+@contextmanager
+def consulta():
+    """Unidad de trabajo de sólo lectura (la conexión vuelve al pool sin commit)"""
+    conn = get_connection()
+    try:
+        yield UnidadDeTrabajo(conn)
+    finally:
+        conn.close()
+
+@contextmanager
+def transaccion():
+    """Unidad de trabajo transaccional: commit al terminar, rollback ante errores"""
+    conn = get_connection()
+    try:
+        yield UnidadDeTrabajo(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def leer(sql, params=None):
+    with consulta() as db:
+        return db.leer(sql, params)
+
+def leer_uno(sql, params=None):
+    with consulta() as db:
+        return db.leer_uno(sql, params)
+
+def escribir(sql, params=None):
+    with transaccion() as db:
+        return db.escribir(sql, params)
+
+def escribir_muchos(sql, filas):
+    with transaccion() as db:
+        return db.escribir_muchos(sql, filas)
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime
 from database import get_connection
 from utils.datetime_utils import get_current_datetime
-from config import Config
+from utils.presence import (
+    marcar_entrada, marcar_salida, reconciliar_presencia, verificar_presencia, foto_presencia,
+    TIPO_AYUDANTE, TIPO_ESTUDIANTE
+)
+from utils.cierre_diario import cerrar_salidas_pendientes, normalizar_hora
+from utils.instrumentacion import presupuesto_consultas
 
 estado_bp = Blueprint('estado', __name__)
 
@@ -19,12 +23,6 @@ def get_estados_usuarios():
                 ORDER BY e.updated_at DESC
             """)
             estados = cursor.fetchall()
-            
-            # Convertir datetime a strings
-            for estado in estados:
-                for key, value in estado.items():
-                    if isinstance(value, datetime):
-                        estado[key] = value.isoformat()
         
         conn.close()
         return jsonify(estados)
@@ -69,6 +67,17 @@ def update_estado_usuario(email):
                         CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
                         CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
                 """, (email, usuario['nombre'], usuario['apellido'], estado, estado, estado))
+
+            # Mantener el índice de presencia para ayudantes
+            cursor.execute("SELECT nombre, apellido FROM usuarios_permitidos WHERE email = %s AND TP = 'AYUDANTE'", (email,))
+            ayudante = cursor.fetchone()
+            if ayudante:
+                if estado == 'dentro':
+                    now = get_current_datetime()
+                    marcar_entrada(cursor, email, TIPO_AYUDANTE, ayudante['nombre'], ayudante['apellido'],
+                                   now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S"))
+                else:
+                    marcar_salida(cursor, email, TIPO_AYUDANTE)
             
             conn.commit()
         conn.close()
@@ -79,114 +88,101 @@ def update_estado_usuario(email):
 
 @estado_bp.route('/procesar_salidas_pendientes', methods=['POST'])
 def procesar_salidas_pendientes():
-    """Procesar salidas pendientes al final del día"""
+    """
+    Procesar salidas pendientes al final del día (ayudantes y estudiantes).
+
+    Body opcional: {"hora_cierre": "HH:MM"} para la hora de las Salidas generadas.
+    """
+    hora_cierre = (request.get_json(silent=True) or {}).get('hora_cierre')
+    try:
+        hora_cierre = normalizar_hora(hora_cierre) if hora_cierre else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = get_connection()
-        registros_procesados = []
-        
-        with conn.cursor() as cursor:
-            # Obtener fecha y hora actual
-            now = get_current_datetime()
-            fecha = now.strftime("%Y-%m-%d")
-            hora = now.strftime("%H:%M:%S")
-            
-            # Día de la semana en español
-            dia = Config.DIAS_SEMANA.get(now.strftime("%A"), now.strftime("%A"))
-            
-            # 1. Buscar usuarios que tienen registros de entrada sin salida correspondiente HOY
-            cursor.execute("""
-                SELECT u.email, u.nombre, u.apellido, MAX(r.id) as ultimo_id, MAX(r.hora) as ultima_hora
-                FROM usuarios_permitidos u
-                JOIN registros r ON u.email = r.email
-                WHERE r.fecha = %s AND r.tipo = 'Entrada'
-                AND NOT EXISTS (
-                    SELECT 1 FROM registros r2 
-                    WHERE r2.email = r.email 
-                    AND r2.fecha = r.fecha 
-                    AND r2.tipo = 'Salida'
-                    AND r2.id > r.id
-                )
-                GROUP BY u.email, u.nombre, u.apellido
-            """, (fecha,))
-            
-            usuarios_sin_salida = cursor.fetchall()
-            
-            # 2. También buscar usuarios con estado 'dentro' en la tabla estado_usuarios como respaldo
-            cursor.execute("""
-                SELECT e.email, e.nombre, e.apellido
-                FROM estado_usuarios e
-                JOIN usuarios_permitidos u ON e.email = u.email
-                WHERE e.estado = 'dentro'
-                AND NOT EXISTS (
-                    SELECT 1 FROM registros r 
-                    WHERE r.email = e.email 
-                    AND r.fecha = %s
-                    AND r.tipo = 'Salida'
-                )
-            """, (fecha,))
-            
-            usuarios_dentro = cursor.fetchall()
-            
-            # Combinar ambos conjuntos de usuarios
-            emails_procesados = set()
-            todos_usuarios = []
-            
-            # Primero añadir usuarios con registros de entrada sin salida
-            for usuario in usuarios_sin_salida:
-                if usuario['email'] not in emails_procesados:
-                    todos_usuarios.append(usuario)
-                    emails_procesados.add(usuario['email'])
-            
-            # Luego añadir usuarios con estado 'dentro' sin registro de salida
-            for usuario in usuarios_dentro:
-                if usuario['email'] not in emails_procesados:
-                    todos_usuarios.append(usuario)
-                    emails_procesados.add(usuario['email'])
-            
-            # Procesar cada usuario
-            for usuario in todos_usuarios:
-                # Insertar registro de salida automático
-                cursor.execute("""
-                    INSERT INTO registros 
-                    (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    fecha,
-                    hora,
-                    dia,
-                    usuario['nombre'],
-                    usuario['apellido'],
-                    usuario['email'],
-                    'Salida',
-                    True  # Marcar como auto-generado
-                ))
-                
-                # Actualizar estado a 'fuera'
-                cursor.execute("""
-                    UPDATE estado_usuarios 
-                    SET estado = 'fuera', ultima_salida = NOW()
-                    WHERE email = %s
-                """, (usuario['email'],))
-                
-                registros_procesados.append({
-                    'email': usuario['email'],
-                    'nombre': usuario['nombre'],
-                    'apellido': usuario['apellido'],
-                    'fecha': fecha,
-                    'hora': hora
-                })
-            
-            # Confirmar los cambios
-            conn.commit()
-            
-        conn.close()
-        
-        return jsonify({
-            'fecha_procesada': fecha,
-            'registros_creados': len(registros_procesados),
-            'detalle': registros_procesados
-        })
+        try:
+            resultado = cerrar_salidas_pendientes(conn, hora_cierre=hora_cierre)
+        finally:
+            conn.close()
+
+        return jsonify(resultado)
     
     except Exception as e:
         print(f"Error al procesar salidas pendientes: {str(e)}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Valor del parámetro `tipo` → tipos de usuario del índice de presencia
+TIPOS_PRESENCIA = {
+    'ayudantes': [TIPO_AYUDANTE],
+    'estudiantes': [TIPO_ESTUDIANTE],
+    'todos': [TIPO_AYUDANTE, TIPO_ESTUDIANTE]
+}
+
+@estado_bp.route('/presencia', methods=['GET'])
+@presupuesto_consultas(1)
+def get_presencia():
+    """Ayudantes y estudiantes dentro ahora, desde el índice de presencia"""
+    try:
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                foto = foto_presencia(cursor)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'fecha': foto['fecha'],
+            'ayudantes': foto[TIPO_AYUDANTE],
+            'estudiantes': foto[TIPO_ESTUDIANTE],
+            'totales': {
+                'ayudantes': len(foto[TIPO_AYUDANTE]),
+                'estudiantes': len(foto[TIPO_ESTUDIANTE])
+            }
+        })
+    except Exception as e:
+        print(f"Error al obtener presencia: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@estado_bp.route('/presencia/verificar', methods=['GET'])
+def verificar_presencia_endpoint():
+    """
+    Compara el índice de presencia con los registros del día sin modificarlo.
+
+    Parámetro: tipo (ayudantes | estudiantes | todos, por defecto todos).
+    """
+    tipos = TIPOS_PRESENCIA.get(request.args.get('tipo', 'todos'))
+    if tipos is None:
+        return jsonify({"error": "Tipo inválido. Use 'ayudantes', 'estudiantes' o 'todos'"}), 400
+    try:
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                resultado = [verificar_presencia(cursor, tipo) for tipo in tipos]
+        finally:
+            conn.close()
+        return jsonify(resultado)
+    except Exception as e:
+        print(f"Error al verificar presencia: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@estado_bp.route('/presencia/reconciliar', methods=['POST'])
+def reconciliar_presencia_endpoint():
+    """
+    Recalcular el índice de presencia desde los registros del día.
+
+    Parámetro: tipo (ayudantes | estudiantes | todos, por defecto todos).
+    """
+    tipos = TIPOS_PRESENCIA.get(request.args.get('tipo', 'todos'))
+    if tipos is None:
+        return jsonify({"error": "Tipo inválido. Use 'ayudantes', 'estudiantes' o 'todos'"}), 400
+    try:
+        conn = get_connection()
+        try:
+            resultado = [reconciliar_presencia(conn, tipo) for tipo in tipos]
+        finally:
+            conn.close()
+        return jsonify(resultado)
+    except Exception as e:
+        print(f"Error al reconciliar presencia: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -1,76 +1,41 @@
 # routes/estudiantes.py - Rutas para manejo de estudiantes (Migrado a API unificada)
 from flask import Blueprint, request, jsonify
-from database import get_connection
+from repositorio import consulta, transaccion, leer
 from utils.validators import validate_email, validate_required_fields
 from utils.helpers import format_response, handle_error
+from utils.eventos import publicar_registro, POBLACION_ESTUDIANTES
+from utils.presence import registrar_movimiento, marcar_estado_usuario, TIPO_ESTUDIANTE
+from utils.datetime_utils import get_current_datetime, rango_fechas
 import logging
-import pymysql
 
 estudiantes_bp = Blueprint('estudiantes', __name__)
 
-def execute_query_estudiantes(query, params=None, fetch_one=False):
-    """Ejecuta consulta con conexión PyMySQL para estudiantes"""
-    connection = get_connection()
-    try:
-        # Usar DictCursor para obtener diccionarios en lugar de tuplas
-        cursor = connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute(query, params or ())
-
-        if query.strip().upper().startswith('SELECT'):
-            if fetch_one:
-                result = cursor.fetchone()
-            else:
-                result = cursor.fetchall()
-        else:
-            connection.commit()
-            result = {
-                'affected_rows': cursor.rowcount,
-                'last_insert_id': cursor.lastrowid
-            }
-
-        return result
-    except Exception as e:
-        connection.rollback()
-        raise e
-    finally:
-        connection.close()
+# Estudiantes activos y si están presentes hoy según el índice `presencia`
+# (una lectura por clave primaria por estudiante). Parámetro: fecha de hoy.
+QUERY_ESTUDIANTES_PRESENTES = """
+    SELECT
+        ue.id,
+        ue.nombre,
+        ue.apellido,
+        ue.email,
+        ue.activo,
+        ue.TP as carrera,
+        p.email IS NOT NULL as presente
+    FROM usuarios_estudiantes ue
+    LEFT JOIN presencia p
+        ON p.email = ue.email AND p.tipo_usuario = 'ESTUDIANTE' AND p.fecha = %s
+    WHERE ue.activo = 1
+    ORDER BY ue.apellido, ue.nombre
+"""
 
 @estudiantes_bp.route('/estudiantes_presentes', methods=['GET'])
 def get_estudiantes():
     """Obtiene la lista de todos los estudiantes"""
     try:
-        # Consulta simplificada y corregida
-        query = """
-        SELECT
-            ue.id,
-            ue.nombre,
-            ue.apellido,
-            ue.email,
-            ue.activo,
-            ue.TP as carrera,
-            CASE
-                WHEN EXISTS (
-                    SELECT 1 FROM EST_registros er
-                    WHERE er.email = ue.email
-                    AND DATE(er.fecha) = CURDATE()
-                    AND er.tipo = 'Entrada'
-                    AND NOT EXISTS (
-                        SELECT 1 FROM EST_registros er2
-                        WHERE er2.email = ue.email
-                        AND DATE(er2.fecha) = CURDATE()
-                        AND er2.tipo = 'Salida'
-                        AND er2.hora > er.hora
-                    )
-                )
-                THEN 1
-                ELSE 0
-            END as presente
-        FROM usuarios_estudiantes ue
-        WHERE ue.activo = 1
-        ORDER BY ue.apellido, ue.nombre
-        """
+        # Hoy en Santiago
+        hoy = get_current_datetime().strftime('%Y-%m-%d')
 
-        estudiantes = execute_query_estudiantes(query)
+        estudiantes = leer(QUERY_ESTUDIANTES_PRESENTES, (hoy,))
 
         # Formatear respuesta
         formatted_estudiantes = []
@@ -98,35 +63,37 @@ def toggle_presente(estudiante_id):
         data = request.get_json()
         presente = data.get('presente', False)
 
-        # Obtener datos del estudiante
-        query_estudiante = "SELECT * FROM usuarios_estudiantes WHERE id = %s"
-        estudiante = execute_query_estudiantes(query_estudiante, (estudiante_id,), fetch_one=True)
+        # Presente registra una entrada; ausente, una salida
+        tipo = 'Entrada' if presente else 'Salida'
+        now = get_current_datetime()
+        fecha = now.strftime('%Y-%m-%d')
+        hora = now.strftime('%H:%M:%S')
+        query_insert = """
+        INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
+        """
 
-        if not estudiante:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
+        # Lectura del estudiante, registro, presencia y evento SSE en la misma transacción
+        with transaccion() as db:
+            estudiante = db.leer_uno("SELECT * FROM usuarios_estudiantes WHERE id = %s", (estudiante_id,))
 
-        # Si se marca como presente, registrar entrada
-        if presente:
-            query_insert = """
-            INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-            VALUES (CURDATE(), CURTIME(), DAYNAME(CURDATE()), %s, %s, %s, 'Entrada', 1)
-            """
-            execute_query_estudiantes(query_insert, (
-                estudiante['nombre'],
-                estudiante['apellido'],
-                estudiante['email']
-            ))
-        else:
-            # Si se marca como ausente, registrar salida
-            query_insert = """
-            INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-            VALUES (CURDATE(), CURTIME(), DAYNAME(CURDATE()), %s, %s, %s, 'Salida', 1)
-            """
-            execute_query_estudiantes(query_insert, (
+            if not estudiante:
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
+
+            result = db.escribir(query_insert, (
+                fecha,
+                hora,
+                now.strftime('%A'),
                 estudiante['nombre'],
                 estudiante['apellido'],
-                estudiante['email']
+                estudiante['email'],
+                tipo
             ))
+            registrar_movimiento(db.cursor, estudiante['email'], TIPO_ESTUDIANTE, tipo,
+                                 estudiante['nombre'], estudiante['apellido'], fecha, hora)
+            marcar_estado_usuario(db.cursor, estudiante['email'], estudiante['nombre'], estudiante['apellido'], tipo)
+            publicar_registro(db.cursor, POBLACION_ESTUDIANTES, result['last_insert_id'], estudiante['email'],
+                              estudiante['nombre'], estudiante['apellido'], fecha, hora, tipo)
 
         return format_response({'success': True, 'presente': presente})
 
@@ -148,26 +115,25 @@ def create_estudiante():
         if not validate_email(data['email']):
             return jsonify({'error': 'Email inválido'}), 400
 
-        # Verificar si el email ya existe
         query_exists = "SELECT id FROM usuarios_estudiantes WHERE email = %s"
-        existing = execute_query_estudiantes(query_exists, (data['email'],), fetch_one=True)
-
-        if existing:
-            return jsonify({'error': 'Ya existe un estudiante con ese email'}), 409
-
-        # Insertar nuevo estudiante
         query_insert = """
         INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
         VALUES (%s, %s, %s, %s, %s)
         """
 
-        result = execute_query_estudiantes(query_insert, (
-            data['nombre'].strip(),
-            data['apellido'].strip(),
-            data['email'].strip().lower(),
-            data.get('activo', True),
-            data.get('carrera', '')
-        ))
+        with transaccion() as db:
+            # Verificar si el email ya existe
+            if db.leer_uno(query_exists, (data['email'],)):
+                return jsonify({'error': 'Ya existe un estudiante con ese email'}), 409
+
+            # Insertar nuevo estudiante
+            result = db.escribir(query_insert, (
+                data['nombre'].strip(),
+                data['apellido'].strip(),
+                data['email'].strip().lower(),
+                data.get('activo', True),
+                data.get('carrera', '')
+            ))
 
         return format_response({
             'id': result['last_insert_id'],
@@ -188,40 +154,46 @@ def get_estudiante(estudiante_id):
         WHERE id = %s
         """
 
-        estudiante = execute_query_estudiantes(query, (estudiante_id,), fetch_one=True)
-
-        if not estudiante:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
-
-        # Verificar si está presente hoy
-        query_presente = """
-        SELECT COUNT(*) as presente
-        FROM EST_registros
-        WHERE email = %s
-        AND DATE(fecha) = CURDATE()
-        AND tipo = 'Entrada'
-        AND NOT EXISTS (
-            SELECT 1 FROM EST_registros er2
-            WHERE er2.email = %s
-            AND DATE(er2.fecha) = CURDATE()
-            AND er2.tipo = 'Salida'
-            AND er2.hora > EST_registros.hora
-        )
-        """
-
-        presente_result = execute_query_estudiantes(query_presente, (estudiante['email'], estudiante['email']), fetch_one=True)
-        presente = presente_result['presente'] > 0 if presente_result else False
+        # Estudiante, presencia de hoy y registros recientes con una sola conexión
+        with consulta() as db:
+            estudiante = db.leer_uno(query, (estudiante_id,))
+
+            if not estudiante:
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
+
+            # Verificar si está presente hoy
+            desde, hasta = rango_fechas('hoy')
+            query_presente = """
+            SELECT COUNT(*) as presente
+            FROM EST_registros
+            WHERE email = %s
+            AND fecha >= %s AND fecha < %s
+            AND tipo = 'Entrada'
+            AND NOT EXISTS (
+                SELECT 1 FROM EST_registros er2
+                WHERE er2.email = %s
+                AND er2.fecha >= %s AND er2.fecha < %s
+                AND er2.tipo = 'Salida'
+                AND er2.hora > EST_registros.hora
+            )
+            """
 
-        # Obtener historial de registros reciente
-        query_registros = """
-        SELECT fecha, hora, tipo
-        FROM EST_registros
-        WHERE email = %s
-        ORDER BY fecha DESC, hora DESC
-        LIMIT 10
-        """
+            presente_result = db.leer_uno(query_presente, (
+                estudiante['email'], desde, hasta,
+                estudiante['email'], desde, hasta
+            ))
+            presente = presente_result['presente'] > 0 if presente_result else False
+
+            # Obtener historial de registros reciente
+            query_registros = """
+            SELECT fecha, hora, tipo
+            FROM EST_registros
+            WHERE email = %s
+            ORDER BY fecha DESC, hora DESC
+            LIMIT 10
+            """
 
-        registros = execute_query_estudiantes(query_registros, (estudiante['email'],))
+            registros = db.leer(query_registros, (estudiante['email'],))
 
         response_data = {
             'id': str(estudiante['id']),
@@ -249,13 +221,6 @@ def update_estudiante(estudiante_id):
     try:
         data = request.get_json()
 
-        # Verificar que el estudiante existe
-        query_exists = "SELECT id FROM usuarios_estudiantes WHERE id = %s"
-        existing = execute_query_estudiantes(query_exists, (estudiante_id,), fetch_one=True)
-
-        if not existing:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
-
         # Construir consulta de actualización dinámicamente
         update_fields = []
         params = []
@@ -293,7 +258,13 @@ def update_estudiante(estudiante_id):
         WHERE id = %s
         """
 
-        execute_query_estudiantes(query_update, params)
+        with transaccion() as db:
+            # Verificar que el estudiante existe
+            query_exists = "SELECT id FROM usuarios_estudiantes WHERE id = %s"
+            if not db.leer_uno(query_exists, (estudiante_id,)):
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
+
+            db.escribir(query_update, params)
 
         return format_response({'mensaje': 'Estudiante actualizado exitosamente'})
 
@@ -304,16 +275,16 @@ def update_estudiante(estudiante_id):
 def delete_estudiante(estudiante_id):
     """Elimina un estudiante (soft delete)"""
     try:
-        # Verificar que el estudiante existe
         query_exists = "SELECT id FROM usuarios_estudiantes WHERE id = %s"
-        existing = execute_query_estudiantes(query_exists, (estudiante_id,), fetch_one=True)
+        query_delete = "UPDATE usuarios_estudiantes SET activo = 0 WHERE id = %s"
 
-        if not existing:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
+        with transaccion() as db:
+            # Verificar que el estudiante existe
+            if not db.leer_uno(query_exists, (estudiante_id,)):
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
 
-        # Marcar como inactivo en lugar de eliminar
-        query_delete = "UPDATE usuarios_estudiantes SET activo = 0 WHERE id = %s"
-        execute_query_estudiantes(query_delete, (estudiante_id,))
+            # Marcar como inactivo en lugar de eliminar
+            db.escribir(query_delete, (estudiante_id,))
 
         return format_response({'mensaje': 'Estudiante desactivado exitosamente'})
 
@@ -0,0 +1,70 @@
+import json
+import queue
+from flask import Blueprint, Response, request, jsonify
+from config import Config
+from utils.eventos import (
+    get_broadcaster, eventos_para_reanudar, formatear_sse, EVENTO_RESET
+)
+
+eventos_bp = Blueprint('eventos', __name__)
+
+def _ultimo_id_cliente():
+    """Id desde el que reanudar: cabecera Last-Event-ID o parámetro last_event_id"""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except ValueError:
+        return None
+
+@eventos_bp.route('/eventos', methods=['GET'])
+def stream_eventos():
+    """Stream SSE de registros y cambios de presencia (ayudantes y estudiantes)"""
+    ultimo_id = _ultimo_id_cliente()
+    broadcaster = get_broadcaster()
+    suscripcion = broadcaster.suscribir()
+
+    def generar():
+        enviado = ultimo_id
+        try:
+            yield f"retry: {Config.EVENTOS_RETRY_MS}\n\n"
+
+            # Reanudación: enviar lo que el cliente perdió
+            if ultimo_id is not None:
+                perdidos, completo = eventos_para_reanudar(ultimo_id)
+                if not completo:
+                    yield f"event: {EVENTO_RESET}\ndata: {json.dumps({'motivo': 'recargar'})}\n\n"
+                    enviado = None
+                for evento in perdidos:
+                    yield formatear_sse(evento)
+                    enviado = evento['id']
+
+            while True:
+                try:
+                    evento = suscripcion.cola.get(timeout=Config.EVENTOS_HEARTBEAT)
+                except queue.Empty:
+                    if suscripcion.desbordada:
+                        break
+                    # Comentario SSE para mantener viva la conexión en proxies
+                    yield ": ping\n\n"
+                    continue
+
+                if evento['id'] is None:
+                    # Aviso sin id (p. ej. `reset` por un evento confirmado tarde)
+                    yield formatear_sse(evento)
+                    continue
+                if enviado is not None and evento['id'] <= enviado:
+                    continue
+                yield formatear_sse(evento)
+                enviado = evento['id']
+        finally:
+            broadcaster.desuscribir(suscripcion)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@eventos_bp.route('/eventos/estado', methods=['GET'])
+def estado_eventos():
+    """Conexiones SSE abiertas en este worker"""
+    return jsonify({"clientes": get_broadcaster().clientes()})
@@ -0,0 +1,48 @@
+from flask import Blueprint, Response, request, jsonify
+from utils.auth import token_required
+from utils.datetime_utils import rango_fechas
+from utils.exportacion import generar_exportacion, TABLAS_EXPORTACION, FORMATOS
+
+exportar_bp = Blueprint('exportar', __name__)
+
+@exportar_bp.route('/exportar/<poblacion>', methods=['GET'])
+@token_required
+def exportar_registros(current_user, poblacion):
+    """
+    Exporta en streaming los registros de ayudantes o estudiantes entre dos fechas.
+
+    Parámetros: desde, hasta (YYYY-MM-DD, inclusivas), formato (csv | ndjson) y
+    after_id para reanudar una descarga interrumpida.
+    """
+    if poblacion not in TABLAS_EXPORTACION:
+        return jsonify({"error": "Población inválida. Use 'ayudantes' o 'estudiantes'"}), 404
+
+    formato = request.args.get('formato', 'csv').lower()
+    if formato not in FORMATOS:
+        return jsonify({"error": "Formato inválido. Use 'csv' o 'ndjson'"}), 400
+
+    inicio = request.args.get('desde')
+    fin = request.args.get('hasta')
+    if not inicio or not fin:
+        return jsonify({"error": "Se requieren las fechas desde y hasta"}), 400
+
+    try:
+        desde, hasta = rango_fechas('entre', inicio=inicio, fin=fin)
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos. Use fechas YYYY-MM-DD y after_id numérico"}), 400
+
+    usar_gzip = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+    nombre = f"registros_{poblacion}_{inicio}_{fin}.{formato}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{nombre}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+        'Vary': 'Accept-Encoding'
+    }
+    if usar_gzip:
+        headers['Content-Encoding'] = 'gzip'
+
+    cuerpo = generar_exportacion(poblacion, formato, desde, hasta, after_id=after_id, gzip=usar_gzip)
+    return Response(cuerpo, mimetype=FORMATOS[formato], headers=headers)
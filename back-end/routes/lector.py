@@ -1,5 +1,7 @@
 import os
-from flask import Blueprint, request, jsonify
+import logging
+import time
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 import jwt
 from jwt import ExpiredSignatureError, InvalidTokenError
@@ -7,16 +9,45 @@ from database import get_connection
 from utils.datetime_utils import get_current_datetime
 from config import Config
 from utils.door_control import open_door_if_authorized
+from utils.horas_ledger import actualizar_dia
+from utils.cumplimiento_semana import actualizar_cumplimiento_dia
+from utils.presence import (
+    registrar_movimiento, marcar_estado_usuario, TIPO_AYUDANTE, TIPO_ESTUDIANTE, TABLAS_REGISTROS
+)
+from utils.eventos import publicar_registro, POBLACION_AYUDANTES, POBLACION_ESTUDIANTES
+from utils.escaneos import clave_idempotencia, reclamar_escaneo, completar_escaneo
+from utils.nonce_cache import get_nonce_cache, clave_token, expiracion_token, EN_PROCESO
 
 lector_bp = Blueprint('lector', __name__)
 
 READER_QR_SECRET = os.getenv('READER_QR_SECRET', Config.READER_QR_SECRET)
 READER_STATION_ID = os.getenv('READER_STATION_ID', Config.READER_STATION_ID)
 
+# Resuelve en un solo viaje a la base de datos el estado actual del usuario,
+# si es ayudante o estudiante y cuántos ayudantes están dentro.
+LOOKUP_QUERY = """
+    SELECT
+        (SELECT estado FROM estado_usuarios WHERE email = %s) AS estado,
+        EXISTS (
+            SELECT 1 FROM usuarios_permitidos WHERE email = %s AND TP = 'AYUDANTE'
+        ) AS es_ayudante,
+        EXISTS (
+            SELECT 1 FROM usuarios_estudiantes WHERE email = %s
+        ) AS es_estudiante,
+        (
+            SELECT dentro FROM presencia_contador WHERE tipo_usuario = 'AYUDANTE'
+        ) AS ayudantes_dentro
+"""
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
 
 @lector_bp.route('/lector/validar', methods=['POST'])
 def validar_token_lector():
     """Valida un token QR emitido por el lector y registra entrada/salida del usuario autenticado."""
+    t0 = time.perf_counter()
+    timings = {}
     data = request.get_json() or {}
     token = data.get('token')
     nombre = data.get('nombre')
@@ -39,19 +70,54 @@ def validar_token_lector():
     station_id = payload.get('station_id', READER_STATION_ID)
     nonce = payload.get('nonce')
     user_type = ''  # Inicializar para uso posterior en door_control
+    timings['decode_ms'] = _elapsed_ms(t0)
+
+    # Reenvío del mismo QR por el mismo usuario: responder sin tocar la base de datos
+    nonces = get_nonce_cache()
+    clave = clave_token(payload, token, email)
+    previo = nonces.reclamar(clave, expiracion_token(payload))
+    if previo == EN_PROCESO:
+        return jsonify({"error": "Escaneo en proceso", "reason": "duplicate"}), 409
+    if previo:
+        return jsonify({**previo, "duplicado": True})
 
     try:
+        t_step = time.perf_counter()
         conn = get_connection()
+        timings['connection_ms'] = _elapsed_ms(t_step)
+
         with conn.cursor() as cursor:
             now = get_current_datetime()
             fecha = now.strftime("%Y-%m-%d")
             hora = now.strftime("%H:%M:%S")
             dia = Config.DIAS_SEMANA.get(now.strftime("%A"), now.strftime("%A"))
 
-            cursor.execute("SELECT estado FROM estado_usuarios WHERE email = %s", (email,))
-            estado_actual = cursor.fetchone()
-
-            if estado_actual and estado_actual['estado'] == 'dentro':
+            # Antirrebote: bloquea la fila del email hasta el commit y descarta
+            # escaneos repetidos antes de decidir Entrada/Salida
+            previo = reclamar_escaneo(cursor, email.strip().lower(), clave_idempotencia(request, clave))
+            if previo:
+                conn.rollback()
+                conn.close()
+                response = {
+                    "success": True,
+                    "message": "Escaneo repetido",
+                    "tipo": previo['tipo'],
+                    "estado": 'dentro' if previo['tipo'] == 'Entrada' else 'fuera',
+                    "registro_id": previo['registro_id'],
+                    "station_id": station_id,
+                    "nonce": nonce,
+                    "duplicado": True
+                }
+                nonces.completar(clave, response)
+                return jsonify(response)
+
+            # Identidad, estado actual y ayudantes dentro en una sola consulta
+            t_step = time.perf_counter()
+            cursor.execute(LOOKUP_QUERY, (email, email, email))
+            lookup = cursor.fetchone()
+            timings['lookup_ms'] = _elapsed_ms(t_step)
+
+            if lookup['estado'] == 'dentro':
                 tipo = 'Salida'
                 nuevo_estado = 'fuera'
             else:
@@ -59,59 +125,46 @@ def validar_token_lector():
                 nuevo_estado = 'dentro'
 
             # Determinar tipo de usuario (ayudante vs estudiante)
-            cursor.execute("SELECT id FROM usuarios_permitidos WHERE email = %s AND TP = 'AYUDANTE'", (email,))
-            is_assistant = cursor.fetchone() is not None
-
-            cursor.execute("SELECT id FROM usuarios_estudiantes WHERE email = %s", (email,))
-            is_student = cursor.fetchone() is not None
-
-            # Guardar tipo de usuario para control de puerta
-            if is_assistant:
-                user_type = 'AYUDANTE'
-            elif is_student:
-                user_type = 'ESTUDIANTE'
-            else:
-                user_type = ''
-
-            # Insertar en la tabla correcta según el tipo de usuario
-            if is_assistant:
-                # Insertar en tabla de ayudantes (registros)
-                cursor.execute("""
-                    INSERT INTO registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
-                """, (
-                    fecha, hora, dia, nombre, apellido, email, tipo
-                ))
-            elif is_student:
-                # Insertar en tabla de estudiantes (EST_registros)
-                cursor.execute("""
-                    INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
-                """, (
-                    fecha, hora, dia, nombre, apellido, email, tipo
-                ))
+            if lookup['es_ayudante']:
+                user_type = TIPO_AYUDANTE
+            elif lookup['es_estudiante']:
+                user_type = TIPO_ESTUDIANTE
             else:
                 # Usuario no encontrado en ninguna tabla
                 conn.close()
+                nonces.liberar(clave)
                 return jsonify({"error": "Usuario no autorizado", "reason": "not_found"}), 403
 
-            cursor.execute("""
-                INSERT INTO estado_usuarios (email, nombre, apellido, estado, ultima_entrada, ultima_salida)
-                VALUES (%s, %s, %s, %s,
-                    CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
-                    CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
-                ON DUPLICATE KEY UPDATE 
-                    estado = %s, 
-                    ultima_entrada = CASE WHEN %s = 'dentro' THEN NOW() ELSE ultima_entrada END,
-                    ultima_salida = CASE WHEN %s = 'fuera' THEN NOW() ELSE ultima_salida END
+            assistants_inside = int(lookup['ayudantes_dentro'] or 0)
+            if user_type == TIPO_AYUDANTE:
+                # El conteo refleja el estado después de este registro
+                assistants_inside += 1 if nuevo_estado == 'dentro' else -1
+                assistants_inside = max(assistants_inside, 0)
+
+            # Evento y estado en una sola transacción
+            t_step = time.perf_counter()
+            cursor.execute(f"""
+                INSERT INTO {TABLAS_REGISTROS[user_type]} (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
             """, (
-                email, nombre, apellido, nuevo_estado,
-                nuevo_estado, nuevo_estado,
-                nuevo_estado, nuevo_estado, nuevo_estado
+                fecha, hora, dia, nombre, apellido, email, tipo
             ))
+            registro_id = cursor.lastrowid
+            completar_escaneo(cursor, email.strip().lower(), registro_id, tipo)
+
+            marcar_estado_usuario(cursor, email, nombre, apellido, tipo)
+
+            registrar_movimiento(cursor, email, user_type, tipo, nombre, apellido, fecha, hora)
+            if user_type == TIPO_AYUDANTE:
+                actualizar_dia(cursor, email, fecha)
+                if tipo == 'Salida':
+                    actualizar_cumplimiento_dia(cursor, email, fecha, now=now)
+
+            poblacion = POBLACION_AYUDANTES if user_type == TIPO_AYUDANTE else POBLACION_ESTUDIANTES
+            publicar_registro(cursor, poblacion, registro_id, email, nombre, apellido, fecha, hora, tipo)
 
             conn.commit()
-            registro_id = cursor.lastrowid
+            timings['write_ms'] = _elapsed_ms(t_step)
 
         conn.close()
 
@@ -126,14 +179,18 @@ def validar_token_lector():
         }
     except Exception as exc:
         print(f"Error en validar_token_lector: {str(exc)}")
+        nonces.liberar(clave)
         return jsonify({"error": "Error interno", "detail": str(exc)}), 500
 
+    timings['db_total_ms'] = _elapsed_ms(t0)
+
     # Intentar apertura de puerta según tipo de usuario
-    print(f"🚪 DEBUG: Intentando abrir puerta - user_type='{user_type}', email='{email}'")
+    logging.debug("Intentando abrir puerta - user_type=%s, email=%s", user_type, email)
     door_result = None
+    t_step = time.perf_counter()
     try:
-        door_result = open_door_if_authorized(email, user_type)
-        print(f"🚪 DEBUG: Resultado door_control: {door_result}")
+        door_result = open_door_if_authorized(email, user_type, assistants_count=assistants_inside)
+        logging.debug("Resultado door_control: %s", door_result)
         # Agregar información de la puerta a la respuesta
         response['door_opened'] = door_result.get('opened', False)
         response['door_authorized'] = door_result.get('authorized', False)
@@ -144,5 +201,11 @@ def validar_token_lector():
         print(f"Error al procesar apertura de puerta: {e}")
         response['door_opened'] = False
         response['door_message'] = f"Error: {str(e)}"
+    timings['door_ms'] = _elapsed_ms(t_step)
+    nonces.completar(clave, response)
+    timings['total_ms'] = _elapsed_ms(t0)
+
+    if current_app.debug or Config.READER_DEBUG_TIMINGS:
+        response['timings'] = timings
 
     return jsonify(response)
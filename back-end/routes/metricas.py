@@ -0,0 +1,27 @@
+from flask import Blueprint, Response, jsonify
+from database import get_connection, get_pool_stats
+from utils.metricas import (
+    METRICAS_DISPONIBLES, generar_metricas, actualizar_pool, actualizar_presencia
+)
+
+metricas_bp = Blueprint('metricas', __name__)
+
+@metricas_bp.route('/metrics', methods=['GET'])
+def get_metricas():
+    """Métricas en formato de texto de Prometheus"""
+    if not METRICAS_DISPONIBLES:
+        return jsonify({"error": "prometheus_client no está instalado"}), 503
+
+    # Valores que se leen al momento de la consulta
+    actualizar_pool(get_pool_stats())
+    try:
+        conn = get_connection()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT tipo_usuario, dentro FROM presencia_contador")
+            actualizar_presencia({fila['tipo_usuario']: fila['dentro'] for fila in cursor.fetchall()})
+        conn.close()
+    except Exception as e:
+        print(f"Error al leer presencia para métricas: {e}")
+
+    cuerpo, content_type = generar_metricas()
+    return Response(cuerpo, content_type=content_type)
@@ -1,40 +1,17 @@
 # routes/qr.py - Rutas para manejo de códigos QR y autenticación (Migrado a API unificada)
 from flask import Blueprint, request, jsonify
-from database import get_connection
+from repositorio import consulta, transaccion, leer
 from utils.helpers import format_response, handle_error
 from utils.validators import validate_email, validate_qr_data
-from datetime import datetime, timedelta
+from utils.eventos import publicar_registro, POBLACION_ESTUDIANTES
+from utils.presence import registrar_movimiento, marcar_estado_usuario, TIPO_ESTUDIANTE
+from utils.escaneos import clave_idempotencia, reclamar_escaneo, completar_escaneo, marca_ventana
+from utils.datetime_utils import get_current_datetime, rango_fechas, format_hora
+from datetime import datetime
 import json
-import logging
 
 qr_bp = Blueprint('qr', __name__)
 
-def execute_query_qr(query, params=None, fetch_one=False):
-    """Ejecuta consulta con conexión PyMySQL para QR"""
-    connection = get_connection()
-    try:
-        cursor = connection.cursor()
-        cursor.execute(query, params or ())
-
-        if query.strip().upper().startswith('SELECT'):
-            if fetch_one:
-                result = cursor.fetchone()
-            else:
-                result = cursor.fetchall()
-        else:
-            connection.commit()
-            result = {
-                'affected_rows': cursor.rowcount,
-                'last_insert_id': cursor.lastrowid
-            }
-
-        return result
-    except Exception as e:
-        connection.rollback()
-        raise e
-    finally:
-        connection.close()
-
 @qr_bp.route('/qr/validate', methods=['POST'])
 def validate_qr():
     """Valida un código QR y registra entrada/salida"""
@@ -67,21 +44,29 @@ def validate_qr():
                     'expired': True
                 }), 400
 
-        # Buscar o crear el estudiante
+        # Antirrebote, estudiante, tipo y registro en una sola transacción
         email = qr_info['email'].strip().lower()
-        estudiante = get_or_create_estudiante(qr_info)
-
-        if not estudiante:
-            return jsonify({'error': 'Error al procesar datos del estudiante'}), 500
-
-        # Determinar tipo de registro (entrada/salida)
-        tipo_registro = determine_registro_type(email)
-
-        # Registrar entrada/salida
-        registro_id = create_registro_from_qr(estudiante, tipo_registro, qr_info)
+        # Un QR con auto-renovación puede no traer timestamp: sin él, la clave por
+        # defecto sería constante y todo escaneo posterior se vería como repetido
+        marca = qr_info.get('timestamp')
+        if marca is None:
+            marca = marca_ventana()
+        clave = clave_idempotencia(request, f"qr|{email}|{marca}")
+        with transaccion() as db:
+            # El antirrebote va primero: bloquea la fila del email hasta el commit,
+            # así la elección Entrada/Salida no compite con otros escaneos
+            previo = reclamar_escaneo(db.cursor, email, clave)
+            estudiante = get_or_create_estudiante(db, qr_info)
+
+            if previo:
+                # Escaneo repetido: se devuelve el registro anterior
+                registro_id, tipo_registro = previo['registro_id'], previo['tipo']
+            else:
+                registro_id, tipo_registro = create_registro_from_qr(db, estudiante)
 
         return format_response({
             'success': True,
+            'duplicado': bool(previo),
             'estudiante': {
                 'id': estudiante['id'],
                 'nombre': estudiante['nombre'],
@@ -106,31 +91,33 @@ def get_qr_status(email):
         if not validate_email(email):
             return jsonify({'error': 'Email inválido'}), 400
 
-        # Buscar estudiante
         query_estudiante = "SELECT * FROM usuarios_estudiantes WHERE email = %s"
-        estudiante = execute_query_qr(query_estudiante, (email.lower(),), fetch_one=True)
-
-        if not estudiante:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
-
-        # Obtener último registro del día
         query_ultimo = """
         SELECT tipo, hora, fecha
         FROM EST_registros
-        WHERE email = %s AND DATE(fecha) = CURDATE()
-        ORDER BY fecha DESC, hora DESC
+        WHERE email = %s AND fecha >= %s AND fecha < %s
+        ORDER BY fecha DESC, hora DESC, id DESC
         LIMIT 1
         """
 
-        ultimo_registro = execute_query_qr(query_ultimo, (email.lower(),), fetch_one=True)
+        with consulta() as db:
+            # Buscar estudiante
+            estudiante = db.leer_uno(query_estudiante, (email.lower(),))
+
+            if not estudiante:
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
+
+            # Obtener último registro del día
+            desde, hasta = rango_fechas('hoy')
+            ultimo_registro = db.leer_uno(query_ultimo, (email.lower(), desde, hasta))
 
         # Determinar estado actual
         if ultimo_registro:
-            presente = ultimo_registro[0] == 'Entrada'  # tipo
+            presente = ultimo_registro['tipo'] == 'Entrada'
             ultimo_movimiento = {
-                'tipo': ultimo_registro[0],
-                'hora': str(ultimo_registro[1]),
-                'fecha': ultimo_registro[2].strftime('%Y-%m-%d') if hasattr(ultimo_registro[2], 'strftime') else str(ultimo_registro[2])
+                'tipo': ultimo_registro['tipo'],
+                'hora': format_hora(ultimo_registro['hora']),
+                'fecha': ultimo_registro['fecha'].strftime('%Y-%m-%d') if hasattr(ultimo_registro['fecha'], 'strftime') else str(ultimo_registro['fecha'])
             }
         else:
             presente = False
@@ -138,11 +125,11 @@ def get_qr_status(email):
 
         return format_response({
             'estudiante': {
-                'id': estudiante[0],  # id
-                'nombre': estudiante[1],  # nombre
-                'apellido': estudiante[2],  # apellido
-                'email': estudiante[3],  # email
-                'activo': bool(estudiante[4])  # activo
+                'id': estudiante['id'],
+                'nombre': estudiante['nombre'],
+                'apellido': estudiante['apellido'],
+                'email': estudiante['email'],
+                'activo': bool(estudiante['activo'])
             },
             'presente': presente,
             'ultimo_movimiento': ultimo_movimiento,
@@ -152,100 +139,100 @@ def get_qr_status(email):
     except Exception as e:
         return handle_error(e, "Error al obtener estado QR")
 
-def get_or_create_estudiante(qr_info):
-    """Busca un estudiante o lo crea si no existe"""
-    try:
-        email = qr_info['email'].strip().lower()
+def get_or_create_estudiante(db, qr_info):
+    """Busca un estudiante o lo crea si no existe (dentro de la transacción `db`)"""
+    email = qr_info['email'].strip().lower()
 
-        # Buscar estudiante existente
-        query_search = "SELECT * FROM usuarios_estudiantes WHERE email = %s"
-        estudiante = execute_query_qr(query_search, (email,), fetch_one=True)
-
-        if estudiante:
-            return {
-                'id': estudiante[0],
-                'nombre': estudiante[1],
-                'apellido': estudiante[2],
-                'email': estudiante[3],
-                'activo': estudiante[4],
-                'TP': estudiante[5] if len(estudiante) > 5 else 'No especificado'
-            }
+    # Buscar estudiante existente
+    query_search = "SELECT * FROM usuarios_estudiantes WHERE email = %s"
+    estudiante = db.leer_uno(query_search, (email,))
 
-        # Crear nuevo estudiante
-        query_insert = """
-        INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
-        VALUES (%s, %s, %s, 1, 'No especificado')
-        """
-
-        result = execute_query_qr(query_insert, (
-            qr_info['name'].strip(),
-            qr_info['surname'].strip(),
-            email
-        ))
-
-        # Retornar el estudiante recién creado
+    if estudiante:
         return {
-            'id': result['last_insert_id'],
-            'nombre': qr_info['name'].strip(),
-            'apellido': qr_info['surname'].strip(),
-            'email': email,
-            'activo': True,
-            'TP': 'No especificado'
+            'id': estudiante['id'],
+            'nombre': estudiante['nombre'],
+            'apellido': estudiante['apellido'],
+            'email': estudiante['email'],
+            'activo': estudiante['activo'],
+            'TP': estudiante.get('TP') or 'No especificado'
         }
 
-    except Exception as e:
-        logging.error(f"Error al obtener/crear estudiante: {e}")
-        return None
-
-def determine_registro_type(email):
+    # Crear nuevo estudiante
+    query_insert = """
+    INSERT INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
+    VALUES (%s, %s, %s, 1, 'No especificado')
+    """
+
+    result = db.escribir(query_insert, (
+        qr_info['name'].strip(),
+        qr_info['surname'].strip(),
+        email
+    ))
+
+    # Retornar el estudiante recién creado
+    return {
+        'id': result['last_insert_id'],
+        'nombre': qr_info['name'].strip(),
+        'apellido': qr_info['surname'].strip(),
+        'email': email,
+        'activo': True,
+        'TP': 'No especificado'
+    }
+
+def determine_registro_type(db, email):
     """Determina si el próximo registro debe ser entrada o salida"""
-    try:
-        # Obtener el último registro del día
-        query = """
+    # Obtener el último registro del día
+    desde, hasta = rango_fechas('hoy')
+    ultimo_registro = db.leer_uno("""
         SELECT tipo
         FROM EST_registros
-        WHERE email = %s AND DATE(fecha) = CURDATE()
-        ORDER BY fecha DESC, hora DESC
+        WHERE email = %s AND fecha >= %s AND fecha < %s
+        ORDER BY fecha DESC, hora DESC, id DESC
         LIMIT 1
-        """
-
-        ultimo_registro = execute_query_qr(query, (email,), fetch_one=True)
-
-        if not ultimo_registro:
-            return 'Entrada'  # Primera vez del día
-
-        # Alternar entre entrada y salida
-        return 'Salida' if ultimo_registro[0] == 'Entrada' else 'Entrada'
-
-    except Exception as e:
-        logging.error(f"Error al determinar tipo de registro: {e}")
-        return 'Entrada'  # Default a entrada en caso de error
-
-def create_registro_from_qr(estudiante, tipo_registro, qr_info):
-    """Crea un registro basado en datos del QR"""
-    try:
-        now = datetime.now()
-
-        query = """
-        INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
-        """
-
-        result = execute_query_qr(query, (
-            now.date(),
-            now.time(),
-            now.strftime('%A'),
-            estudiante['nombre'],
-            estudiante['apellido'],
-            estudiante['email'],
-            tipo_registro
-        ))
-
-        return result['last_insert_id']
-
-    except Exception as e:
-        logging.error(f"Error al crear registro desde QR: {e}")
-        raise
+    """, (email, desde, hasta))
+
+    if not ultimo_registro:
+        return 'Entrada'  # Primera vez del día
+
+    # Alternar entre entrada y salida
+    return 'Salida' if ultimo_registro['tipo'] == 'Entrada' else 'Entrada'
+
+def create_registro_from_qr(db, estudiante):
+    """
+    Crea un registro basado en datos del QR dentro de la transacción `db`,
+    después de `reclamar_escaneo`.
+
+    Returns:
+        Tupla (registro_id, tipo)
+    """
+    now = get_current_datetime()
+    fecha = now.strftime('%Y-%m-%d')
+    hora = now.strftime('%H:%M:%S')
+    tipo_registro = determine_registro_type(db, estudiante['email'])
+
+    query = """
+    INSERT INTO EST_registros (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
+    """
+    result = db.escribir(query, (
+        fecha,
+        hora,
+        now.strftime('%A'),
+        estudiante['nombre'],
+        estudiante['apellido'],
+        estudiante['email'],
+        tipo_registro
+    ))
+    registro_id = result['last_insert_id']
+    completar_escaneo(db.cursor, estudiante['email'], registro_id, tipo_registro)
+    registrar_movimiento(db.cursor, estudiante['email'], TIPO_ESTUDIANTE, tipo_registro,
+                         estudiante['nombre'], estudiante['apellido'], fecha, hora)
+    marcar_estado_usuario(db.cursor, estudiante['email'], estudiante['nombre'], estudiante['apellido'],
+                          tipo_registro)
+    publicar_registro(db.cursor, POBLACION_ESTUDIANTES, registro_id, estudiante['email'],
+                      estudiante['nombre'], estudiante['apellido'], fecha, hora, tipo_registro)
+
+    return registro_id, tipo_registro
 
 @qr_bp.route('/qr/history/<email>', methods=['GET'])
 def get_qr_history(email):
@@ -268,22 +255,23 @@ def get_qr_history(email):
             CONCAT(fecha, ' ', hora) as timestamp_completo
         FROM EST_registros
         WHERE email = %s
-        AND fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        AND fecha >= %s AND fecha < %s
         ORDER BY fecha DESC, hora DESC
         LIMIT %s
         """
 
-        registros = execute_query_qr(query, (email.lower(), days, limit))
+        desde, hasta = rango_fechas('ultimos_dias', dias=days)
+        registros = leer(query, (email.lower(), desde, hasta, limit))
 
         # Formatear respuesta
         formatted_registros = []
         for reg in registros:
             formatted_registros.append({
-                'id': reg[0],  # id
-                'fecha': reg[1].strftime('%Y-%m-%d') if hasattr(reg[1], 'strftime') else str(reg[1]),  # fecha
-                'hora': str(reg[2]),  # hora
-                'tipo': reg[3],  # tipo
-                'timestamp': reg[4].strftime('%Y-%m-%d %H:%M:%S') if hasattr(reg[4], 'strftime') else str(reg[4])  # timestamp_completo
+                'id': reg['id'],
+                'fecha': reg['fecha'].strftime('%Y-%m-%d') if hasattr(reg['fecha'], 'strftime') else str(reg['fecha']),
+                'hora': format_hora(reg['hora']),
+                'tipo': reg['tipo'],
+                'timestamp': str(reg['timestamp_completo'])
             })
 
         return format_response({
@@ -1,30 +1,40 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime
 from database import get_connection
 from utils.datetime_utils import get_current_datetime
 from config import Config
+from utils.horas_ledger import actualizar_dia
+from utils.cumplimiento_semana import actualizar_cumplimiento_dia
+from utils.presence import registrar_movimiento, marcar_estado_usuario, TIPO_AYUDANTE, TIPO_ESTUDIANTE
+from utils.eventos import publicar_registro, POBLACION_AYUDANTES, POBLACION_ESTUDIANTES
+from utils.paginacion import leer_filtros_registros, paginar_registros, FiltroInvalido
 
 registros_bp = Blueprint('registros', __name__)
 
 @registros_bp.route('/registros', methods=['GET'])
 def get_registros():
-    """Obtener todos los registros"""
+    """
+    Obtener registros paginados por cursor, del más reciente al más antiguo.
+
+    Filtros: email, desde, hasta, tipo, auto_generado. Paginación: limit y
+    cursor (el `next_cursor` de la página anterior).
+    """
+    try:
+        filtros = leer_filtros_registros(request.args)
+    except FiltroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = get_connection()
         with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM registros ORDER BY fecha DESC, hora DESC")
-            registros = cursor.fetchall()
-            
-            # Convertir valores problemáticos
-            for reg in registros:
-                for key, value in reg.items():
-                    if isinstance(value, datetime):
-                        reg[key] = value.isoformat()
-                    elif isinstance(value, timedelta):
-                        reg[key] = str(value)
+            registros, paginacion = paginar_registros(cursor, """
+                SELECT r.id, r.fecha, r.hora, r.dia, r.nombre, r.apellido,
+                       r.email, r.tipo, r.auto_generado, r.created_at
+                FROM registros r
+            """, filtros, 'r')
         
         conn.close()
-        return jsonify(registros)
+        return jsonify({"registros": registros, "paginacion": paginacion})
     except Exception as e:
         print(f"Error en get_registros: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -45,23 +55,9 @@ def get_registros_hoy():
             """, (today,))
             registros = cursor.fetchall()
             
-            # Convertir a formato serializable
-            serializable_registros = []
-            for reg in registros:
-                serializable_reg = {}
-                for key, value in reg.items():
-                    if isinstance(value, datetime):
-                        serializable_reg[key] = value.isoformat()
-                    elif isinstance(value, timedelta):
-                        serializable_reg[key] = str(value)
-                    elif hasattr(value, 'isoformat') and callable(value.isoformat):
-                        serializable_reg[key] = value.isoformat()
-                    else:
-                        serializable_reg[key] = value
-                serializable_registros.append(serializable_reg)
-            
         conn.close()
-        return jsonify(serializable_registros if serializable_registros else [])
+        # Fechas y horas las serializa el provider JSON de la aplicación
+        return jsonify(list(registros))
     except Exception as e:
         print(f"Error al obtener registros de hoy: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -131,6 +127,13 @@ def add_registro():
                     fecha, hora, dia,
                     data['nombre'], data['apellido'], email, tipo
                 ))
+                registro_id = cursor.lastrowid
+                poblacion = POBLACION_AYUDANTES
+                registrar_movimiento(cursor, email, TIPO_AYUDANTE, tipo,
+                                     data['nombre'], data['apellido'], fecha, hora)
+                actualizar_dia(cursor, email, fecha)
+                if tipo == 'Salida':
+                    actualizar_cumplimiento_dia(cursor, email, fecha, now=now)
             elif is_student:
                 # Insertar en tabla de estudiantes (EST_registros)
                 query = """
@@ -142,30 +145,23 @@ def add_registro():
                     fecha, hora, dia,
                     data['nombre'], data['apellido'], email, tipo
                 ))
+                registro_id = cursor.lastrowid
+                poblacion = POBLACION_ESTUDIANTES
+                registrar_movimiento(cursor, email, TIPO_ESTUDIANTE, tipo,
+                                     data['nombre'], data['apellido'], fecha, hora)
             else:
                 # Usuario no encontrado en ninguna tabla
                 conn.close()
                 return jsonify({"error": "Usuario no autorizado", "reason": "not_found"}), 403
             
             # Actualizar el estado del usuario
-            cursor.execute("""
-                INSERT INTO estado_usuarios (email, nombre, apellido, estado, 
-                    ultima_entrada, ultima_salida)
-                VALUES (%s, %s, %s, %s, 
-                    CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
-                    CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
-                ON DUPLICATE KEY UPDATE 
-                    estado = %s, 
-                    ultima_entrada = CASE WHEN %s = 'dentro' THEN NOW() ELSE ultima_entrada END,
-                    ultima_salida = CASE WHEN %s = 'fuera' THEN NOW() ELSE ultima_salida END
-            """, (
-                email, data['nombre'], data['apellido'], nuevo_estado, 
-                nuevo_estado, nuevo_estado,
-                nuevo_estado, nuevo_estado, nuevo_estado
-            ))
+            marcar_estado_usuario(cursor, email, data['nombre'], data['apellido'], tipo)
+
+            # Notificar a los clientes SSE (se difunde al confirmar)
+            publicar_registro(cursor, poblacion, registro_id, email,
+                              data['nombre'], data['apellido'], fecha, hora, tipo)
             
             conn.commit()
-            registro_id = cursor.lastrowid
             
         conn.close()
         return jsonify({
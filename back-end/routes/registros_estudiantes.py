@@ -1,45 +1,17 @@
 # routes/registros_estudiantes.py - Rutas para manejo de registros de estudiantes (Migrado a API unificada)
 from flask import Blueprint, request, jsonify
-from database import get_connection
+from repositorio import consulta, transaccion, leer, leer_uno
 from utils.helpers import format_response, handle_error
+from utils.paginacion import leer_filtros_registros, paginar_registros, FiltroInvalido
+from utils.datetime_utils import get_current_datetime, rango_fechas, condicion_rango_fecha
+from utils.presence import recalcular_presencia, TIPO_ESTUDIANTE
 from datetime import datetime, timedelta
 import logging
 
 registros_estudiantes_bp = Blueprint('registros_estudiantes', __name__)
 
-def execute_query_registros(query, params=None, fetch_one=False):
-    """Ejecuta consulta con conexión PyMySQL para registros de estudiantes"""
-    connection = get_connection()
-    try:
-        # Usar DictCursor para obtener diccionarios en lugar de tuplas
-        import pymysql
-        cursor = connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute(query, params or ())
-
-        if query.strip().upper().startswith('SELECT'):
-            if fetch_one:
-                result = cursor.fetchone()
-            else:
-                result = cursor.fetchall()
-        else:
-            connection.commit()
-            result = {
-                'affected_rows': cursor.rowcount,
-                'last_insert_id': cursor.lastrowid
-            }
-
-        return result
-    except Exception as e:
-        connection.rollback()
-        raise e
-    finally:
-        connection.close()
-
-@registros_estudiantes_bp.route('/registros_estudiantes', methods=['GET'])
-def get_registros():
-    """Obtiene todos los registros de estudiantes"""
-    try:
-        query = """
+# Columnas comunes de los listados de registros de estudiantes
+SELECT_REGISTROS = """
         SELECT
             er.id,
             er.fecha,
@@ -52,11 +24,45 @@ def get_registros():
             ue.id as estudianteId
         FROM EST_registros er
         LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        ORDER BY er.fecha DESC, er.hora DESC
+"""
+
+def registros_en_rango(desde, hasta, orden="er.fecha DESC, er.hora DESC"):
+    """Registros con fecha en [desde, hasta), filtrando la columna sin funciones"""
+    condicion, params = condicion_rango_fecha('er.fecha', desde, hasta)
+    query = f"""{SELECT_REGISTROS}
+        WHERE {condicion}
+        ORDER BY {orden}
         """
+    return leer(query, params)
 
-        registros = execute_query_registros(query)
-        return format_response(format_registros(registros))
+def paginar_registros_estudiantes(db, select_sql, filtros, params_select=()):
+    """Ejecuta una página de EST_registros y la formatea para la respuesta"""
+    registros, paginacion = paginar_registros(
+        db.cursor, select_sql, filtros, 'er',
+        params_select=params_select, campo_hora='horaRegistro'
+    )
+
+    return format_response({
+        'registros': format_registros(registros),
+        'paginacion': paginacion
+    })
+
+@registros_estudiantes_bp.route('/registros_estudiantes', methods=['GET'])
+def get_registros():
+    """
+    Obtiene registros de estudiantes paginados por cursor.
+
+    Filtros: email, desde, hasta, tipo, auto_generado. Paginación: limit y
+    cursor (el `next_cursor` de la página anterior).
+    """
+    try:
+        filtros = leer_filtros_registros(request.args)
+    except FiltroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with consulta() as db:
+            return paginar_registros_estudiantes(db, SELECT_REGISTROS, filtros)
 
     except Exception as e:
         return handle_error(e, "Error al obtener registros")
@@ -65,24 +71,8 @@ def get_registros():
 def get_registros_hoy():
     """Obtiene los registros de hoy"""
     try:
-        query = """
-        SELECT
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE DATE(er.fecha) = CURDATE()
-        ORDER BY er.hora DESC
-        """
-
-        registros = execute_query_registros(query)
+        desde, hasta = rango_fechas('hoy')
+        registros = registros_en_rango(desde, hasta, orden="er.hora DESC")
         return format_response(format_registros(registros))
 
     except Exception as e:
@@ -92,24 +82,8 @@ def get_registros_hoy():
 def get_registros_semana():
     """Obtiene los registros de esta semana"""
     try:
-        query = """
-        SELECT
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE YEARWEEK(er.fecha, 1) = YEARWEEK(CURDATE(), 1)
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-
-        registros = execute_query_registros(query)
+        desde, hasta = rango_fechas('semana')
+        registros = registros_en_rango(desde, hasta)
         return format_response(format_registros(registros))
 
     except Exception as e:
@@ -119,24 +93,8 @@ def get_registros_semana():
 def get_registros_mes():
     """Obtiene los registros de este mes"""
     try:
-        query = """
-        SELECT
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE YEAR(er.fecha) = YEAR(CURDATE()) AND MONTH(er.fecha) = MONTH(CURDATE())
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-
-        registros = execute_query_registros(query)
+        desde, hasta = rango_fechas('mes')
+        registros = registros_en_rango(desde, hasta)
         return format_response(format_registros(registros))
 
     except Exception as e:
@@ -154,29 +112,11 @@ def get_registros_entre_fechas():
 
         try:
             # Validar formato de fechas
-            datetime.strptime(inicio, '%Y-%m-%d')
-            datetime.strptime(fin, '%Y-%m-%d')
+            desde, hasta = rango_fechas('entre', inicio=inicio, fin=fin)
         except ValueError:
             return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
 
-        query = """
-        SELECT
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            ue.id as estudianteId
-        FROM EST_registros er
-        LEFT JOIN usuarios_estudiantes ue ON er.email = ue.email
-        WHERE er.fecha BETWEEN %s AND %s
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
-
-        registros = execute_query_registros(query, (inicio, fin))
+        registros = registros_en_rango(desde, hasta)
         return format_response(format_registros(registros))
 
     except Exception as e:
@@ -216,16 +156,21 @@ def create_registro():
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
 
-        result = execute_query_registros(query, (
-            fecha,
-            hora,
-            fecha.strftime('%A'),  # Día de la semana
-            data['nombre'].strip(),
-            data['apellido'].strip(),
-            data['email'].strip().lower(),
-            data['tipo'].capitalize(),
-            data.get('auto_generado', False)
-        ))
+        email = data['email'].strip().lower()
+        with transaccion() as db:
+            result = db.escribir(query, (
+                fecha,
+                hora,
+                fecha.strftime('%A'),  # Día de la semana
+                data['nombre'].strip(),
+                data['apellido'].strip(),
+                email,
+                data['tipo'].capitalize(),
+                data.get('auto_generado', False)
+            ))
+            # Un registro manual de hoy puede cambiar quién está dentro (con cualquier hora)
+            if fecha == get_current_datetime().date():
+                recalcular_presencia(db.cursor, email, TIPO_ESTUDIANTE, fecha)
 
         return format_response({
             'id': result['last_insert_id'],
@@ -256,7 +201,7 @@ def get_registro(registro_id):
         WHERE er.id = %s
         """
 
-        registro = execute_query_registros(query, (registro_id,), fetch_one=True)
+        registro = leer_uno(query, (registro_id,))
 
         if not registro:
             return jsonify({'error': 'Registro no encontrado'}), 404
@@ -271,16 +216,15 @@ def get_registro(registro_id):
 def delete_registro(registro_id):
     """Elimina un registro"""
     try:
-        # Verificar que el registro existe
-        query_exists = "SELECT id FROM EST_registros WHERE id = %s"
-        existing = execute_query_registros(query_exists, (registro_id,), fetch_one=True)
-
-        if not existing:
-            return jsonify({'error': 'Registro no encontrado'}), 404
+        with transaccion() as db:
+            registro = db.leer_uno("SELECT email, fecha FROM EST_registros WHERE id = %s", (registro_id,))
+            if not registro:
+                return jsonify({'error': 'Registro no encontrado'}), 404
 
-        # Eliminar registro
-        query_delete = "DELETE FROM EST_registros WHERE id = %s"
-        execute_query_registros(query_delete, (registro_id,))
+            db.escribir("DELETE FROM EST_registros WHERE id = %s", (registro_id,))
+            # Eliminar un registro de hoy puede cambiar quién está dentro
+            if registro['fecha'] == get_current_datetime().date():
+                recalcular_presencia(db.cursor, registro['email'], TIPO_ESTUDIANTE, registro['fecha'])
 
         return format_response({'mensaje': 'Registro eliminado exitosamente'})
 
@@ -289,34 +233,39 @@ def delete_registro(registro_id):
 
 @registros_estudiantes_bp.route('/registros/estudiante/<estudiante_id>', methods=['GET'])
 def get_registros_estudiante(estudiante_id):
-    """Obtiene todos los registros de un estudiante específico"""
+    """Obtiene los registros de un estudiante, paginados por cursor"""
     try:
-        # Obtener email del estudiante
-        query_estudiante = "SELECT email FROM usuarios_estudiantes WHERE id = %s"
-        estudiante = execute_query_registros(query_estudiante, (estudiante_id,), fetch_one=True)
+        filtros = leer_filtros_registros(request.args)
+    except FiltroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Registros del estudiante con su email; `estudianteId` es el id recibido
+    query = """
+    SELECT
+        er.id,
+        er.fecha,
+        er.hora as horaRegistro,
+        er.nombre as nombreEstudiante,
+        er.apellido as apellidoEstudiante,
+        '' as rutEstudiante,
+        er.email,
+        LOWER(er.tipo) as tipoRegistro,
+        %s as estudianteId
+    FROM EST_registros er
+    """
 
-        if not estudiante:
-            return jsonify({'error': 'Estudiante no encontrado'}), 404
+    try:
+        # Email del estudiante y página de registros con la misma conexión
+        with consulta() as db:
+            query_estudiante = "SELECT email FROM usuarios_estudiantes WHERE id = %s"
+            estudiante = db.leer_uno(query_estudiante, (estudiante_id,))
 
-        # Obtener registros del estudiante
-        query = """
-        SELECT
-            er.id,
-            er.fecha,
-            er.hora as horaRegistro,
-            er.nombre as nombreEstudiante,
-            er.apellido as apellidoEstudiante,
-            '' as rutEstudiante,
-            er.email,
-            LOWER(er.tipo) as tipoRegistro,
-            %s as estudianteId
-        FROM EST_registros er
-        WHERE er.email = %s
-        ORDER BY er.fecha DESC, er.hora DESC
-        """
+            if not estudiante:
+                return jsonify({'error': 'Estudiante no encontrado'}), 404
 
-        registros = execute_query_registros(query, (estudiante_id, estudiante[0]))  # estudiante[0] es el email
-        return format_response(format_registros(registros))
+            # El email del estudiante reemplaza al del filtro
+            filtros['email'] = estudiante['email']
+            return paginar_registros_estudiantes(db, query, filtros, params_select=(estudiante_id,))
 
     except Exception as e:
         return handle_error(e, "Error al obtener registros del estudiante")
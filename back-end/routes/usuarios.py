@@ -1,7 +1,6 @@
 from flask import Blueprint, jsonify
-from datetime import datetime, date, timedelta
 from database import get_connection
-from utils.datetime_utils import get_current_datetime
+from utils.presence import listar_presentes, TIPO_AYUDANTE
 
 usuarios_bp = Blueprint('usuarios', __name__)
 
@@ -25,39 +24,17 @@ def get_ayudantes_presentes():
         conn = get_connection()
         
         with conn.cursor() as cursor:
-            now = get_current_datetime()
-            today = now.strftime('%Y-%m-%d')
-            
-            # Buscar ayudantes basados en la tabla registros
-            # Un ayudante está presente si su último registro del día es de tipo 'Entrada'
-            cursor.execute("""
-                SELECT r.email, r.nombre, r.apellido, r.hora as ultima_entrada
-                FROM registros r
-                JOIN (
-                    -- Subconsulta para obtener el ID del último registro de cada usuario en el día actual
-                    SELECT email, MAX(id) as last_id
-                    FROM registros
-                    WHERE fecha = %s
-                    GROUP BY email
-                ) as ultimos
-                ON r.id = ultimos.last_id
-                WHERE r.fecha = %s
-                AND r.tipo = 'Entrada'  -- Solo considerar como presentes a quienes su último registro sea Entrada
-                ORDER BY r.hora DESC
-            """, (today, today))
-            
-            ayudantes_dentro = cursor.fetchall()
-            
-            # Formateo de datos
-            for ayudante in ayudantes_dentro:
-                ayudante['estado'] = 'dentro'
-                
-                # Convertir tipos de datos
-                for key, value in list(ayudante.items()):
-                    if isinstance(value, (datetime, date)):
-                        ayudante[key] = value.isoformat()
-                    elif isinstance(value, timedelta):
-                        ayudante[key] = str(value)
+            # Ayudantes dentro según el índice de presencia
+            ayudantes_dentro = [
+                {
+                    'email': p['email'],
+                    'nombre': p['nombre'],
+                    'apellido': p['apellido'],
+                    'ultima_entrada': p['hora_entrada'],
+                    'estado': 'dentro'
+                }
+                for p in listar_presentes(cursor, TIPO_AYUDANTE)
+            ]
         
         conn.close()
         return jsonify(ayudantes_dentro)
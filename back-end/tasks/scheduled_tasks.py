@@ -1,77 +1,359 @@
+# tasks/scheduled_tasks.py - Tareas programadas en proceso
+"""
+Un único `BackgroundScheduler` por proceso ejecuta las tareas llamando
+directamente a su código (sin peticiones HTTP al propio servidor).
+
+Bajo gunicorn cada worker inicia su scheduler, pero cada ejecución pasa por
+`ejecutar_tarea`, que en MySQL:
+
+1. toma el lock `GET_LOCK('tarea:<nombre>', 0)`: si otro worker está
+   ejecutando la misma tarea, se omite;
+2. reclama la hora programada insertando en `tareas_ejecuciones`, cuya clave
+   única (tarea, programada) deja pasar a un solo worker por disparo.
+
+Todas las tareas usan triggers cron en la zona horaria configurada, así que
+los workers calculan las mismas horas de disparo. La fila de cada ejecución
+guarda inicio, fin, duración, estado (en_curso, ok o error) y el resultado.
+La tarea `purga_ejecuciones` borra cada día las filas de más de
+TAREAS_RETENCION_DIAS días, salvo la última de cada tarea.
+
+Recuperación:
+- `misfire_grace_time` y `coalesce`: un disparo atrasado (proceso ocupado o
+  suspendido) se ejecuta una sola vez si no pasó más de TAREAS_MISFIRE_SEGUNDOS.
+- Al iniciar, las tareas marcadas con `recuperar` ejecutan las horas
+  programadas perdidas desde su última ejecución registrada (máximo
+  TAREAS_RECUPERAR_MAX), con la hora programada como "ahora": un cierre diario
+  perdido cierra el día que correspondía.
+"""
+import json
+import os
+import socket
+import time
+from datetime import timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
-import requests
+from apscheduler.triggers.cron import CronTrigger
 from config import Config
+from database import get_connection
+from utils.datetime_utils import get_current_datetime, TIMEZONE
+from utils.cierre_diario import cerrar_salidas_pendientes
+from utils.presence import reconciliar_presencia, TIPO_AYUDANTE, TIPO_ESTUDIANTE
+from utils.eventos import purgar_eventos
+from utils.cumplimiento_semana import barrer_estados, materializar_semana, reiniciar_semana
+from utils.retencion import mantener_registros
+from utils.metricas import medir_tarea, contar_tarea
+
+DDL_TAREAS_EJECUCIONES = """
+CREATE TABLE IF NOT EXISTS tareas_ejecuciones (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tarea VARCHAR(50) NOT NULL,
+    programada DATETIME NOT NULL,
+    inicio DATETIME(3) NOT NULL,
+    fin DATETIME(3) NULL,
+    duracion_ms INT NULL,
+    estado VARCHAR(20) NOT NULL,
+    recuperada BOOLEAN NOT NULL DEFAULT FALSE,
+    worker VARCHAR(100) NOT NULL,
+    resultado TEXT NULL,
+    UNIQUE KEY uk_tarea_programada (tarea, programada),
+    INDEX idx_tarea_inicio (tarea, inicio)
+)
+"""
+
+_scheduler = None
+
+# Cada tarea recibe la hora programada (datetime con zona horaria) y retorna
+# un resultado serializable que queda en tareas_ejecuciones.resultado.
+# Los errores se propagan para que el runner los registre.
 
-def ejecutar_cierre_diario():
-    """Ejecuta el cierre diario de registros sin salida"""
+@medir_tarea('cierre_diario')
+def ejecutar_cierre_diario(programada):
+    """Cierra los registros sin salida del día programado"""
+    conn = get_connection()
     try:
-        # URL del servidor de producción
-        server_url = Config.SERVER_URL
-        
-        # Llamar al endpoint de procesar salidas pendientes
-        response = requests.post(
-            f'{server_url}/api/procesar_salidas_pendientes',
-            json={},
-            verify=True  # En producción, verificar los certificados
-        )
-        
-        if response.status_code == 200:
-            print(f"Cierre diario ejecutado con éxito: {response.json()}")
-        else:
-            print(f"Error en cierre diario: {response.text}")
-    
-    except Exception as e:
-        print(f"Error al ejecutar cierre diario: {str(e)}")
-
-def ejecutar_reinicio_semanal():
-    """Ejecuta el reinicio semanal de cumplimiento"""
+        resultado = cerrar_salidas_pendientes(conn, now=programada)
+    finally:
+        conn.close()
+    print(f"Cierre diario ejecutado: {resultado['registros_creados']} salidas generadas")
+    return {k: v for k, v in resultado.items() if k != 'detalle'}
+
+@medir_tarea('reinicio_semanal')
+def ejecutar_reinicio_semanal(programada):
+    """Archiva el cumplimiento de la semana programada en el historial"""
+    conn = get_connection()
+    try:
+        resultado = reiniciar_semana(conn, now=programada)
+    finally:
+        conn.close()
+    print(f"Reinicio semanal de cumplimiento ejecutado: {resultado}")
+    return resultado
+
+@medir_tarea('reconciliacion_presencia')
+def ejecutar_reconciliacion_presencia(programada):
+    """Recalcula el índice de presencia de ayudantes y estudiantes desde los registros del día"""
+    conn = get_connection()
+    try:
+        resultados = [reconciliar_presencia(conn, tipo) for tipo in (TIPO_AYUDANTE, TIPO_ESTUDIANTE)]
+    finally:
+        conn.close()
+
+    for resultado in resultados:
+        if resultado['antes'] != resultado['despues']:
+            print(f"Presencia reconciliada: {resultado}")
+    return resultados
+
+@medir_tarea('purga_eventos')
+def ejecutar_purga_eventos(programada):
+    """Elimina los eventos SSE más antiguos que la retención configurada"""
+    conn = get_connection()
     try:
-        # URL del servidor de producción
-        server_url = Config.SERVER_URL
-        
-        # Llamar al endpoint de reinicio
-        response = requests.post(
-            f'{server_url}/reiniciar_cumplimiento',
-            json={},
-            verify=True
+        eliminados = purgar_eventos(conn)
+    finally:
+        conn.close()
+
+    if eliminados:
+        print(f"Eventos purgados: {eliminados}")
+    return {'eliminados': eliminados}
+
+@medir_tarea('barrido_cumplimiento')
+def ejecutar_barrido_cumplimiento(programada):
+    """Avanza Pendiente → Atrasado → Ausente en cumplimiento_semana según la hora"""
+    conn = get_connection()
+    try:
+        cambiados = barrer_estados(conn)
+    finally:
+        conn.close()
+
+    if cambiados:
+        print(f"Barrido de cumplimiento: {cambiados} bloques actualizados")
+    return {'cambiados': cambiados}
+
+@medir_tarea('materializacion_cumplimiento')
+def ejecutar_materializacion_cumplimiento(programada):
+    """Reconstruye cumplimiento_semana de la semana actual (horarios o usuarios nuevos)"""
+    conn = get_connection()
+    try:
+        bloques = materializar_semana(conn)
+    finally:
+        conn.close()
+
+    print(f"Cumplimiento materializado: {bloques} bloques")
+    return {'bloques': bloques}
+
+@medir_tarea('mantenimiento_registros')
+def ejecutar_mantenimiento_registros(programada):
+    """Crea las particiones de los próximos meses y, con ARCHIVO_AUTOMATICO, archiva los semestres vencidos"""
+    conn = get_connection()
+    try:
+        resultado = mantener_registros(
+            conn, now=programada, archivar=Config.ARCHIVO_AUTOMATICO, directorio=Config.ARCHIVO_DIR or None
         )
-        
-        if response.status_code == 200:
-            print(f"Reinicio semanal de cumplimiento ejecutado: {response.json()}")
-        else:
-            print(f"Error en reinicio semanal: {response.text}")
-    
-    except Exception as e:
-        print(f"Error al ejecutar reinicio semanal: {str(e)}")
-
-def configurar_tarea_cierre_diario():
+    finally:
+        conn.close()
+
+    print(f"Mantenimiento de registros: {resultado}")
+    return resultado
+
+@medir_tarea('purga_ejecuciones')
+def ejecutar_purga_ejecuciones(programada):
+    """Elimina el historial de tareas_ejecuciones más antiguo que TAREAS_RETENCION_DIAS"""
+    conn = get_connection()
+    try:
+        eliminadas = purgar_ejecuciones(conn, now=programada)
+    finally:
+        conn.close()
+
+    if eliminadas:
+        print(f"Ejecuciones de tareas purgadas: {eliminadas}")
+    return {'eliminadas': eliminadas}
+
+# nombre: (función, campos del trigger cron, recuperar ejecuciones perdidas)
+TAREAS = {
+    'cierre_diario': (ejecutar_cierre_diario, {'hour': 23, 'minute': 59}, True),
+    'reinicio_semanal': (ejecutar_reinicio_semanal, {'day_of_week': 'sun', 'hour': 23, 'minute': 55}, True),
+    'materializacion_cumplimiento': (ejecutar_materializacion_cumplimiento, {'hour': 0, 'minute': 1}, True),
+    'barrido_cumplimiento': (
+        ejecutar_barrido_cumplimiento, {'minute': f'*/{Config.CUMPLIMIENTO_BARRIDO_MINUTOS}'}, False
+    ),
+    'reconciliacion_presencia': (ejecutar_reconciliacion_presencia, {'minute': '*/10'}, False),
+    'purga_eventos': (ejecutar_purga_eventos, {'minute': 0}, False),
+    'mantenimiento_registros': (ejecutar_mantenimiento_registros, {'day': 1, 'hour': 0, 'minute': 20}, True),
+    'purga_ejecuciones': (ejecutar_purga_ejecuciones, {'hour': 3, 'minute': 30}, False),
+}
+
+def _trigger(nombre):
+    return CronTrigger(timezone=TIMEZONE, **TAREAS[nombre][1])
+
+def _worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _texto(momento, milisegundos=False):
+    if milisegundos:
+        return momento.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+def ultima_programada(trigger, now):
+    """Última hora de disparo del trigger que no es posterior a `now`"""
+    for ventana in (timedelta(hours=1), timedelta(days=1), timedelta(days=8)):
+        ultima = None
+        siguiente = trigger.get_next_fire_time(None, now - ventana)
+        while siguiente and siguiente <= now:
+            ultima = siguiente
+            siguiente = trigger.get_next_fire_time(siguiente, siguiente + timedelta(seconds=1))
+        if ultima:
+            return ultima
+    return now.replace(microsecond=0)
+
+def ensure_tareas_ejecuciones_table(conn):
+    """Crea la tabla tareas_ejecuciones si no existe"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_TAREAS_EJECUCIONES)
+    conn.commit()
+
+def ejecutar_tarea(nombre, programada=None, recuperada=False):
     """
-    Configura una tarea programada que se ejecutará diariamente a las 23:59
-    para cerrar los registros sin salida del día.
+    Ejecuta una tarea si este worker obtiene su lock y reclama la hora programada.
+
+    Args:
+        nombre: Clave de TAREAS
+        programada: Hora programada; por defecto, el último disparo del trigger
+        recuperada: True si es una ejecución perdida que se recupera al iniciar
+
+    Returns:
+        'ok', 'error' u 'omitida'
     """
-    # Crear el scheduler
-    scheduler = BackgroundScheduler()
-    
-    # Programar la tarea para ejecutarse TODOS los días a las 23:59 (11:59 PM)
-    scheduler.add_job(ejecutar_cierre_diario, 'cron', hour=23, minute=59)
-    
-    # Iniciar el scheduler
-    scheduler.start()
-    
-    print("Tarea de cierre diario programada para ejecutarse a las 23:59 (11:59 PM)")
+    funcion = TAREAS[nombre][0]
+    if programada is None:
+        programada = ultima_programada(_trigger(nombre), get_current_datetime())
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS obtenido", (f'tarea:{nombre}',))
+            if not cursor.fetchone()['obtenido']:
+                contar_tarea(nombre, 'omitida')
+                return 'omitida'
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT IGNORE INTO tareas_ejecuciones
+                    (tarea, programada, inicio, estado, recuperada, worker)
+                    VALUES (%s, %s, %s, 'en_curso', %s, %s)
+                """, (nombre, _texto(programada), _texto(get_current_datetime(), True),
+                      recuperada, _worker()))
+                ejecucion_id = cursor.lastrowid if cursor.rowcount else None
+            conn.commit()
+            if ejecucion_id is None:
+                # Otro worker ya ejecutó este disparo
+                contar_tarea(nombre, 'omitida')
+                return 'omitida'
+
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(programada)
+                estado = 'ok'
+            except Exception as e:
+                print(f"Error en tarea {nombre}: {e}")
+                resultado = {'error': str(e)}
+                estado = 'error'
+
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE tareas_ejecuciones
+                    SET fin = %s, duracion_ms = %s, estado = %s, resultado = %s
+                    WHERE id = %s
+                """, (_texto(get_current_datetime(), True), int((time.perf_counter() - inicio) * 1000),
+                      estado, json.dumps(resultado, default=str, ensure_ascii=False), ejecucion_id))
+            conn.commit()
+            return estado
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (f'tarea:{nombre}',))
+    finally:
+        conn.close()
 
-def configurar_reinicio_semanal():
+def purgar_ejecuciones(conn, dias=None, now=None):
     """
-    Configura una tarea programada para reiniciar los estados de cumplimiento
-    cada semana (domingos a las 23:55).
+    Elimina las ejecuciones programadas hace más de `dias` días.
+
+    La última ejecución de cada tarea se conserva aunque sea más antigua: la
+    recuperación de disparos perdidos parte de ella (`programadas_perdidas`).
+
+    Returns:
+        Filas eliminadas
     """
-    # Crear el scheduler
-    scheduler = BackgroundScheduler()
-    
-    # Programar la tarea para ejecutarse los domingos a las 23:55
-    scheduler.add_job(ejecutar_reinicio_semanal, 'cron', day_of_week='sun', hour=23, minute=55)
-    
-    # Iniciar el scheduler
+    dias = Config.TAREAS_RETENCION_DIAS if dias is None else dias
+    corte = (now or get_current_datetime()) - timedelta(days=dias)
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            DELETE t FROM tareas_ejecuciones t
+            JOIN (
+                SELECT tarea, MAX(programada) AS ultima
+                FROM tareas_ejecuciones
+                GROUP BY tarea
+            ) u ON u.tarea = t.tarea
+            WHERE t.programada < %s AND t.programada < u.ultima
+        """, (_texto(corte),))
+        eliminadas = cursor.rowcount
+    conn.commit()
+    return eliminadas
+
+def programadas_perdidas(conn, nombre, now, maximo):
+    """Horas de disparo posteriores a la última ejecución registrada y anteriores a `now`"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(programada) AS ultima FROM tareas_ejecuciones WHERE tarea = %s", (nombre,))
+        ultima = cursor.fetchone()['ultima']
+    if ultima is None:
+        # Sin historial (primer despliegue): no hay nada que recuperar
+        return []
+
+    trigger = _trigger(nombre)
+    perdidas = []
+    siguiente = trigger.get_next_fire_time(None, TIMEZONE.localize(ultima) + timedelta(seconds=1))
+    while siguiente and siguiente <= now:
+        perdidas.append(siguiente)
+        siguiente = trigger.get_next_fire_time(siguiente, siguiente + timedelta(seconds=1))
+    return perdidas[-maximo:] if maximo else []
+
+def recuperar_tareas_perdidas():
+    """Ejecuta en orden las horas programadas perdidas de las tareas con `recuperar`"""
+    now = get_current_datetime()
+    conn = get_connection()
+    try:
+        ensure_tareas_ejecuciones_table(conn)
+        pendientes = [
+            (nombre, programada)
+            for nombre, (_, _, recuperar) in TAREAS.items() if recuperar
+            for programada in programadas_perdidas(conn, nombre, now, Config.TAREAS_RECUPERAR_MAX)
+        ]
+    finally:
+        conn.close()
+
+    for nombre, programada in sorted(pendientes, key=lambda p: p[1]):
+        print(f"Recuperando {nombre} programada para {_texto(programada)}")
+        ejecutar_tarea(nombre, programada, recuperada=True)
+
+def iniciar_tareas_programadas():
+    """
+    Inicia el scheduler del proceso con todas las TAREAS (una sola vez por proceso).
+
+    Returns:
+        El BackgroundScheduler en ejecución
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    scheduler = BackgroundScheduler(timezone=TIMEZONE, job_defaults={
+        'coalesce': True,
+        'max_instances': 1,
+        'misfire_grace_time': Config.TAREAS_MISFIRE_SEGUNDOS
+    })
+    for nombre in TAREAS:
+        scheduler.add_job(ejecutar_tarea, _trigger(nombre), args=[nombre], id=nombre, name=nombre)
+    # Recuperación en segundo plano para no retrasar el arranque del worker
+    scheduler.add_job(recuperar_tareas_perdidas, 'date', id='recuperacion', misfire_grace_time=None)
     scheduler.start()
-    
-    print("Tarea de reinicio semanal programada para los domingos a las 23:55")
\ No newline at end of file
+    _scheduler = scheduler
+
+    print(f"Tareas programadas iniciadas en {_worker()}: {', '.join(TAREAS)}")
+    return scheduler
@@ -0,0 +1,96 @@
+# utils/admin_cache.py - Caché de tokens y administradores autenticados
+"""
+Evita que cada petición protegida abra una conexión y consulte `admin_users`
+sólo para autenticarse.
+
+Se guardan dos cachés acotadas por tamaño (LRU) y por antigüedad:
+- tokens: hash SHA-256 del JWT -> (id del admin, expiración del token)
+- admins: id -> fila de `admin_users`
+
+Una fila de admin nunca se usa con más de `ADMIN_CACHE_TTL` segundos de
+antigüedad. Quien modifique o elimine un admin debe llamar a `invalidar_admin`
+en la misma petición; los demás workers de gunicorn lo verán a más tardar al
+vencer el TTL. Con `ADMIN_CACHE_TTL=0` la caché queda desactivada.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+class CacheTTL:
+    """Diccionario LRU con tamaño máximo y antigüedad máxima por entrada"""
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Valor vigente de `clave` o None"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or ahora - entrada[1] > self.ttl:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor):
+        if self.ttl <= 0 or self.maximo <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic())
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def eliminar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {'entradas': len(self._datos), 'aciertos': self.aciertos, 'fallos': self.fallos}
+
+_tokens = CacheTTL(Config.ADMIN_CACHE_MAX, Config.ADMIN_CACHE_TTL)
+_admins = CacheTTL(Config.ADMIN_CACHE_MAX, Config.ADMIN_CACHE_TTL)
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def obtener_token(token):
+    """(admin_id, exp) de un token ya validado, o None si no está en caché"""
+    return _tokens.obtener(hash_token(token))
+
+def guardar_token(token, admin_id, exp):
+    _tokens.guardar(hash_token(token), (admin_id, exp))
+
+def obtener_admin(admin_id):
+    """Copia de la fila en caché del admin, o None"""
+    fila = _admins.obtener(admin_id)
+    return dict(fila) if fila is not None else None
+
+def guardar_admin(fila):
+    _admins.guardar(fila['id'], dict(fila))
+
+def invalidar_admin(admin_id):
+    """Descartar la fila de un admin modificado o eliminado (en este worker)"""
+    _admins.eliminar(admin_id)
+
+def invalidar_todo():
+    _tokens.limpiar()
+    _admins.limpiar()
+
+def get_admin_cache_stats():
+    return {'ttl': Config.ADMIN_CACHE_TTL, 'tokens': _tokens.estadisticas(), 'admins': _admins.estadisticas()}
@@ -1,9 +1,42 @@
 import jwt
 import hashlib
+import time
 from functools import wraps
 from flask import request, jsonify
 from config import Config
 from database import get_connection
+from utils import admin_cache
+
+def _autenticar(token):
+    """
+    Fila de `admin_users` del token, o None si el admin no existe.
+
+    El token decodificado y la fila del admin se toman de `utils.admin_cache`
+    cuando están vigentes; la expiración del token se revisa siempre.
+    """
+    cacheado = admin_cache.obtener_token(token)
+    if cacheado:
+        admin_id, exp = cacheado
+        if exp is not None and time.time() >= exp:
+            raise jwt.ExpiredSignatureError('Signature has expired')
+    else:
+        data = jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
+        admin_id = data['id']
+        admin_cache.guardar_token(token, admin_id, data.get('exp'))
+
+    current_user = admin_cache.obtener_admin(admin_id)
+    if current_user:
+        return current_user
+
+    conn = get_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT * FROM admin_users WHERE id = %s", (admin_id,))
+        current_user = cursor.fetchone()
+    conn.close()
+
+    if current_user:
+        admin_cache.guardar_admin(current_user)
+    return current_user
 
 def token_required(f):
     """Decorador para validar token JWT en endpoints protegidos"""
@@ -15,13 +48,7 @@ def token_required(f):
 
         token = auth_header.split(' ')[1]
         try:
-            data = jwt.decode(token, Config.JWT_SECRET, algorithms=["HS256"])
-            conn = get_connection()
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT * FROM admin_users WHERE id = %s", (data['id'],))
-                current_user = cursor.fetchone()
-            conn.close()
-
+            current_user = _autenticar(token)
             if not current_user:
                 return jsonify({'error': 'Invalid token!'}), 401
         except jwt.ExpiredSignatureError:
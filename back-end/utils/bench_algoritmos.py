@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# utils/bench_algoritmos.py - Micro-benchmarks del cumplimiento y del libro de horas
+"""
+Mide las funciones puras de `utils.cumplimiento_engine` y `utils.horas_ledger`
+con datos en memoria y casos extremos: muchas alternancias Entrada/Salida en
+un día, bloques superpuestos, entradas sin salida y un semestre completo.
+
+Cada caso se mide con tamaño n y 4n. El crecimiento t(4n)/t(n) no depende de
+la máquina: un algoritmo lineal da ~4 y uno cuadrático ~16, así que detecta
+regresiones algorítmicas aunque el runner de CI sea más lento o más rápido.
+
+Uso:
+    python -m utils.bench_algoritmos
+    python -m utils.bench_algoritmos --historial bench.jsonl --guardar --comparar
+
+`--guardar` agrega el resultado al historial (una línea JSON por ejecución) y
+`--comparar` falla (código 1) si algún caso crece más que `--max-crecimiento`
+o es más lento que la última ejecución guardada más allá de `--tolerancia`.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from utils.cumplimiento_engine import evaluar_bloque, evaluar_usuario, evaluar_semana
+from utils.horas_ledger import calcular_horas_dia, calcular_ledger
+from utils.datos_sinteticos import (
+    generar_horarios, generar_registros_ayudantes, email_ayudante, DIAS_HABILES
+)
+
+LUNES = date(2024, 3, 4)
+# Viernes de esa semana a las 23:00: todos los bloques ya ocurrieron
+AHORA = datetime(2024, 3, 8, 23, 0)
+
+def _hora(segundos):
+    """Hora como la entrega PyMySQL (timedelta)"""
+    return timedelta(seconds=segundos)
+
+def _a_time(hora):
+    return (datetime.min + hora).time()
+
+def _desde_texto(hora):
+    hh, mm, ss = (int(x) for x in hora.split(':'))
+    return _hora(hh * 3600 + mm * 60 + ss)
+
+def _alternancias(n, desde=8 * 3600, hasta=23 * 3600):
+    """n eventos alternados repartidos entre `desde` y `hasta` (con microsegundos si n es grande)"""
+    paso = (hasta - desde) / max(n, 1)
+    return [('Entrada' if i % 2 == 0 else 'Salida', _hora(desde + i * paso)) for i in range(n)]
+
+# Cada preparación recibe n y retorna una función sin argumentos a medir
+
+def caso_bloque_alternancias(n):
+    """evaluar_bloque sin salida válida: recorre todas las alternancias del día"""
+    eventos = [(tipo, _a_time(hora)) for tipo, hora in _alternancias(n, 10 * 3600)]
+    inicio, fin = _a_time(_hora(8 * 3600 + 1800)), _a_time(_hora(10 * 3600))
+    return lambda: evaluar_bloque(eventos, inicio, fin)
+
+def caso_bloques_superpuestos(n):
+    """evaluar_usuario con 20 bloques superpuestos el mismo día y n eventos"""
+    horarios = [
+        {'dia': 'lunes', 'hora_entrada': _hora(8 * 3600 + i * 600), 'hora_salida': _hora(12 * 3600 + i * 600)}
+        for i in range(20)
+    ]
+    eventos = {LUNES: [(tipo, _a_time(hora)) for tipo, hora in _alternancias(n, 9 * 3600)]}
+    return lambda: evaluar_usuario(horarios, eventos, LUNES, AHORA)
+
+def caso_horas_alternancias(n):
+    """calcular_horas_dia con n eventos alternados"""
+    eventos = _alternancias(n)
+    return lambda: calcular_horas_dia(eventos)
+
+def caso_horas_sin_pareja(n):
+    """calcular_horas_dia con n entradas y sólo n/10 salidas al final"""
+    entradas = [('Entrada', _hora(8 * 3600 + i)) for i in range(n)]
+    salidas = [('Salida', _hora(20 * 3600 + i)) for i in range(n // 10)]
+    eventos = entradas + salidas
+    return lambda: calcular_horas_dia(eventos)
+
+def caso_ledger_semestre(n):
+    """calcular_ledger sobre el historial de n ayudantes durante 120 días"""
+    azar = random.Random(1)
+    personas = [('Nombre', 'Apellido')] * n
+    dias = [LUNES + timedelta(days=i) for i in range(120)]
+    dias = [d for d in dias if d.weekday() < 5]
+    filas = generar_registros_ayudantes(azar, personas, generar_horarios(azar, n), dias, 0.9)
+    registros = sorted(
+        ({'email': f[5], 'fecha': f[0], 'tipo': f[6], 'hora': _desde_texto(f[1])} for f in filas),
+        key=lambda r: (r['email'], r['fecha'], r['hora'])
+    )
+    return lambda: list(calcular_ledger(registros))
+
+def caso_semana_completa(n):
+    """evaluar_semana con n ayudantes, 4 bloques y 10 eventos por día cada uno"""
+    azar = random.Random(1)
+    usuarios = [{'id': i, 'email': email_ayudante(i)} for i in range(n)]
+    horarios = {
+        i: [{'dia': dia, 'hora_entrada': _hora(entrada.hour * 3600 + entrada.minute * 60),
+             'hora_salida': _hora(salida.hour * 3600 + salida.minute * 60)}
+            for dia, entrada, salida in bloques]
+        for i, bloques in generar_horarios(azar, n).items()
+    }
+    registros = {
+        email_ayudante(i): [
+            {'fecha': LUNES + timedelta(days=d), 'tipo': tipo, 'hora': hora}
+            for d in range(len(DIAS_HABILES)) for tipo, hora in _alternancias(10)
+        ]
+        for i in range(n)
+    }
+    return lambda: evaluar_semana(usuarios, horarios, registros, LUNES, AHORA)
+
+CASOS = {
+    'bloque_alternancias': (caso_bloque_alternancias, 20000),
+    'bloques_superpuestos': (caso_bloques_superpuestos, 5000),
+    'horas_alternancias': (caso_horas_alternancias, 5000),
+    'horas_sin_pareja': (caso_horas_sin_pareja, 5000),
+    'ledger_semestre': (caso_ledger_semestre, 20),
+    'semana_completa': (caso_semana_completa, 100),
+}
+
+def medir(funcion, repeticiones):
+    """Mínimo de `repeticiones` ejecuciones, en segundos (el menos afectado por ruido)"""
+    funcion()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+def ejecutar(nombres, escala, repeticiones):
+    resultados = {}
+    for nombre in nombres:
+        preparar, n = CASOS[nombre]
+        n = max(1, int(n * escala))
+        base = medir(preparar(n), repeticiones)
+        grande = medir(preparar(4 * n), repeticiones)
+        resultados[nombre] = {
+            'n': n,
+            'ms_n': round(base * 1000, 4),
+            'ms_4n': round(grande * 1000, 4),
+            'crecimiento': round(grande / base, 2) if base else None
+        }
+    return resultados
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ultimo_registro(historial):
+    if not historial or not os.path.exists(historial):
+        return None
+    with open(historial, encoding='utf-8') as f:
+        lineas = [linea for linea in f if linea.strip()]
+    return json.loads(lineas[-1]) if lineas else None
+
+def comparar(resultados, anterior, tolerancia, max_crecimiento):
+    """Lista de regresiones (texto) respecto de la ejecución anterior y del crecimiento máximo"""
+    regresiones = []
+    previos = (anterior or {}).get('resultados', {})
+    for nombre, r in resultados.items():
+        if r['crecimiento'] is not None and r['crecimiento'] > max_crecimiento:
+            regresiones.append(f"{nombre}: crecimiento t(4n)/t(n) = {r['crecimiento']} > {max_crecimiento}")
+        previo = previos.get(nombre)
+        if previo and previo['n'] == r['n'] and r['ms_4n'] > previo['ms_4n'] * (1 + tolerancia):
+            regresiones.append(
+                f"{nombre}: {r['ms_4n']} ms vs {previo['ms_4n']} ms en {anterior.get('commit')}"
+            )
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de cumplimiento y horas')
+    parser.add_argument('--casos', default=','.join(CASOS), help='Casos separados por coma')
+    parser.add_argument('--escala', type=float, default=1.0, help='Multiplica el tamaño base de cada caso')
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--historial', default='bench_algoritmos.jsonl', help='Archivo JSONL de resultados')
+    parser.add_argument('--guardar', action='store_true', help='Agregar esta ejecución al historial')
+    parser.add_argument('--comparar', action='store_true', help='Fallar ante regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Aumento relativo permitido respecto de la ejecución anterior')
+    parser.add_argument('--max-crecimiento', type=float, default=8.0,
+                        help='Máximo t(4n)/t(n) permitido (lineal ~4, cuadrático ~16)')
+    args = parser.parse_args()
+
+    nombres = [c for c in args.casos.split(',') if c]
+    desconocidos = set(nombres) - set(CASOS)
+    if desconocidos:
+        raise SystemExit(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    anterior = ultimo_registro(args.historial)
+    resultados = ejecutar(nombres, args.escala, args.repeticiones)
+
+    print(f"{'caso':<24}{'n':>8}{'ms (n)':>12}{'ms (4n)':>12}{'t(4n)/t(n)':>12}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<24}{r['n']:>8}{r['ms_n']:>12.3f}{r['ms_4n']:>12.3f}{r['crecimiento']:>12}")
+
+    if args.guardar:
+        with open(args.historial, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'commit': _commit(),
+                'python': platform.python_version(),
+                'resultados': resultados
+            }) + '\n')
+
+    if args.comparar:
+        regresiones = comparar(resultados, anterior, args.tolerancia, args.max_crecimiento)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
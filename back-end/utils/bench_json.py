@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# utils/bench_json.py - Comparación de la serialización JSON de respuestas
+"""
+Mide el tiempo de serializar una respuesta de registros con el esquema anterior
+(bucle de conversión por fila + encoder de la biblioteca estándar) y con el
+provider actual (`utils.json_encoder.CustomJSONProvider`).
+
+Uso:
+    python -m utils.bench_json --filas 50000 --repeticiones 5
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from flask import Flask
+from utils.json_encoder import CustomJSONProvider, orjson
+
+def generar_registros(filas, semilla=1):
+    """Filas con la forma que entrega PyMySQL para `registros` + `usuarios`"""
+    azar = random.Random(semilla)
+    inicio = date(2024, 3, 4)
+    registros = []
+    for i in range(filas):
+        segundos = azar.randint(8 * 3600, 20 * 3600)
+        registros.append({
+            'id': filas - i,
+            'fecha': inicio + timedelta(days=i % 120),
+            'hora': timedelta(seconds=segundos),
+            'dia': 'lunes',
+            'tipo': 'Entrada' if i % 2 == 0 else 'Salida',
+            'auto_generado': 0,
+            'email': f'ayudante{i % 300}@uai.cl',
+            'nombre': 'Nombre',
+            'apellido': 'Apellido',
+            'created_at': datetime(2024, 3, 4, 8, 0, 0) + timedelta(seconds=i * 37),
+        })
+    return registros
+
+def serializar_anterior(registros):
+    """Esquema anterior: copia convertida fila a fila y luego json.dumps"""
+    serializables = []
+    for reg in registros:
+        serializable = {}
+        for key, value in reg.items():
+            if isinstance(value, (datetime, date)):
+                serializable[key] = value.isoformat()
+            elif isinstance(value, timedelta):
+                serializable[key] = str(value)
+            else:
+                serializable[key] = value
+        serializables.append(serializable)
+    return json.dumps({'registros': serializables}).encode('utf-8')
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), len(resultado)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de serialización JSON')
+    parser.add_argument('--filas', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    registros = generar_registros(args.filas)
+    app = Flask(__name__)
+    app.json = CustomJSONProvider(app)
+
+    def serializar_actual():
+        with app.app_context():
+            return app.json.response({'registros': registros}).get_data()
+
+    anterior, bytes_anterior = medir(lambda: serializar_anterior(registros), args.repeticiones)
+    actual, bytes_actual = medir(serializar_actual, args.repeticiones)
+
+    print(f"Filas: {args.filas}  repeticiones: {args.repeticiones}  orjson: {'sí' if orjson else 'no'}")
+    print(f"Anterior (bucle + json):  {anterior * 1000:8.1f} ms  {bytes_anterior} bytes")
+    print(f"Actual (provider):        {actual * 1000:8.1f} ms  {bytes_actual} bytes")
+    print(f"Aceleración: {anterior / actual:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# utils/carga.py - Prueba de carga del backend con latencias por endpoint
+"""
+Lanza hilos con escenarios concurrentes contra un backend en ejecución
+(con MySQL local y los datos de `flask --app app generar-datos`) e informa
+p50/p95/p99 por endpoint.
+
+Escenarios:
+- lector: escaneos en /api/lector/validar con un token del lector firmado
+  con READER_QR_SECRET (nonce nuevo en cada escaneo) para usuarios sintéticos;
+- dashboard: el sondeo de la pantalla principal (presentes, registros de hoy,
+  cumplimiento, horas acumuladas);
+- nocturno: un hilo aparte que ejecuta las tareas de cierre del día cada
+  `--intervalo-nocturno` segundos mientras los otros escenarios siguen activos.
+
+Uso:
+    python -m utils.carga --url https://localhost:5000 --insecure \\
+        --duracion 60 --hilos 16 --escenarios lector,dashboard,nocturno
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+import jwt
+import requests
+from utils.datos_sinteticos import email_ayudante, email_estudiante
+
+DASHBOARD = [
+    ('GET', '/api/ayudantes_presentes'),
+    ('GET', '/api/registros_hoy'),
+    ('GET', '/api/estudiantes/estudiantes_presentes'),
+    ('GET', '/api/estado_usuarios'),
+    ('GET', '/api/cumplimiento'),
+    ('GET', '/api/horas_acumuladas'),
+    ('GET', '/api/registros?limit=100'),
+]
+
+NOCTURNO = [
+    ('POST', '/api/procesar_salidas_pendientes'),
+    ('POST', '/api/presencia/reconciliar'),
+    ('POST', '/api/reiniciar_cumplimiento'),
+]
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+class Resultados:
+    """Latencias y errores por endpoint; cada hilo escribe en su propia instancia"""
+
+    def __init__(self):
+        self.latencias = {}
+        self.errores = {}
+
+    def registrar(self, endpoint, duracion, ok):
+        self.latencias.setdefault(endpoint, []).append(duracion)
+        if not ok:
+            self.errores[endpoint] = self.errores.get(endpoint, 0) + 1
+
+    def combinar(self, otro):
+        for endpoint, valores in otro.latencias.items():
+            self.latencias.setdefault(endpoint, []).extend(valores)
+        for endpoint, errores in otro.errores.items():
+            self.errores[endpoint] = self.errores.get(endpoint, 0) + errores
+
+    def resumen(self, duracion):
+        filas = []
+        for endpoint in sorted(self.latencias):
+            valores = sorted(self.latencias[endpoint])
+            filas.append({
+                'endpoint': endpoint,
+                'peticiones': len(valores),
+                'errores': self.errores.get(endpoint, 0),
+                'rps': round(len(valores) / duracion, 2),
+                'p50_ms': round(percentil(valores, 50) * 1000, 1),
+                'p95_ms': round(percentil(valores, 95) * 1000, 1),
+                'p99_ms': round(percentil(valores, 99) * 1000, 1),
+                'max_ms': round(valores[-1] * 1000, 1),
+            })
+        return filas
+
+class Cliente:
+    """Sesión HTTP de un hilo; registra la latencia de cada petición"""
+
+    def __init__(self, args, resultados):
+        self.url = args.url.rstrip('/')
+        self.timeout = args.timeout
+        self.resultados = resultados
+        self.sesion = requests.Session()
+        self.sesion.verify = not args.insecure
+
+    def peticion(self, metodo, ruta, **kwargs):
+        inicio = time.perf_counter()
+        ok = False
+        try:
+            respuesta = self.sesion.request(metodo, self.url + ruta, timeout=self.timeout, **kwargs)
+            # 409 = escaneo en proceso: respuesta esperada de la deduplicación
+            ok = respuesta.status_code < 400 or respuesta.status_code == 409
+        except requests.RequestException:
+            pass
+        self.resultados.registrar(f"{metodo} {ruta.split('?')[0]}", time.perf_counter() - inicio, ok)
+
+def token_lector(secreto, estacion, vigencia=30):
+    """Token equivalente al que muestra el lector, con nonce único"""
+    ahora = int(time.time())
+    nonce = uuid.uuid4().hex
+    return jwt.encode({
+        'station_id': estacion,
+        'nonce': nonce,
+        'jti': nonce,
+        'iat': ahora,
+        'exp': ahora + vigencia
+    }, secreto, algorithm='HS256')
+
+def escenario_lector(cliente, args, azar):
+    if azar.random() < args.proporcion_ayudantes:
+        email = email_ayudante(azar.randrange(args.ayudantes))
+    else:
+        email = email_estudiante(azar.randrange(args.estudiantes))
+    cliente.peticion('POST', '/api/lector/validar', json={
+        'token': token_lector(args.secreto, args.estacion),
+        'nombre': 'Carga',
+        'apellido': 'Sintética',
+        'email': email
+    })
+
+def escenario_dashboard(cliente, args, azar):
+    metodo, ruta = azar.choice(DASHBOARD)
+    cliente.peticion(metodo, ruta)
+
+ESCENARIOS = {
+    'lector': escenario_lector,
+    'dashboard': escenario_dashboard,
+}
+
+def _hilo_usuario(n, args, escenarios, fin, resultados):
+    azar = random.Random(args.semilla + n)
+    cliente = Cliente(args, resultados)
+    while time.monotonic() < fin:
+        ESCENARIOS[azar.choice(escenarios)](cliente, args, azar)
+        if args.pausa:
+            time.sleep(azar.uniform(0, 2 * args.pausa))
+
+def _hilo_nocturno(args, fin, resultados):
+    cliente = Cliente(args, resultados)
+    while time.monotonic() < fin:
+        for metodo, ruta in NOCTURNO:
+            cliente.peticion(metodo, ruta)
+        time.sleep(min(args.intervalo_nocturno, max(0, fin - time.monotonic())))
+
+def ejecutar(args):
+    escenarios = [e for e in args.escenarios.split(',') if e]
+    desconocidos = set(escenarios) - set(ESCENARIOS) - {'nocturno'}
+    if desconocidos:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+    if 'lector' in escenarios and not args.secreto:
+        raise SystemExit("El escenario lector requiere --secreto o READER_QR_SECRET")
+
+    por_hilo = []
+    hilos = []
+    inicio = time.monotonic()
+    fin = inicio + args.duracion
+    concurrentes = [e for e in escenarios if e != 'nocturno']
+    if concurrentes:
+        for n in range(args.hilos):
+            resultados = Resultados()
+            por_hilo.append(resultados)
+            hilos.append(threading.Thread(target=_hilo_usuario, args=(n, args, concurrentes, fin, resultados)))
+    if 'nocturno' in escenarios:
+        resultados = Resultados()
+        por_hilo.append(resultados)
+        hilos.append(threading.Thread(target=_hilo_nocturno, args=(args, fin, resultados)))
+
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    total = Resultados()
+    for resultados in por_hilo:
+        total.combinar(resultados)
+    return total.resumen(time.monotonic() - inicio)
+
+def imprimir(filas):
+    print(f"{'endpoint':<48}{'n':>8}{'err':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for f in filas:
+        print(f"{f['endpoint']:<48}{f['peticiones']:>8}{f['errores']:>6}{f['rps']:>8}"
+              f"{f['p50_ms']:>9}{f['p95_ms']:>9}{f['p99_ms']:>9}{f['max_ms']:>9}")
+    print("(latencias en ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga con latencias por endpoint')
+    parser.add_argument('--url', default='https://localhost:5000')
+    parser.add_argument('--insecure', action='store_true', help='No verificar el certificado TLS')
+    parser.add_argument('--duracion', type=float, default=60, help='Segundos de prueba')
+    parser.add_argument('--hilos', type=int, default=16, help='Usuarios concurrentes')
+    parser.add_argument('--escenarios', default='lector,dashboard', help='lector, dashboard y/o nocturno')
+    parser.add_argument('--pausa', type=float, default=0.0, help='Pausa media entre peticiones de un hilo (s)')
+    parser.add_argument('--intervalo-nocturno', type=float, default=15, help='Segundos entre tareas nocturnas')
+    parser.add_argument('--secreto', default=os.getenv('READER_QR_SECRET'), help='Secreto del lector')
+    parser.add_argument('--estacion', default=os.getenv('READER_STATION_ID', 'carga'))
+    parser.add_argument('--ayudantes', type=int, default=40, help='Ayudantes sintéticos generados')
+    parser.add_argument('--estudiantes', type=int, default=800, help='Estudiantes sintéticos generados')
+    parser.add_argument('--proporcion-ayudantes', type=float, default=0.2,
+                        help='Fracción de escaneos hechos por ayudantes')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Imprimir el resumen como JSON')
+    args = parser.parse_args()
+
+    if args.insecure:
+        requests.packages.urllib3.disable_warnings()
+
+    filas = ejecutar(args)
+    if args.json:
+        print(json.dumps(filas, ensure_ascii=False, indent=2))
+    else:
+        imprimir(filas)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# utils/cierre_diario.py - Cierre automático de registros sin salida
+"""
+Genera una Salida automática para cada ayudante y estudiante que sigue dentro
+al final del día. Lo usan `POST /api/procesar_salidas_pendientes` y la tarea
+programada de cierre diario, que lo llama directamente (sin pasar por HTTP).
+
+El cierre trabaja por conjuntos, en una sola transacción y con un número fijo
+de consultas sin importar cuántas personas quedaron dentro:
+
+1. una consulta (UNION ALL) encuentra las sesiones abiertas de ambas
+   poblaciones: personas cuyo último registro del día es una Entrada;
+2. un INSERT de varias filas por tabla (`registros` y `EST_registros`) escribe
+   las Salidas, y una consulta por tabla recupera sus ids;
+3. un UPDATE deja `fuera` a todos en `estado_usuarios`, un DELETE vacía su
+   presencia y un UPDATE recalcula los contadores;
+4. los eventos SSE se publican en un solo INSERT y el libro de horas y el
+   cumplimiento se actualizan por lote para los ayudantes.
+
+La hora de las Salidas es CIERRE_HORA (o la hora del cierre si está vacía) y
+nunca anterior a la Entrada. Con CIERRE_FIN_BLOQUE, un ayudante que entró antes
+del fin de su último bloque del día sale a la hora de fin de ese bloque.
+"""
+from datetime import datetime
+from config import Config
+from utils.datetime_utils import get_current_datetime, format_hora
+from utils.horas_ledger import actualizar_dias
+from utils.cumplimiento_engine import dia_a_indice
+from utils.cumplimiento_semana import actualizar_cumplimiento_dias
+from utils.presence import TIPO_AYUDANTE, TIPO_ESTUDIANTE, TABLAS_REGISTROS
+from utils.eventos import publicar_registros, POBLACION_AYUDANTES, POBLACION_ESTUDIANTES
+
+POBLACIONES = {
+    TIPO_AYUDANTE: POBLACION_AYUDANTES,
+    TIPO_ESTUDIANTE: POBLACION_ESTUDIANTES
+}
+
+def normalizar_hora(valor):
+    """'HH:MM' o 'HH:MM:SS' → 'HH:MM:SS'; ValueError si el formato es inválido"""
+    for formato in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(str(valor).strip(), formato).strftime('%H:%M:%S')
+        except ValueError:
+            continue
+    raise ValueError(f"Hora de cierre inválida: {valor!r}")
+
+def _sesiones_abiertas(cursor, fecha):
+    """Última Entrada sin Salida posterior del día, para ayudantes y estudiantes"""
+    partes = []
+    params = []
+    for tipo_usuario, tabla in TABLAS_REGISTROS.items():
+        partes.append(f"""
+            SELECT '{tipo_usuario}' AS tipo_usuario, r.email, r.nombre, r.apellido, r.hora
+            FROM (
+                SELECT email, nombre, apellido, hora, tipo,
+                       ROW_NUMBER() OVER (PARTITION BY email ORDER BY hora DESC, id DESC) AS orden
+                FROM {tabla}
+                WHERE fecha = %s
+            ) r
+            WHERE r.orden = 1 AND r.tipo = 'Entrada'
+        """)
+        params.append(fecha)
+    cursor.execute(" UNION ALL ".join(partes), params)
+    return cursor.fetchall()
+
+def _fin_de_bloques(cursor, emails, fecha):
+    """{email: [hora_salida de cada bloque del día]} para los ayudantes indicados"""
+    if not emails:
+        return {}
+    cursor.execute(f"""
+        SELECT u.email, h.dia, h.hora_salida
+        FROM horarios_asignados h
+        JOIN usuarios_permitidos u ON h.usuario_id = u.id
+        WHERE u.email IN ({', '.join(['%s'] * len(emails))})
+    """, emails)
+    dia = datetime.strptime(fecha, '%Y-%m-%d').weekday()
+    fines = {}
+    for h in cursor.fetchall():
+        if dia_a_indice(h['dia']) == dia:
+            fines.setdefault(h['email'], []).append(format_hora(h['hora_salida']))
+    return fines
+
+def _hora_salida(sesion, hora_cierre, fines_bloque):
+    entrada = format_hora(sesion['hora'])
+    if sesion['tipo_usuario'] == TIPO_AYUDANTE:
+        # Fin del último bloque del día que termina después de la Entrada
+        fines = [fin for fin in fines_bloque.get(sesion['email'], []) if fin > entrada]
+        if fines:
+            return max(fines)
+    return max(hora_cierre, entrada)
+
+def cerrar_salidas_pendientes(conn, now=None, hora_cierre=None):
+    """
+    Cierra las sesiones abiertas del día de `now` para ambas poblaciones.
+
+    Args:
+        conn: Conexión a la base de datos
+        now: datetime del cierre (por defecto, el actual); define la fecha procesada
+        hora_cierre: 'HH:MM[:SS]' de las Salidas; por defecto CIERRE_HORA o la hora de `now`
+
+    Returns:
+        Dict con fecha_procesada, hora_cierre, registros_creados, totales por
+        población y detalle
+    """
+    now = now or get_current_datetime()
+    fecha = now.strftime("%Y-%m-%d")
+    hora_cierre = normalizar_hora(hora_cierre or Config.CIERRE_HORA or now.strftime("%H:%M:%S"))
+    dia = Config.DIAS_SEMANA.get(now.strftime("%A"), now.strftime("%A"))
+
+    with conn.cursor() as cursor:
+        sesiones = _sesiones_abiertas(cursor, fecha)
+
+        fines_bloque = {}
+        if Config.CIERRE_FIN_BLOQUE:
+            fines_bloque = _fin_de_bloques(
+                cursor, sorted({s['email'] for s in sesiones if s['tipo_usuario'] == TIPO_AYUDANTE}), fecha
+            )
+
+        detalle = []
+        for tipo_usuario, tabla in TABLAS_REGISTROS.items():
+            salidas = [
+                {
+                    'poblacion': POBLACIONES[tipo_usuario],
+                    'email': s['email'],
+                    'nombre': s['nombre'],
+                    'apellido': s['apellido'],
+                    'fecha': fecha,
+                    'hora': _hora_salida(s, hora_cierre, fines_bloque),
+                    'tipo': 'Salida'
+                }
+                for s in sesiones if s['tipo_usuario'] == tipo_usuario
+            ]
+            if not salidas:
+                continue
+
+            # Todos los valores como parámetros: así PyMySQL reconoce el INSERT
+            # (RE_INSERT_VALUES) y envía un solo INSERT de varias filas
+            cursor.executemany(f"""
+                INSERT INTO {tabla} (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, [(fecha, s['hora'], dia, s['nombre'], s['apellido'], s['email'], 'Salida', 1) for s in salidas])
+
+            # Ids de las Salidas recién insertadas (la más reciente de cada email)
+            cursor.execute(f"""
+                SELECT email, MAX(id) AS id
+                FROM {tabla}
+                WHERE fecha = %s AND tipo = 'Salida' AND auto_generado = 1
+                AND email IN ({', '.join(['%s'] * len(salidas))})
+                GROUP BY email
+            """, [fecha] + [s['email'] for s in salidas])
+            ids = {fila['email']: fila['id'] for fila in cursor.fetchall()}
+            for s in salidas:
+                s['id'] = ids.get(s['email'])
+            detalle.extend(salidas)
+
+        # Nadie queda dentro después del cierre
+        cursor.execute("""
+            UPDATE estado_usuarios
+            SET estado = 'fuera', ultima_salida = %s
+            WHERE estado = 'dentro'
+        """, (f"{fecha} {hora_cierre}",))
+
+        if detalle:
+            cursor.execute(
+                f"DELETE FROM presencia WHERE email IN ({', '.join(['%s'] * len(detalle))})",
+                [s['email'] for s in detalle]
+            )
+            cursor.execute("""
+                UPDATE presencia_contador c
+                SET dentro = (SELECT COUNT(*) FROM presencia p WHERE p.tipo_usuario = c.tipo_usuario)
+            """)
+            publicar_registros(cursor, detalle)
+
+            # Libro de horas y cumplimiento de los ayudantes con Salida generada
+            dias_afectados = [(s['email'], fecha) for s in detalle if s['poblacion'] == POBLACION_AYUDANTES]
+            actualizar_dias(cursor, dias_afectados)
+            actualizar_cumplimiento_dias(cursor, dias_afectados, now=now)
+
+    conn.commit()
+
+    return {
+        'fecha_procesada': fecha,
+        'hora_cierre': hora_cierre,
+        'registros_creados': len(detalle),
+        'ayudantes': sum(1 for s in detalle if s['poblacion'] == POBLACION_AYUDANTES),
+        'estudiantes': sum(1 for s in detalle if s['poblacion'] == POBLACION_ESTUDIANTES),
+        'detalle': detalle
+    }
@@ -0,0 +1,309 @@
+# utils/cumplimiento_engine.py - Motor de cálculo de cumplimiento semanal
+from datetime import timedelta, date
+from utils.datetime_utils import get_current_datetime, convert_to_time
+from utils.retencion import origen_registros
+from config import Config
+
+# Índice de día de la semana (lunes = 0) para nombres en inglés y español
+DIAS_INDICE = {
+    'monday': 0, 'lunes': 0,
+    'tuesday': 1, 'martes': 1,
+    'wednesday': 2, 'miércoles': 2, 'miercoles': 2,
+    'thursday': 3, 'jueves': 3,
+    'friday': 4, 'viernes': 4,
+    'saturday': 5, 'sábado': 5, 'sabado': 5,
+    'sunday': 6, 'domingo': 6
+}
+
+RAZON_CUMPLIDO = "Entrada a tiempo/antes y salida a tiempo/después"
+
+def dia_a_indice(dia):
+    """Convierte un nombre de día (inglés o español) a índice 0-6, o None si no se reconoce"""
+    return DIAS_INDICE.get(str(dia or '').strip().lower())
+
+def _razon_incompleto(t_entrada, t_salida, hora_entrada, hora_salida):
+    if hora_entrada < t_entrada < hora_salida and t_salida >= hora_salida:
+        return "Entrada tarde y salida a tiempo/después"
+    if t_entrada <= hora_entrada and t_salida < hora_salida:
+        return "Entrada a tiempo/antes y salida temprana"
+    return "Presencia parcial en el bloque"
+
+def emparejar_bloque(eventos, hora_entrada, hora_salida):
+    """
+    Evalúa un bloque horario contra los eventos de un día.
+
+    Args:
+        eventos: Lista de tuplas (tipo, hora) en orden de registro (id ascendente)
+        hora_entrada: datetime.time de inicio del bloque
+        hora_salida: datetime.time de término del bloque
+
+    Returns:
+        Tupla (cumplido, incompleto, razon, indice_entrada, indice_salida);
+        los índices señalan en `eventos` la entrada y la salida que decidieron
+        el resultado (None si no hubo)
+
+    Un bloque se cumple si existe una entrada a tiempo seguida de una salida
+    posterior al término del bloque. Se recorre la lista una sola vez llevando
+    la entrada más temprana vista hasta el momento.
+    """
+    primera_entrada = None
+    indice_primera = None
+    incompleto = False
+    razon = "Sin registros suficientes"
+    indices = (None, None)
+
+    for i, (tipo, hora) in enumerate(eventos):
+        if tipo == 'Entrada':
+            if primera_entrada is None or hora < primera_entrada:
+                primera_entrada = hora
+                indice_primera = i
+            continue
+
+        if tipo != 'Salida' or primera_entrada is None:
+            continue
+
+        if primera_entrada <= hora_entrada and hora >= hora_salida:
+            return True, False, RAZON_CUMPLIDO, indice_primera, i
+
+        if not incompleto and primera_entrada < hora_salida and (primera_entrada <= hora_entrada or hora > hora_entrada):
+            incompleto = True
+            razon = _razon_incompleto(primera_entrada, hora, hora_entrada, hora_salida)
+            indices = (indice_primera, i)
+
+    return (False, incompleto, razon) + indices
+
+def evaluar_bloque(eventos, hora_entrada, hora_salida):
+    """Como `emparejar_bloque`, sin los índices: tupla (cumplido, incompleto, razon)"""
+    return emparejar_bloque(eventos, hora_entrada, hora_salida)[:3]
+
+def estado_bloque(cumplido, incompleto, fecha_bloque, hora_entrada, hora_salida, now):
+    """
+    Determina el estado de un bloque según su evaluación y el momento actual.
+
+    Returns:
+        Tupla (estado, razon) o (estado, None) si se mantiene la razón de la evaluación
+    """
+    if cumplido:
+        return "Cumplido", None
+    if incompleto:
+        return "Incompleto", None
+
+    hoy = now.date()
+    if fecha_bloque is not None and fecha_bloque > hoy:
+        return "Pendiente", "El bloque aún no ha comenzado"
+
+    if fecha_bloque == hoy:
+        now_t = now.time().replace(microsecond=0, tzinfo=None)
+        if now_t < hora_entrada:
+            return "Pendiente", "El bloque aún no ha comenzado"
+        if now_t < hora_salida:
+            return "Atrasado", "El bloque está en curso pero no hay registro de entrada"
+        return "Ausente", "El bloque ya pasó y no hubo asistencia completa"
+
+    return "Ausente", "No hay registros válidos para este bloque"
+
+def estado_usuario(total_bloques, cumplidos, incompletos, ausentes, pendientes):
+    """Estado general de la semana a partir de los contadores de bloques"""
+    if total_bloques == 0:
+        return "No Aplica"
+    if pendientes > 0 and ausentes == 0 and incompletos == 0:
+        return "Pendiente"
+    if cumplidos == total_bloques:
+        return "Cumple"
+    if ausentes == total_bloques:
+        return "Ausente"
+    if incompletos > 0 or (cumplidos > 0 and ausentes > 0):
+        return "Incompleto"
+    return "No Cumple"
+
+def evaluar_usuario(horarios, eventos_por_fecha, inicio_semana, now):
+    """
+    Evalúa todos los bloques de un usuario para la semana.
+
+    Args:
+        horarios: Filas de horarios_asignados del usuario
+        eventos_por_fecha: Dict fecha -> lista de (tipo, hora) ordenada por id
+        inicio_semana: date del lunes de la semana evaluada
+        now: datetime actual (zona horaria configurada)
+
+    Returns:
+        Dict con bloques, bloques_info, análisis por bloque, contadores y estado.
+        En el análisis, indice_entrada/indice_salida apuntan a los eventos del
+        día del bloque que decidieron su evaluación.
+    """
+    bloques = []
+    bloques_info = []
+    analisis = []
+    cumplidos = incompletos = ausentes = pendientes = 0
+    # Entradas/salidas por fecha: se cuentan una vez aunque haya varios bloques el mismo día
+    conteos_por_fecha = {}
+
+    for h in horarios:
+        hora_entrada = convert_to_time(h['hora_entrada'])
+        hora_salida = convert_to_time(h['hora_salida'])
+        indice = dia_a_indice(h['dia'])
+        fecha_bloque = inicio_semana + timedelta(days=indice) if indice is not None else None
+        eventos = eventos_por_fecha.get(fecha_bloque, []) if fecha_bloque else []
+        if fecha_bloque not in conteos_por_fecha:
+            entradas = sum(1 for tipo, _ in eventos if tipo == 'Entrada')
+            conteos_por_fecha[fecha_bloque] = (entradas, len(eventos) - entradas)
+        entradas, salidas = conteos_por_fecha[fecha_bloque]
+
+        cumplido, incompleto, razon, indice_entrada, indice_salida = emparejar_bloque(
+            eventos, hora_entrada, hora_salida
+        )
+        estado, razon_estado = estado_bloque(cumplido, incompleto, fecha_bloque, hora_entrada, hora_salida, now)
+        if razon_estado:
+            razon = razon_estado
+
+        if estado == "Cumplido":
+            cumplidos += 1
+        elif estado in ("Incompleto", "Atrasado"):
+            incompletos += 1
+        elif estado == "Pendiente":
+            pendientes += 1
+        else:
+            ausentes += 1
+
+        bloque_label = f"{h['dia']} {h['hora_entrada']}-{h['hora_salida']}"
+        bloques.append(bloque_label)
+        bloques_info.append({"bloque": bloque_label, "estado": estado})
+        analisis.append({
+            "horario": h,
+            "fecha": fecha_bloque,
+            "hora_entrada": hora_entrada,
+            "hora_salida": hora_salida,
+            "entradas": entradas,
+            "salidas": salidas,
+            "registros": len(eventos),
+            "cumplio": cumplido,
+            "incompleto": incompleto,
+            "indice_entrada": indice_entrada,
+            "indice_salida": indice_salida,
+            "estado": estado,
+            "razon": razon
+        })
+
+    return {
+        "bloques": bloques,
+        "bloques_info": bloques_info,
+        "analisis": analisis,
+        "cumplidos": cumplidos,
+        "incompletos": incompletos,
+        "ausentes": ausentes,
+        "pendientes": pendientes,
+        "estado": estado_usuario(len(horarios), cumplidos, incompletos, ausentes, pendientes)
+    }
+
+def cargar_datos_semana(cursor, inicio_semana, fecha_fin, email=None, emails=None):
+    """
+    Carga usuarios, horarios y registros entre dos fechas (inclusivas) en tres consultas.
+
+    Sin `email` ni `emails` se cargan todos los usuarios activos; con `email`
+    sólo ese usuario y con `emails` sólo esos (estén o no activos). Un rango
+    anterior al semestre actual lee también los registros archivados.
+
+    Returns:
+        Tupla (usuarios, horarios_por_usuario, registros_por_email)
+    """
+    if email is not None:
+        emails = [email]
+    if emails:
+        filtro_usuario = f"u.email IN ({', '.join(['%s'] * len(emails))})"
+        params_usuario = tuple(emails)
+    else:
+        filtro_usuario = "u.activo = 1"
+        params_usuario = ()
+
+    cursor.execute(f"SELECT u.* FROM usuarios_permitidos u WHERE {filtro_usuario} ORDER BY u.id", params_usuario)
+    usuarios = cursor.fetchall()
+
+    cursor.execute(f"""
+        SELECT h.*
+        FROM horarios_asignados h
+        JOIN usuarios_permitidos u ON h.usuario_id = u.id
+        WHERE {filtro_usuario}
+        ORDER BY h.usuario_id, h.id
+    """, params_usuario)
+    horarios_por_usuario = {}
+    for h in cursor.fetchall():
+        horarios_por_usuario.setdefault(h['usuario_id'], []).append(h)
+
+    cursor.execute(f"""
+        SELECT r.id, r.fecha, r.hora, r.dia, r.tipo, r.email
+        FROM {origen_registros('registros', inicio_semana)} r
+        JOIN usuarios_permitidos u ON r.email = u.email
+        WHERE {filtro_usuario}
+          AND r.fecha BETWEEN %s AND %s
+        ORDER BY r.email, r.fecha, r.id
+    """, params_usuario + (inicio_semana, fecha_fin))
+    registros_por_email = {}
+    for r in cursor.fetchall():
+        registros_por_email.setdefault(r['email'], []).append(r)
+
+    return usuarios, horarios_por_usuario, registros_por_email
+
+def agrupar_eventos_por_fecha(registros):
+    """Agrupa registros (ya ordenados por fecha, id) en dict fecha -> [(tipo, hora)]"""
+    eventos_por_fecha = {}
+    for r in registros:
+        fecha = r['fecha']
+        if not isinstance(fecha, date):
+            fecha = date.fromisoformat(str(fecha))
+        eventos_por_fecha.setdefault(fecha, []).append((r['tipo'], convert_to_time(r['hora'])))
+    return eventos_por_fecha
+
+def evaluar_semana(usuarios, horarios_por_usuario, registros_por_email, inicio_semana, now):
+    """
+    Evalúa la semana de todos los usuarios con datos ya cargados (sin base de datos).
+
+    Args:
+        usuarios: Filas de usuarios_permitidos
+        horarios_por_usuario: Dict usuario_id -> filas de horarios_asignados
+        registros_por_email: Dict email -> registros ordenados por fecha, id
+        inicio_semana: date del lunes de la semana evaluada
+        now: datetime actual (zona horaria configurada)
+
+    Returns:
+        Lista con, por cada usuario, sus datos, horarios, registros y evaluación
+    """
+    resultado = []
+    for user in usuarios:
+        horarios = horarios_por_usuario.get(user['id'], [])
+        registros = registros_por_email.get(user['email'], [])
+        evaluacion = evaluar_usuario(horarios, agrupar_eventos_por_fecha(registros), inicio_semana, now)
+        resultado.append({
+            "usuario": user,
+            "horarios": horarios,
+            "registros": registros,
+            "evaluacion": evaluacion
+        })
+    return resultado
+
+def calcular_cumplimiento_semana(cursor, now=None, email=None):
+    """
+    Calcula el cumplimiento de la semana actual con un número constante de consultas.
+
+    Returns:
+        Dict con la información de la semana y una lista `usuarios` con, por
+        cada usuario, sus datos, horarios, registros y evaluación
+    """
+    now = now or get_current_datetime()
+    inicio_semana = (now - timedelta(days=now.weekday())).date()
+    fin_semana = inicio_semana + timedelta(days=6)
+    hoy = now.date()
+
+    usuarios, horarios_por_usuario, registros_por_email = cargar_datos_semana(
+        cursor, inicio_semana.isoformat(), hoy.isoformat(), email=email
+    )
+    resultado = evaluar_semana(usuarios, horarios_por_usuario, registros_por_email, inicio_semana, now)
+
+    dia_actual = now.strftime('%A').lower()
+    return {
+        "now": now,
+        "inicio_semana": inicio_semana,
+        "fin_semana": fin_semana,
+        "dia_actual": dia_actual,
+        "dia_actual_esp": Config.DIAS_TRADUCCION.get(dia_actual, dia_actual),
+        "usuarios": resultado
+    }
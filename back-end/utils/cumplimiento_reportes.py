@@ -0,0 +1,188 @@
+# utils/cumplimiento_reportes.py - Reportes de cumplimiento por rango de fechas
+"""
+Evalúa cualquier rango de fechas para cualquier conjunto de ayudantes con el
+motor de `utils.cumplimiento_engine`, cargando usuarios, horarios y registros
+del rango en tres consultas y evaluando cada semana en memoria.
+
+El resultado trae el detalle por bloque, los totales por día y por semana y un
+resumen del rango. `backfill_historial` usa la misma evaluación para reescribir
+`historial_cumplimiento` de semanas pasadas desde los registros originales.
+
+Con `procesos > 1` la evaluación se reparte por usuario entre procesos
+(pensado para la CLI y rangos de un semestre; dentro de un worker de gunicorn
+se evalúa en el mismo proceso).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from utils.cumplimiento_engine import (
+    cargar_datos_semana, agrupar_eventos_por_fecha, evaluar_usuario, estado_usuario
+)
+from utils.cumplimiento_semana import DDL_HISTORIAL_CUMPLIMIENTO
+from utils.datetime_utils import get_current_datetime, format_hora
+
+# Máximo de días que acepta el endpoint de reportes
+MAX_DIAS_REPORTE = 370
+
+def _lunes(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+def _contadores(estados):
+    cumplidos = estados.count("Cumplido")
+    incompletos = estados.count("Incompleto") + estados.count("Atrasado")
+    pendientes = estados.count("Pendiente")
+    ausentes = len(estados) - cumplidos - incompletos - pendientes
+    return {
+        "total": len(estados),
+        "cumplidos": cumplidos,
+        "incompletos": incompletos,
+        "ausentes": ausentes,
+        "pendientes": pendientes,
+        "estado": estado_usuario(len(estados), cumplidos, incompletos, ausentes, pendientes)
+    }
+
+def evaluar_usuario_rango(tarea):
+    """
+    Evalúa un usuario en un rango; recibe una tupla para poder repartirse entre procesos.
+
+    Args:
+        tarea: (usuario, horarios, registros, desde, hasta, now) con fechas inclusivas
+
+    Returns:
+        Dict con usuario, bloques, dias, semanas y resumen
+    """
+    usuario, horarios, registros, desde, hasta, now = tarea
+    eventos_por_fecha = agrupar_eventos_por_fecha(registros)
+
+    bloques = []
+    semanas = []
+    estados_por_dia = {}
+    semana = _lunes(desde)
+    while semana <= hasta:
+        evaluacion = evaluar_usuario(horarios, eventos_por_fecha, semana, now)
+        estados_semana = []
+        for analisis in evaluacion["analisis"]:
+            fecha = analisis["fecha"]
+            if fecha is None or not desde <= fecha <= hasta:
+                continue
+            estados_semana.append(analisis["estado"])
+            estados_por_dia.setdefault(fecha, []).append(analisis["estado"])
+            bloques.append({
+                "fecha": fecha.isoformat(),
+                "dia": analisis["horario"]["dia"],
+                "hora_entrada": format_hora(analisis["hora_entrada"]),
+                "hora_salida": format_hora(analisis["hora_salida"]),
+                "estado": analisis["estado"],
+                "razon": analisis["razon"],
+                "entradas": analisis["entradas"],
+                "salidas": analisis["salidas"]
+            })
+        if estados_semana:
+            semanas.append({
+                "semana_inicio": semana.isoformat(),
+                "semana_fin": (semana + timedelta(days=6)).isoformat(),
+                **_contadores(estados_semana)
+            })
+        semana += timedelta(days=7)
+
+    dias = [
+        {"fecha": fecha.isoformat(), **_contadores(estados)}
+        for fecha, estados in sorted(estados_por_dia.items())
+    ]
+    return {
+        "usuario": {
+            "id": usuario["id"],
+            "nombre": usuario["nombre"],
+            "apellido": usuario["apellido"],
+            "email": usuario["email"]
+        },
+        "bloques": bloques,
+        "dias": dias,
+        "semanas": semanas,
+        "resumen": _contadores([b["estado"] for b in bloques])
+    }
+
+def evaluar_rango(usuarios, horarios_por_usuario, registros_por_email, desde, hasta, now, procesos=1):
+    """Evalúa todos los usuarios en el rango [desde, hasta], en paralelo si `procesos` > 1"""
+    tareas = [
+        (u, horarios_por_usuario.get(u["id"], []), registros_por_email.get(u["email"], []), desde, hasta, now)
+        for u in usuarios
+    ]
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            return list(executor.map(
+                evaluar_usuario_rango, tareas, chunksize=max(1, len(tareas) // (procesos * 4))
+            ))
+    return [evaluar_usuario_rango(tarea) for tarea in tareas]
+
+def reporte_cumplimiento(conn, desde, hasta, emails=None, now=None, procesos=1):
+    """
+    Reporte de cumplimiento entre dos fechas inclusivas.
+
+    Args:
+        conn: Conexión a la base de datos
+        desde, hasta: date inclusivas
+        emails: Lista de emails; por defecto, todos los usuarios activos
+        now: datetime de referencia para los bloques futuros o en curso
+        procesos: Procesos para evaluar usuarios en paralelo
+
+    Returns:
+        Lista con el reporte de cada usuario (ver `evaluar_usuario_rango`)
+    """
+    now = now or get_current_datetime()
+    with conn.cursor() as cursor:
+        usuarios, horarios_por_usuario, registros_por_email = cargar_datos_semana(
+            cursor, desde.isoformat(), hasta.isoformat(), emails=emails
+        )
+    return evaluar_rango(usuarios, horarios_por_usuario, registros_por_email, desde, hasta, now, procesos)
+
+def backfill_historial(conn, desde, hasta, emails=None, now=None, procesos=1):
+    """
+    Reescribe historial_cumplimiento para las semanas completas entre dos fechas.
+
+    Se evalúan las semanas (lunes a domingo) que contienen `desde` y `hasta`,
+    hasta la semana actual inclusive. Sólo se reemplazan las filas de esas
+    semanas de los usuarios reevaluados (los activos, o los `emails` indicados),
+    así que repetir el backfill no duplica el historial y no borra el de
+    ayudantes que hoy están inactivos.
+
+    Las semanas pasadas se juzgan con los `horarios_asignados` actuales.
+
+    Returns:
+        Dict con las semanas procesadas y las filas escritas
+    """
+    now = now or get_current_datetime()
+    inicio = _lunes(desde)
+    fin = min(_lunes(hasta), _lunes(now.date())) + timedelta(days=6)
+    if fin < inicio:
+        return {"semanas": 0, "filas": 0}
+
+    reportes = reporte_cumplimiento(conn, inicio, fin, emails=emails, now=now, procesos=procesos)
+    filas = []
+    for reporte in reportes:
+        usuario = reporte["usuario"]
+        for semana in reporte["semanas"]:
+            filas.append((
+                usuario["id"], usuario["email"], usuario["nombre"], usuario["apellido"],
+                semana["semana_inicio"], semana["semana_fin"], semana["estado"],
+                semana["cumplidos"], semana["incompletos"], semana["ausentes"]
+            ))
+
+    usuario_ids = [reporte["usuario"]["id"] for reporte in reportes]
+
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_HISTORIAL_CUMPLIMIENTO)
+        if usuario_ids:
+            cursor.execute(f"""
+                DELETE FROM historial_cumplimiento
+                WHERE semana_inicio BETWEEN %s AND %s
+                AND usuario_id IN ({', '.join(['%s'] * len(usuario_ids))})
+            """, [inicio.isoformat(), fin.isoformat()] + usuario_ids)
+        if filas:
+            cursor.executemany("""
+                INSERT INTO historial_cumplimiento
+                (usuario_id, email, nombre, apellido, semana_inicio, semana_fin,
+                 estado, cumplidos, incompletos, ausentes)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, filas)
+    conn.commit()
+    return {"semanas": ((fin - inicio).days + 1) // 7, "filas": len(filas)}
@@ -0,0 +1,391 @@
+# utils/cumplimiento_semana.py - Cumplimiento semanal materializado por bloque
+"""
+`cumplimiento_semana` guarda una fila por bloque de `horarios_asignados` y
+semana, con su estado y los registros de entrada/salida que lo decidieron.
+
+- Una `Salida` de ayudante es el único evento que puede cambiar la evaluación
+  de un bloque, así que se llama a `actualizar_cumplimiento_dias` en la misma
+  transacción que la inserta (igual que el libro de horas).
+- Los estados que dependen sólo del reloj (Pendiente → Atrasado → Ausente)
+  los avanza `barrer_estados`, un UPDATE periódico sobre el índice de estado;
+  la lectura del dashboard además los recalcula con la hora actual.
+- `materializar_semana` reconstruye la semana completa con el motor de
+  `utils.cumplimiento_engine` (al iniciar, cada noche y si la semana no existe).
+"""
+from datetime import date, timedelta
+from utils.cumplimiento_engine import (
+    cargar_datos_semana, evaluar_usuario, estado_bloque, estado_usuario, dia_a_indice
+)
+from utils.datetime_utils import get_current_datetime, convert_to_time
+
+DDL_CUMPLIMIENTO_SEMANA = """
+CREATE TABLE IF NOT EXISTS cumplimiento_semana (
+    semana_inicio DATE NOT NULL,
+    horario_id INT NOT NULL,
+    usuario_id INT NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    fecha DATE NULL,
+    bloque VARCHAR(60) NOT NULL,
+    hora_entrada TIME NOT NULL,
+    hora_salida TIME NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    razon VARCHAR(120) NULL,
+    cumplido BOOLEAN NOT NULL DEFAULT FALSE,
+    incompleto BOOLEAN NOT NULL DEFAULT FALSE,
+    entrada_id INT NULL,
+    salida_id INT NULL,
+    entradas INT NOT NULL DEFAULT 0,
+    salidas INT NOT NULL DEFAULT 0,
+    evaluado_at DATETIME NOT NULL,
+    PRIMARY KEY (semana_inicio, horario_id),
+    INDEX idx_semana_usuario (semana_inicio, usuario_id),
+    INDEX idx_estado_fecha (estado, fecha)
+)
+"""
+
+DDL_HISTORIAL_CUMPLIMIENTO = """
+CREATE TABLE IF NOT EXISTS historial_cumplimiento (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT,
+    email VARCHAR(255),
+    nombre VARCHAR(100),
+    apellido VARCHAR(100),
+    semana_inicio DATE,
+    semana_fin DATE,
+    estado VARCHAR(50),
+    cumplidos INT,
+    incompletos INT,
+    ausentes INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def inicio_semana(fecha):
+    """Lunes de la semana de `fecha`"""
+    return fecha - timedelta(days=fecha.weekday())
+
+def _fecha(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+
+def _filas_usuario(semana, usuario_id, email, horarios, registros, now):
+    """Evalúa los bloques de un usuario y retorna las filas de la tabla"""
+    eventos_por_fecha = {}
+    registros_por_fecha = {}
+    for r in registros:
+        fecha = _fecha(r['fecha'])
+        eventos_por_fecha.setdefault(fecha, []).append((r['tipo'], convert_to_time(r['hora'])))
+        registros_por_fecha.setdefault(fecha, []).append(r['id'])
+
+    evaluacion = evaluar_usuario(horarios, eventos_por_fecha, semana, now)
+    evaluado_at = now.strftime('%Y-%m-%d %H:%M:%S')
+    filas = []
+    for bloque, analisis in zip(evaluacion['bloques'], evaluacion['analisis']):
+        ids = registros_por_fecha.get(analisis['fecha'], [])
+        entrada_id = ids[analisis['indice_entrada']] if analisis['indice_entrada'] is not None else None
+        salida_id = ids[analisis['indice_salida']] if analisis['indice_salida'] is not None else None
+        filas.append((
+            semana, analisis['horario']['id'], usuario_id, email, analisis['fecha'], bloque[:60],
+            analisis['hora_entrada'].strftime('%H:%M:%S'), analisis['hora_salida'].strftime('%H:%M:%S'),
+            analisis['estado'], (analisis['razon'] or '')[:120],
+            analisis['cumplio'], analisis['incompleto'], entrada_id, salida_id,
+            analisis['entradas'], analisis['salidas'], evaluado_at
+        ))
+    return filas
+
+def _upsert_filas(cursor, filas):
+    if not filas:
+        return
+    cursor.executemany("""
+        INSERT INTO cumplimiento_semana
+        (semana_inicio, horario_id, usuario_id, email, fecha, bloque, hora_entrada, hora_salida,
+         estado, razon, cumplido, incompleto, entrada_id, salida_id, entradas, salidas, evaluado_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            usuario_id = VALUES(usuario_id),
+            email = VALUES(email),
+            fecha = VALUES(fecha),
+            bloque = VALUES(bloque),
+            hora_entrada = VALUES(hora_entrada),
+            hora_salida = VALUES(hora_salida),
+            estado = VALUES(estado),
+            razon = VALUES(razon),
+            cumplido = VALUES(cumplido),
+            incompleto = VALUES(incompleto),
+            entrada_id = VALUES(entrada_id),
+            salida_id = VALUES(salida_id),
+            entradas = VALUES(entradas),
+            salidas = VALUES(salidas),
+            evaluado_at = VALUES(evaluado_at)
+    """, filas)
+
+def actualizar_cumplimiento_dias(cursor, claves, now=None):
+    """
+    Reevalúa los bloques de los pares (email, fecha) indicados.
+
+    Se usa dentro de la transacción que inserta la `Salida`. Sólo lee los
+    horarios de esos usuarios y los registros de esos días (idx_email_fecha).
+    """
+    claves = sorted({(email, _fecha(fecha)) for email, fecha in claves})
+    if not claves:
+        return
+    now = now or get_current_datetime()
+
+    emails = sorted({email for email, _ in claves})
+    marcadores = ", ".join(["%s"] * len(emails))
+    cursor.execute(f"""
+        SELECT h.id, h.usuario_id, h.dia, h.hora_entrada, h.hora_salida, u.email
+        FROM horarios_asignados h
+        JOIN usuarios_permitidos u ON h.usuario_id = u.id
+        WHERE u.email IN ({marcadores})
+        ORDER BY h.usuario_id, h.id
+    """, emails)
+    horarios_por_email = {}
+    for h in cursor.fetchall():
+        horarios_por_email.setdefault(h['email'], []).append(h)
+
+    # Sólo los días con algún bloque asignado
+    claves = [
+        (email, fecha) for email, fecha in claves
+        if any(dia_a_indice(h['dia']) == fecha.weekday() for h in horarios_por_email.get(email, []))
+    ]
+    if not claves:
+        return
+
+    condiciones = " OR ".join(["(email = %s AND fecha = %s)"] * len(claves))
+    params = [valor for email, fecha in claves for valor in (email, fecha.isoformat())]
+    cursor.execute(f"""
+        SELECT id, email, fecha, tipo, hora
+        FROM registros
+        WHERE {condiciones}
+        ORDER BY email, fecha, id
+    """, params)
+    registros = {}
+    for r in cursor.fetchall():
+        registros.setdefault((r['email'], _fecha(r['fecha'])), []).append(r)
+
+    filas = []
+    for email, fecha in claves:
+        horarios_dia = [h for h in horarios_por_email[email] if dia_a_indice(h['dia']) == fecha.weekday()]
+        filas.extend(_filas_usuario(
+            inicio_semana(fecha), horarios_dia[0]['usuario_id'], email,
+            horarios_dia, registros.get((email, fecha), []), now
+        ))
+    _upsert_filas(cursor, filas)
+
+def actualizar_cumplimiento_dia(cursor, email, fecha, now=None):
+    """Reevalúa los bloques de un usuario en una fecha"""
+    actualizar_cumplimiento_dias(cursor, [(email, fecha)], now=now)
+
+def materializar_semana(conn, now=None, semana=None):
+    """
+    Reconstruye todas las filas de una semana (por defecto, la actual).
+
+    Returns:
+        Número de bloques escritos
+    """
+    now = now or get_current_datetime()
+    semana = semana or inicio_semana(now.date())
+    fin = semana + timedelta(days=6)
+
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_CUMPLIMIENTO_SEMANA)
+        usuarios, horarios_por_usuario, registros_por_email = cargar_datos_semana(
+            cursor, semana.isoformat(), fin.isoformat()
+        )
+        filas = []
+        for user in usuarios:
+            horarios = horarios_por_usuario.get(user['id'], [])
+            if horarios:
+                filas.extend(_filas_usuario(
+                    semana, user['id'], user['email'], horarios,
+                    registros_por_email.get(user['email'], []), now
+                ))
+        cursor.execute("DELETE FROM cumplimiento_semana WHERE semana_inicio = %s", (semana,))
+        _upsert_filas(cursor, filas)
+    conn.commit()
+    return len(filas)
+
+def barrer_estados(conn, now=None):
+    """
+    Avanza los bloques sin evaluación (Pendiente/Atrasado) según la hora actual.
+
+    Misma regla que `estado_bloque`, en un único UPDATE indexado por estado.
+
+    Returns:
+        Número de bloques que cambiaron
+    """
+    now = now or get_current_datetime()
+    hoy = now.date().isoformat()
+    ahora = now.strftime('%H:%M:%S')
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE cumplimiento_semana
+            SET estado = CASE
+                    WHEN fecha < %s THEN 'Ausente'
+                    WHEN %s < hora_entrada THEN 'Pendiente'
+                    WHEN %s < hora_salida THEN 'Atrasado'
+                    ELSE 'Ausente'
+                END,
+                razon = CASE
+                    WHEN fecha < %s THEN 'No hay registros válidos para este bloque'
+                    WHEN %s < hora_entrada THEN 'El bloque aún no ha comenzado'
+                    WHEN %s < hora_salida THEN 'El bloque está en curso pero no hay registro de entrada'
+                    ELSE 'El bloque ya pasó y no hubo asistencia completa'
+                END,
+                evaluado_at = %s
+            WHERE estado IN ('Pendiente', 'Atrasado')
+              AND fecha <= %s
+              AND cumplido = 0 AND incompleto = 0
+        """, (hoy, ahora, ahora, hoy, ahora, ahora, now.strftime('%Y-%m-%d %H:%M:%S'), hoy))
+        cambiados = cursor.rowcount
+    conn.commit()
+    return cambiados
+
+def leer_semana(cursor, now=None):
+    """
+    Cumplimiento de la semana actual de los usuarios activos en una consulta.
+
+    Los bloques sin evaluación toman el estado según la hora actual, así que
+    la respuesta no depende de cuándo corrió el último barrido.
+
+    Returns:
+        Lista de dicts (nombre, apellido, email, estado, bloques, bloques_info)
+        o None si la semana aún no está materializada
+    """
+    now = now or get_current_datetime()
+    semana = inicio_semana(now.date())
+    cursor.execute("""
+        SELECT u.id AS usuario_id, u.nombre, u.apellido, u.email,
+               c.bloque, c.fecha, c.hora_entrada, c.hora_salida,
+               c.estado, c.cumplido, c.incompleto
+        FROM usuarios_permitidos u
+        LEFT JOIN cumplimiento_semana c ON c.usuario_id = u.id AND c.semana_inicio = %s
+        WHERE u.activo = 1
+        ORDER BY u.id, c.horario_id
+    """, (semana,))
+    filas = cursor.fetchall()
+    if filas and all(f['bloque'] is None for f in filas):
+        return None
+
+    resultado = []
+    por_usuario = {}
+    for f in filas:
+        usuario = por_usuario.get(f['usuario_id'])
+        if usuario is None:
+            usuario = por_usuario[f['usuario_id']] = {
+                "nombre": f['nombre'], "apellido": f['apellido'], "email": f['email'],
+                "bloques": [], "bloques_info": [], "_estados": []
+            }
+            resultado.append(usuario)
+        if f['bloque'] is None:
+            continue
+
+        estado = f['estado']
+        if not f['cumplido'] and not f['incompleto']:
+            estado, _ = estado_bloque(False, False, f['fecha'], convert_to_time(f['hora_entrada']),
+                                      convert_to_time(f['hora_salida']), now)
+        usuario['bloques'].append(f['bloque'])
+        usuario['bloques_info'].append({"bloque": f['bloque'], "estado": estado})
+        usuario['_estados'].append(estado)
+
+    for usuario in resultado:
+        estados = usuario.pop('_estados')
+        cumplidos = estados.count("Cumplido")
+        incompletos = estados.count("Incompleto") + estados.count("Atrasado")
+        pendientes = estados.count("Pendiente")
+        ausentes = len(estados) - cumplidos - incompletos - pendientes
+        usuario['estado'] = estado_usuario(len(estados), cumplidos, incompletos, ausentes, pendientes)
+    return resultado
+
+def archivar_semana(cursor, semana, fin_semana):
+    """
+    Copia a historial_cumplimiento los totales por usuario de una semana,
+    reemplazando las filas que la semana ya tuviera.
+
+    Returns:
+        Número de usuarios archivados
+    """
+    cursor.execute("DELETE FROM historial_cumplimiento WHERE semana_inicio = %s", (semana,))
+    cursor.execute("""
+        INSERT INTO historial_cumplimiento
+        (usuario_id, email, nombre, apellido, semana_inicio, semana_fin,
+         estado, cumplidos, incompletos, ausentes)
+        SELECT u.id, u.email, u.nombre, u.apellido, c.semana_inicio, %s,
+               CASE
+                   WHEN c.pendientes > 0 AND c.ausentes = 0 AND c.incompletos = 0 THEN 'Pendiente'
+                   WHEN c.cumplidos = c.total THEN 'Cumple'
+                   WHEN c.ausentes = c.total THEN 'Ausente'
+                   WHEN c.incompletos > 0 OR (c.cumplidos > 0 AND c.ausentes > 0) THEN 'Incompleto'
+                   ELSE 'No Cumple'
+               END,
+               c.cumplidos, c.incompletos, c.ausentes
+        FROM (
+            SELECT usuario_id, semana_inicio,
+                   COUNT(*) AS total,
+                   SUM(estado = 'Cumplido') AS cumplidos,
+                   SUM(estado IN ('Incompleto', 'Atrasado')) AS incompletos,
+                   SUM(estado = 'Pendiente') AS pendientes,
+                   SUM(estado NOT IN ('Cumplido', 'Incompleto', 'Atrasado', 'Pendiente')) AS ausentes
+            FROM cumplimiento_semana
+            WHERE semana_inicio = %s
+            GROUP BY usuario_id, semana_inicio
+        ) c
+        JOIN usuarios_permitidos u ON u.id = c.usuario_id
+        WHERE u.activo = 1
+        ORDER BY u.id
+    """, (fin_semana, semana))
+    return cursor.rowcount
+
+def reiniciar_semana(conn, now=None):
+    """
+    Cierre semanal: avanza los bloques sin evaluación, archiva los totales de
+    la semana de `now` en historial_cumplimiento y anota la fecha del reinicio
+    en sistema_config.
+
+    Returns:
+        Dict con fecha_reinicio y registros_historial
+    """
+    now = now or get_current_datetime()
+    fecha_actual = now.strftime('%Y-%m-%d')
+
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_HISTORIAL_CUMPLIMIENTO)
+    conn.commit()
+
+    barrer_estados(conn, now=now)
+    with conn.cursor() as cursor:
+        semana = inicio_semana(now.date())
+        historial_insertado = archivar_semana(cursor, semana, semana + timedelta(days=6))
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sistema_config (
+                clave VARCHAR(50) PRIMARY KEY,
+                valor TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO sistema_config (clave, valor)
+            VALUES ('ultimo_reinicio_cumplimiento', %s)
+            ON DUPLICATE KEY UPDATE valor = %s
+        """, (fecha_actual, fecha_actual))
+    conn.commit()
+
+    return {"fecha_reinicio": fecha_actual, "registros_historial": historial_insertado}
+
+def semana_materializada(conn, now=None):
+    """True si la semana actual ya tiene filas en cumplimiento_semana"""
+    now = now or get_current_datetime()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM cumplimiento_semana WHERE semana_inicio = %s LIMIT 1",
+            (inicio_semana(now.date()),)
+        )
+        return cursor.fetchone() is not None
+
+def ensure_cumplimiento_semana_table(conn):
+    """Crea la tabla cumplimiento_semana si no existe"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_CUMPLIMIENTO_SEMANA)
+    conn.commit()
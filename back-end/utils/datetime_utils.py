@@ -51,4 +51,51 @@ def get_week_dates():
     now = get_current_datetime()
     start_of_week = now - timedelta(days=now.weekday())
     end_of_week = start_of_week + timedelta(days=6)
-    return start_of_week, end_of_week
\ No newline at end of file
+    return start_of_week, end_of_week
+
+def rango_fechas(periodo, inicio=None, fin=None, dias=None, hoy=None):
+    """
+    Convierte un periodo en un rango semiabierto de fechas [desde, hasta).
+
+    Los límites se calculan en la zona horaria configurada, de modo que "hoy"
+    es el día en Santiago y no el del servidor MySQL.
+
+    Args:
+        periodo: 'hoy', 'semana' (lunes a domingo), 'mes', 'entre' o 'ultimos_dias'
+        inicio, fin: Fechas (date o 'YYYY-MM-DD') inclusivas para 'entre'
+        dias: Cantidad de días hacia atrás para 'ultimos_dias' (incluye hoy)
+        hoy: Fecha de referencia (por defecto, la actual)
+
+    Returns:
+        Tupla (desde, hasta) de objetos date; `hasta` es exclusivo
+    """
+    hoy = hoy or get_current_datetime().date()
+
+    if periodo == 'hoy':
+        return hoy, hoy + timedelta(days=1)
+    if periodo == 'semana':
+        lunes = hoy - timedelta(days=hoy.weekday())
+        return lunes, lunes + timedelta(days=7)
+    if periodo == 'mes':
+        primero = hoy.replace(day=1)
+        siguiente = (primero + timedelta(days=32)).replace(day=1)
+        return primero, siguiente
+    if periodo == 'entre':
+        if isinstance(inicio, str):
+            inicio = datetime.strptime(inicio, '%Y-%m-%d').date()
+        if isinstance(fin, str):
+            fin = datetime.strptime(fin, '%Y-%m-%d').date()
+        return inicio, fin + timedelta(days=1)
+    if periodo == 'ultimos_dias':
+        return hoy - timedelta(days=dias), hoy + timedelta(days=1)
+
+    raise ValueError(f"Periodo desconocido: {periodo}")
+
+def condicion_rango_fecha(columna, desde, hasta):
+    """
+    Condición SQL sobre la columna sin funciones (usa los índices por fecha).
+
+    Returns:
+        Tupla (condición, parámetros) para `columna >= desde AND columna < hasta`
+    """
+    return f"{columna} >= %s AND {columna} < %s", [desde.isoformat(), hasta.isoformat()]
@@ -0,0 +1,217 @@
+# utils/datos_sinteticos.py - Datos sintéticos a escala de semestre
+"""
+Genera ayudantes con horarios, estudiantes y sus registros de entrada/salida
+para medir el rendimiento contra una base de datos local (nunca producción).
+
+Todos los correos generados terminan en `@sintetico.test`, así que pueden
+eliminarse sin tocar datos reales (`limpiar_datos_sinteticos`).
+
+Uso:
+    flask --app app generar-datos --ayudantes 40 --estudiantes 800 --dias 120
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from repositorio import transaccion
+from utils.retencion import ARCHIVOS, ddl_archivo
+
+DOMINIO = 'sintetico.test'
+TAMANO_LOTE = 5000
+
+DDL_USUARIOS_PERMITIDOS = """
+CREATE TABLE IF NOT EXISTS usuarios_permitidos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    TP VARCHAR(50) DEFAULT 'AYUDANTE',
+    activo BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DDL_HORARIOS_ASIGNADOS = """
+CREATE TABLE IF NOT EXISTS horarios_asignados (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    dia VARCHAR(20) NOT NULL,
+    hora_entrada TIME NOT NULL,
+    hora_salida TIME NOT NULL,
+    INDEX idx_usuario (usuario_id)
+)
+"""
+
+DIAS_HABILES = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes']
+
+# Bloques de cátedra en que se asignan ayudantías
+BLOQUES = [
+    (time(8, 30), time(10, 0)),
+    (time(10, 15), time(11, 45)),
+    (time(12, 0), time(13, 30)),
+    (time(14, 30), time(16, 0)),
+    (time(16, 15), time(17, 45)),
+    (time(18, 0), time(19, 30)),
+]
+
+NOMBRES = ['Ana', 'Benjamín', 'Camila', 'Diego', 'Elena', 'Felipe', 'Gabriela', 'Hugo',
+           'Isidora', 'Joaquín', 'Josefa', 'Martín', 'Catalina', 'Tomás', 'Valentina', 'Vicente']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+             'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Torres', 'Araya']
+
+def email_ayudante(n):
+    return f'ayudante{n}@{DOMINIO}'
+
+def email_estudiante(n):
+    return f'estudiante{n}@{DOMINIO}'
+
+def _persona(azar):
+    return azar.choice(NOMBRES), azar.choice(APELLIDOS)
+
+def _desplazar(hora, minutos):
+    return (datetime.combine(date.min, hora) + timedelta(minutes=minutos)).time()
+
+def _fila_registro(fecha, hora, nombre, apellido, email, tipo, auto_generado=0):
+    return (fecha, hora.strftime('%H:%M:%S'), DIAS_HABILES[fecha.weekday()],
+            nombre, apellido, email, tipo, auto_generado)
+
+def generar_horarios(azar, ayudantes):
+    """{indice de ayudante: [(dia, entrada, salida), ...]} con 2 a 4 bloques cada uno"""
+    horarios = {}
+    for n in range(ayudantes):
+        bloques = azar.sample([(d, b) for d in DIAS_HABILES for b in BLOQUES], azar.randint(2, 4))
+        horarios[n] = [(dia, entrada, salida) for dia, (entrada, salida) in bloques]
+    return horarios
+
+def generar_registros_ayudantes(azar, personas, horarios, dias, asistencia):
+    """Entrada/Salida alrededor de cada bloque asignado; a veces sin Salida"""
+    for fecha in dias:
+        dia = DIAS_HABILES[fecha.weekday()]
+        for n, (nombre, apellido) in enumerate(personas):
+            for dia_bloque, entrada, salida in horarios[n]:
+                if dia_bloque != dia or azar.random() > asistencia:
+                    continue
+                email = email_ayudante(n)
+                yield _fila_registro(fecha, _desplazar(entrada, azar.randint(-10, 15)),
+                                     nombre, apellido, email, 'Entrada')
+                if azar.random() < 0.97:
+                    yield _fila_registro(fecha, _desplazar(salida, azar.randint(-15, 10)),
+                                         nombre, apellido, email, 'Salida')
+
+def generar_registros_estudiantes(azar, personas, dias, tasa_visita):
+    """Cada estudiante visita el laboratorio con probabilidad `tasa_visita` por día hábil"""
+    for fecha in dias:
+        for n, (nombre, apellido) in enumerate(personas):
+            if azar.random() > tasa_visita:
+                continue
+            email = email_estudiante(n)
+            inicio = azar.randint(8 * 60 + 30, 18 * 60)
+            for _ in range(azar.choice((1, 1, 1, 2))):
+                fin = min(inicio + azar.randint(20, 180), 21 * 60)
+                yield _fila_registro(fecha, time(inicio // 60, inicio % 60, azar.randint(0, 59)),
+                                     nombre, apellido, email, 'Entrada', 1)
+                yield _fila_registro(fecha, time(fin // 60, fin % 60, azar.randint(0, 59)),
+                                     nombre, apellido, email, 'Salida', 1)
+                inicio = fin + azar.randint(10, 60)
+                if inicio >= 20 * 60:
+                    break
+
+def _insertar_en_lotes(db, sql, filas):
+    total = 0
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            total += db.escribir_muchos(sql, lote)
+            lote = []
+    if lote:
+        total += db.escribir_muchos(sql, lote)
+    return total
+
+def limpiar_datos_sinteticos():
+    """Elimina todo lo generado (correos @sintetico.test)"""
+    patron = f'%@{DOMINIO}'
+    eliminados = {}
+    with transaccion() as db:
+        db.escribir(DDL_USUARIOS_PERMITIDOS)
+        db.escribir(DDL_HORARIOS_ASIGNADOS)
+        eliminados['horarios_asignados'] = db.escribir("""
+            DELETE h FROM horarios_asignados h
+            JOIN usuarios_permitidos u ON h.usuario_id = u.id
+            WHERE u.email LIKE %s
+        """, (patron,))['affected_rows']
+        for tabla in ARCHIVOS:
+            db.escribir(ddl_archivo(tabla))
+        for tabla in ('registros', 'EST_registros', *ARCHIVOS.values(), 'usuarios_permitidos',
+                      'usuarios_estudiantes', 'estado_usuarios', 'presencia', 'horas_diarias',
+                      'escaneo_reciente'):
+            eliminados[tabla] = db.escribir(f"DELETE FROM {tabla} WHERE email LIKE %s", (patron,))['affected_rows']
+    return eliminados
+
+def generar_datos(ayudantes=40, estudiantes=800, dias=120, asistencia=0.9,
+                  tasa_visita=0.3, semilla=1, hasta=None):
+    """
+    Inserta el conjunto sintético completo.
+
+    Args:
+        ayudantes: Ayudantes en usuarios_permitidos, con horarios asignados
+        estudiantes: Estudiantes en usuarios_estudiantes
+        dias: Días corridos de historia que terminan en `hasta` (sólo días hábiles tienen registros)
+        asistencia: Probabilidad de que un ayudante asista a un bloque
+        tasa_visita: Probabilidad diaria de que un estudiante visite el laboratorio
+        semilla: Semilla del generador pseudoaleatorio (mismos datos con la misma semilla)
+        hasta: Último día generado (por defecto, ayer)
+
+    Returns:
+        Dict con las filas insertadas por tabla
+    """
+    azar = random.Random(semilla)
+    hasta = hasta or date.today() - timedelta(days=1)
+    dias_habiles = [hasta - timedelta(days=i) for i in range(dias - 1, -1, -1)]
+    dias_habiles = [d for d in dias_habiles if d.weekday() < 5]
+
+    personas_ayudantes = [_persona(azar) for _ in range(ayudantes)]
+    personas_estudiantes = [_persona(azar) for _ in range(estudiantes)]
+    horarios = generar_horarios(azar, ayudantes)
+    insertados = {}
+
+    with transaccion() as db:
+        db.escribir(DDL_USUARIOS_PERMITIDOS)
+        db.escribir(DDL_HORARIOS_ASIGNADOS)
+
+        insertados['usuarios_permitidos'] = db.escribir_muchos("""
+            INSERT IGNORE INTO usuarios_permitidos (nombre, apellido, email, TP, activo)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(nombre, apellido, email_ayudante(n), 'AYUDANTE', 1) for n, (nombre, apellido) in enumerate(personas_ayudantes)])
+
+        ids = {fila['email']: fila['id'] for fila in db.leer(
+            "SELECT id, email FROM usuarios_permitidos WHERE email LIKE %s", (f'%@{DOMINIO}',)
+        )}
+        insertados['horarios_asignados'] = db.escribir_muchos("""
+            INSERT INTO horarios_asignados (usuario_id, dia, hora_entrada, hora_salida)
+            VALUES (%s, %s, %s, %s)
+        """, [
+            (ids[email_ayudante(n)], dia, entrada.strftime('%H:%M:%S'), salida.strftime('%H:%M:%S'))
+            for n, bloques in horarios.items() for dia, entrada, salida in bloques
+        ])
+
+        insertados['usuarios_estudiantes'] = db.escribir_muchos("""
+            INSERT IGNORE INTO usuarios_estudiantes (nombre, apellido, email, activo, TP)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [(nombre, apellido, email_estudiante(n), 1, 'Ingeniería Informática') for n, (nombre, apellido) in enumerate(personas_estudiantes)])
+
+    insert_registro = """
+        INSERT INTO {tabla} (fecha, hora, dia, nombre, apellido, email, tipo, auto_generado)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    # Una transacción por tabla de registros para no retener millones de filas sin commit
+    with transaccion() as db:
+        insertados['registros'] = _insertar_en_lotes(
+            db, insert_registro.format(tabla='registros'),
+            generar_registros_ayudantes(azar, personas_ayudantes, horarios, dias_habiles, asistencia)
+        )
+    with transaccion() as db:
+        insertados['EST_registros'] = _insertar_en_lotes(
+            db, insert_registro.format(tabla='EST_registros'),
+            generar_registros_estudiantes(azar, personas_estudiantes, dias_habiles, tasa_visita)
+        )
+
+    return insertados
@@ -0,0 +1,238 @@
+# utils/door_client.py - Cliente persistente del controlador de puerta ESPHome
+"""
+Mantiene una única conexión autenticada con el dispositivo ESPHome por proceso.
+
+El cliente corre en un event loop de asyncio dentro de un hilo daemon:
+- se conecta al iniciar y se reconecta automáticamente con backoff exponencial,
+- busca una vez por conexión el botón de apertura y guarda su `key`,
+- recibe las órdenes de apertura por una cola en memoria y las envía por la
+  conexión ya abierta, sin handshake ni listado de entidades por cada apertura.
+
+Los handlers de Flask (síncronos) usan `get_door_client().open_door()`.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from config import Config
+
+class DoorClientError(Exception):
+    """No fue posible enviar la orden de apertura"""
+
+class DoorClient:
+    """Cliente ESPHome de larga duración con cola de órdenes de apertura"""
+
+    def __init__(self, host, port, noise_psk=None, password='', button_name='Abrir',
+                 command_timeout=3.0, backoff_initial=0.5, backoff_max=30.0):
+        self.host = host
+        self.port = port
+        self.noise_psk = noise_psk or None
+        self.password = password or ''
+        self.button_name = (button_name or 'Abrir').lower()
+        self.command_timeout = float(command_timeout)
+        self.backoff_initial = float(backoff_initial)
+        self.backoff_max = float(backoff_max)
+
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._connected = None
+        self._disconnected = None
+        self._stopping = False
+        self._client = None
+        self._button_key = None
+        self._started = threading.Event()
+
+        # Estado para monitoreo
+        self.connects = 0
+        self.disconnects = 0
+        self.last_error = None
+        self.commands_sent = 0
+        self.commands_failed = 0
+
+    # ------------------------------------------------------------------
+    # API síncrona (hilos de Flask)
+    # ------------------------------------------------------------------
+    def start(self):
+        """Inicia el hilo del event loop si no está corriendo"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._started.clear()
+        self._thread = threading.Thread(target=self._thread_main, name='door-client', daemon=True)
+        self._thread.start()
+        self._started.wait(timeout=5)
+
+    def stop(self):
+        """Detiene el cliente y cierra la conexión"""
+        self._stopping = True
+        loop = self._loop
+        if loop and loop.is_running():
+            loop.call_soon_threadsafe(self._wake_for_stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def open_door(self, timeout=None):
+        """
+        Encola una orden de apertura y espera a que se envíe.
+
+        Returns:
+            Latencia en milisegundos desde que se encoló la orden
+
+        Raises:
+            DoorClientError si el dispositivo no está disponible a tiempo
+        """
+        self.start()
+        timeout = self.command_timeout if timeout is None else timeout
+        future = Future()
+        enqueued_at = time.monotonic()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (future, enqueued_at, timeout))
+        try:
+            future.result(timeout=timeout + 0.5)
+        except FutureTimeoutError:
+            future.cancel()
+            raise DoorClientError(f"Timeout después de {timeout:.1f} segundos")
+        return (time.monotonic() - enqueued_at) * 1000
+
+    @property
+    def connected(self):
+        return bool(self._connected and self._connected.is_set())
+
+    def status(self):
+        """Estado del cliente para monitoreo"""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'connected': self.connected,
+            'button_key': self._button_key,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'commands_sent': self.commands_sent,
+            'commands_failed': self.commands_failed,
+            'last_error': self.last_error
+        }
+
+    # ------------------------------------------------------------------
+    # Event loop (hilo del cliente)
+    # ------------------------------------------------------------------
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._connected = asyncio.Event()
+        self._disconnected = asyncio.Event()
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_until_complete(asyncio.gather(self._connection_manager(), self._command_worker()))
+        finally:
+            self._loop.close()
+
+    def _wake_for_stop(self):
+        self._disconnected.set()
+        self._queue.put_nowait(None)
+
+    async def _connection_manager(self):
+        """Mantiene la conexión abierta, reconectando con backoff exponencial"""
+        from aioesphomeapi import APIClient
+
+        delay = self.backoff_initial
+        while not self._stopping:
+            client = APIClient(self.host, self.port, self.password, noise_psk=self.noise_psk,
+                               client_info='horarios-lab-backend')
+            self._disconnected.clear()
+            try:
+                await asyncio.wait_for(client.connect(on_stop=self._on_stop, login=True), timeout=10.0)
+                entities, _ = await asyncio.wait_for(client.list_entities_services(), timeout=5.0)
+                button = next((ent for ent in entities if ent.name.lower() == self.button_name), None)
+                if button is None:
+                    raise DoorClientError(f"No se encontró el botón '{self.button_name}'")
+
+                self._client = client
+                self._button_key = button.key
+                self.connects += 1
+                self.last_error = None
+                self._connected.set()
+                print(f"🔌 Puerta conectada: {self.host}:{self.port} (botón key={button.key})")
+                delay = self.backoff_initial
+
+                await self._disconnected.wait()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Error de conexión con la puerta: {self.last_error}")
+            finally:
+                self._connected.clear()
+                self._client = None
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+
+            if self._stopping:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.backoff_max)
+
+    async def _on_stop(self, expected_disconnect=False):
+        self.disconnects += 1
+        self._disconnected.set()
+
+    async def _command_worker(self):
+        """Consume la cola de órdenes de apertura"""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                if self._stopping:
+                    return
+                continue
+
+            future, enqueued_at, timeout = item
+            if future.cancelled():
+                continue
+
+            remaining = timeout - (time.monotonic() - enqueued_at)
+            try:
+                if not self._connected.is_set():
+                    await asyncio.wait_for(self._connected.wait(), timeout=max(remaining, 0))
+                self._client.button_command(self._button_key)
+                self.commands_sent += 1
+                if not future.cancelled():
+                    future.set_result(True)
+            except asyncio.TimeoutError:
+                self.commands_failed += 1
+                if not future.cancelled():
+                    future.set_exception(DoorClientError(
+                        f"Dispositivo no conectado ({self.last_error or 'conectando'})"
+                    ))
+            except Exception as e:
+                self.commands_failed += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # Forzar reconexión ante errores de envío
+                self._disconnected.set()
+                if not future.cancelled():
+                    future.set_exception(DoorClientError(self.last_error))
+
+_door_client = None
+_door_client_pid = None
+_door_client_lock = threading.Lock()
+
+def get_door_client():
+    """Retorna el cliente de puerta del proceso actual (uno por worker)"""
+    global _door_client, _door_client_pid
+    pid = os.getpid()
+    if _door_client is None or _door_client_pid != pid:
+        with _door_client_lock:
+            if _door_client is None or _door_client_pid != pid:
+                _door_client = DoorClient(
+                    Config.DOOR_HOST,
+                    Config.DOOR_PORT,
+                    noise_psk=None if Config.DOOR_PLAINTEXT else Config.DOOR_API_KEY,
+                    button_name=Config.DOOR_BUTTON_NAME,
+                    command_timeout=Config.DOOR_COMMAND_TIMEOUT
+                )
+                _door_client_pid = pid
+    return _door_client
+
+def door_configured():
+    """Indica si hay configuración suficiente para hablar con el dispositivo"""
+    return bool(Config.DOOR_HOST and (Config.DOOR_API_KEY or Config.DOOR_PLAINTEXT))
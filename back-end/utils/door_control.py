@@ -1,12 +1,13 @@
-import subprocess
-import sys
-import os
-from pathlib import Path
+import logging
+import time
 from config import Config
 from database import get_connection
+from utils.door_client import get_door_client, door_configured, DoorClientError
+from utils.presence import contar_dentro, TIPO_AYUDANTE
+from utils.metricas import observar_puerta
 
 
-def open_door_if_authorized(user_email: str, user_type: str):
+def open_door_if_authorized(user_email: str, user_type: str, assistants_count=None):
     """
     Determina si se debe abrir la puerta y retorna el resultado.
 
@@ -14,14 +15,17 @@ def open_door_if_authorized(user_email: str, user_type: str):
     - AYUDANTE: Siempre autorizado
     - ESTUDIANTE: Autorizado solo si hay >= 2 ayudantes dentro
 
+    Si el llamador ya conoce `assistants_count` (p. ej. el lector lo obtiene en su
+    consulta de validación), no se vuelve a consultar la base de datos.
+
     Returns:
         dict: {"opened": bool, "authorized": bool, "message": str, "assistants_count": int}
     """
-    # Debug: Mostrar valores de configuración
-    print(f"🔧 DEBUG Config: DOOR_HOST={Config.DOOR_HOST}, DOOR_PORT={Config.DOOR_PORT}")
-    print(f"🔧 DEBUG Config: DOOR_DEVICE_NAME={Config.DOOR_DEVICE_NAME}, DOOR_API_KEY={'SET' if Config.DOOR_API_KEY else 'NOT SET'}")
+    logging.debug("Config puerta: DOOR_HOST=%s, DOOR_PORT=%s, DOOR_DEVICE_NAME=%s, DOOR_API_KEY=%s",
+                  Config.DOOR_HOST, Config.DOOR_PORT, Config.DOOR_DEVICE_NAME,
+                  'SET' if Config.DOOR_API_KEY else 'NOT SET')
 
-    if not Config.DOOR_HOST or not Config.DOOR_API_KEY:
+    if not door_configured():
         # Config incompleta, pero no lanzar excepción - solo retornar que no se abrió
         print(f"⚠️  Config incompleta: DOOR_HOST={Config.DOOR_HOST is not None}, DOOR_API_KEY={Config.DOOR_API_KEY is not None}")
         return {
@@ -33,104 +37,57 @@ def open_door_if_authorized(user_email: str, user_type: str):
 
     user_type = (user_type or '').upper()
     authorized = False
-    assistants_count = 0
     message = ""
 
     if user_type == 'AYUDANTE':
         authorized = True
         message = "Acceso autorizado - Ayudante"
-    elif user_type == 'ESTUDIANTE':
-        # Contar ayudantes dentro usando la tabla registros (como generador-qr)
-        from utils.datetime_utils import get_current_datetime
+    elif user_type == 'ESTUDIANTE' and assistants_count is None:
+        # Contar ayudantes dentro usando el índice de presencia
         conn = get_connection()
-
         try:
             with conn.cursor() as cursor:
-                now = get_current_datetime()
-                today = now.strftime('%Y-%m-%d')
-
-                # Obtener todos los registros de ayudantes del día
-                cursor.execute("""
-                    SELECT email, tipo, hora
-                    FROM registros
-                    WHERE fecha = %s
-                    ORDER BY hora ASC
-                """, (today,))
-
-                registros = cursor.fetchall()
-
-                # Agrupar por email y determinar último estado
-                ayudantes_status = {}
-                for registro in registros:
-                    ayudantes_status[registro['email']] = registro['tipo']
-
-                # Contar ayudantes con último registro = 'Entrada'
-                assistants_count = sum(1 for tipo in ayudantes_status.values() if tipo == 'Entrada')
+                assistants_count = contar_dentro(cursor, TIPO_AYUDANTE)
         finally:
             conn.close()
 
+    if user_type == 'ESTUDIANTE':
         authorized = assistants_count >= 2
 
         if authorized:
             message = f"Acceso autorizado - {assistants_count} ayudantes dentro"
         else:
             message = "Toca el timbre"
-    else:
+    elif user_type != 'AYUDANTE':
         authorized = False
         message = "Tipo de usuario no válido"
 
     # Intentar abrir la puerta si está autorizado
     door_opened = False
     if authorized:
+        inicio = time.perf_counter()
         try:
-            print("🔓 Ejecutando script de apertura de puerta...")
-
-            # Ejecutar script standalone que está probado y funciona
-            # Pasar explícitamente las variables de entorno
-            script_path = Path(__file__).parent / 'open_door.py'
-
-            # Preparar environment con variables necesarias
-            env = os.environ.copy()
-            env['ESPHOME_HOST'] = Config.DOOR_HOST
-            env['ESPHOME_PORT'] = str(Config.DOOR_PORT)
-            env['ESPHOME_DEVICE_NAME'] = Config.DOOR_DEVICE_NAME
-            if Config.DOOR_API_KEY:
-                env['ESPHOME_TOKEN'] = Config.DOOR_API_KEY
-
-            result = subprocess.run(
-                [sys.executable, str(script_path)],
-                capture_output=True,
-                text=True,
-                timeout=15,  # Aumentar timeout a 15 segundos
-                env=env
-            )
-
-            if result.returncode == 0:
-                door_opened = True
-                print(f"✅ Puerta abierta exitosamente")
-                print(f"   Output: {result.stdout.strip()}")
-            else:
-                door_opened = False
-                error_msg = result.stderr.strip() or result.stdout.strip()
-                message = f"Error al abrir puerta: {error_msg}"
-                print(f"❌ {message}")
-                if result.stdout:
-                    print(f"   Stdout: {result.stdout.strip()}")
-                if result.stderr:
-                    print(f"   Stderr: {result.stderr.strip()}")
-
-        except subprocess.TimeoutExpired:
+            # Orden enviada por la conexión persistente del cliente ESPHome
+            latency_ms = get_door_client().open_door()
+            door_opened = True
+            observar_puerta('abierta', time.perf_counter() - inicio)
+            print(f"✅ Puerta abierta exitosamente ({latency_ms:.0f} ms)")
+        except DoorClientError as e:
             door_opened = False
-            message = "Error al abrir puerta: Timeout después de 15 segundos"
+            message = f"Error al abrir puerta: {str(e)}"
+            observar_puerta('error', time.perf_counter() - inicio)
             print(f"❌ {message}")
         except Exception as e:
             door_opened = False
             message = f"Error al abrir puerta: {str(e)}"
+            observar_puerta('error', time.perf_counter() - inicio)
             print(f"❌ Excepción: {message}")
+    else:
+        observar_puerta('no_autorizado')
 
     return {
         "opened": door_opened,
         "authorized": authorized,
         "message": message,
-        "assistants_count": assistants_count
+        "assistants_count": assistants_count or 0
     }
@@ -0,0 +1,91 @@
+# utils/escaneos.py - Antirrebote e idempotencia de los escaneos de QR
+"""
+Un QR sostenido frente a la cámara llega varias veces en el mismo segundo y
+cada llamada alternaba Entrada/Salida. `escaneo_reciente` guarda por email el
+último escaneo aceptado y su clave de idempotencia.
+
+`reclamar_escaneo` es un único upsert condicional que se ejecuta al inicio de
+la transacción que escribe el registro: toma el bloqueo de la fila del email,
+así que escaneos concurrentes en otros workers esperan al commit del primero y
+luego ven su escaneo como reciente. Se rechaza (y se responde con el registro
+anterior) todo escaneo dentro de la ventana de `SCAN_DEBOUNCE_SEGUNDOS` y,
+durante `SCAN_IDEMPOTENCIA_SEGUNDOS`, el que repite la clave del último aceptado.
+Pasada esa ventana una clave repetida vuelve a aceptarse, así una clave
+derivada que no cambia entre escaneos no bloquea al usuario para siempre.
+"""
+import time
+from config import Config
+
+DDL_ESCANEO_RECIENTE = """
+CREATE TABLE IF NOT EXISTS escaneo_reciente (
+    email VARCHAR(100) NOT NULL PRIMARY KEY,
+    ultimo_at DATETIME(6) NOT NULL,
+    clave VARCHAR(191) NULL,
+    registro_id INT NULL,
+    tipo ENUM('Entrada', 'Salida') NULL
+)
+"""
+
+def clave_idempotencia(request, por_defecto):
+    """Clave enviada por el cliente (cabecera Idempotency-Key o campo idempotency_key)"""
+    data = request.get_json(silent=True) or {}
+    clave = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or por_defecto
+    return str(clave)[:191]
+
+def marca_ventana():
+    """
+    Marca que cambia con cada ventana de antirrebote, para claves sin un dato
+    propio del escaneo: un escaneo posterior a la ventana nunca repite la clave.
+    """
+    if Config.SCAN_DEBOUNCE_SEGUNDOS <= 0:
+        return f"t{time.time_ns()}"
+    return f"v{int(time.time() // Config.SCAN_DEBOUNCE_SEGUNDOS)}"
+
+def reclamar_escaneo(cursor, email, clave):
+    """
+    Acepta el escaneo de `email` o lo identifica como repetido.
+
+    Debe llamarse dentro de la transacción que inserta el registro y antes de
+    decidir si es Entrada o Salida.
+
+    Returns:
+        None si el escaneo se acepta; si no, dict con registro_id y tipo del
+        escaneo aceptado anteriormente
+    """
+    # MySQL evalúa las asignaciones en orden: `clave` ve el `ultimo_at` ya
+    # actualizado, que sólo coincide con NOW(6) si el escaneo fue aceptado.
+    cursor.execute("""
+        INSERT INTO escaneo_reciente (email, ultimo_at, clave) VALUES (%s, NOW(6), %s)
+        ON DUPLICATE KEY UPDATE
+            ultimo_at = IF(
+                ultimo_at < NOW(6) - INTERVAL %s SECOND
+                AND (NOT (clave <=> VALUES(clave)) OR ultimo_at < NOW(6) - INTERVAL %s SECOND),
+                VALUES(ultimo_at), ultimo_at
+            ),
+            registro_id = IF(ultimo_at = VALUES(ultimo_at), NULL, registro_id),
+            tipo = IF(ultimo_at = VALUES(ultimo_at), NULL, tipo),
+            clave = IF(ultimo_at = VALUES(ultimo_at), VALUES(clave), clave)
+    """, (email, clave, Config.SCAN_DEBOUNCE_SEGUNDOS, Config.SCAN_IDEMPOTENCIA_SEGUNDOS))
+
+    # rowcount: 1 = fila nueva, 2 = actualizada (aceptado), 0 = sin cambios (repetido)
+    if cursor.rowcount:
+        return None
+
+    cursor.execute(
+        "SELECT registro_id, tipo FROM escaneo_reciente WHERE email = %s",
+        (email,)
+    )
+    return cursor.fetchone()
+
+def completar_escaneo(cursor, email, registro_id, tipo):
+    """Asocia el registro creado al escaneo aceptado"""
+    cursor.execute(
+        "UPDATE escaneo_reciente SET registro_id = %s, tipo = %s WHERE email = %s",
+        (registro_id, tipo, email)
+    )
+
+def ensure_escaneos_table(conn):
+    """Crea la tabla escaneo_reciente si no existe"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_ESCANEO_RECIENTE)
+    conn.commit()
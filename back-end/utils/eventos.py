@@ -0,0 +1,334 @@
+# utils/eventos.py - Registro de eventos y difusión por Server-Sent Events
+"""
+Los handlers que escriben registros publican eventos en la tabla `eventos`
+dentro de la misma transacción, así un evento sólo existe si el registro se
+confirmó. El `id` autoincremental es el identificador SSE: un cliente que se
+reconecta envía `Last-Event-ID` y recibe sólo lo que se perdió.
+
+Cada worker tiene un único hilo (`EventBroadcaster`) que lee los eventos nuevos
+por clave primaria y los reparte a todas las conexiones SSE abiertas en ese
+worker, de modo que el costo en base de datos no crece con el número de pestañas.
+
+Un id intermedio que no aparece (transacción abierta o revertida) se espera un
+momento y luego se salta. Durante `espera_saltados` segundos se sigue buscando;
+si se confirma tarde, los clientes reciben `reset` y recargan, porque ya no es
+posible entregarlo en orden ni por `Last-Event-ID`.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from database import get_connection
+from config import Config
+
+DDL_EVENTOS = """
+CREATE TABLE IF NOT EXISTS eventos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(40) NOT NULL,
+    datos TEXT NOT NULL,
+    creado_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_creado (creado_at)
+)
+"""
+
+EVENTO_REGISTRO = 'registro'
+EVENTO_PRESENCIA = 'presencia'
+EVENTO_RESET = 'reset'
+
+POBLACION_AYUDANTES = 'ayudantes'
+POBLACION_ESTUDIANTES = 'estudiantes'
+
+def publicar_evento(cursor, tipo, datos):
+    """Inserta un evento en la transacción del cursor; se difunde al confirmar"""
+    cursor.execute(
+        "INSERT INTO eventos (tipo, datos) VALUES (%s, %s)",
+        (tipo, json.dumps(datos, default=str))
+    )
+    return cursor.lastrowid
+
+def publicar_registro(cursor, poblacion, registro_id, email, nombre, apellido, fecha, hora, tipo):
+    """
+    Publica un registro de Entrada/Salida y el cambio de presencia que produce.
+
+    El evento `presencia` indica el estado final de la persona (no un +1/-1),
+    así aplicarlo dos veces en el cliente no altera el resultado.
+    """
+    registro = {
+        'poblacion': poblacion,
+        'id': registro_id,
+        'email': email,
+        'nombre': nombre,
+        'apellido': apellido,
+        'fecha': str(fecha),
+        'hora': str(hora),
+        'tipo': tipo
+    }
+    publicar_evento(cursor, EVENTO_REGISTRO, registro)
+    publicar_evento(cursor, EVENTO_PRESENCIA, {
+        'poblacion': poblacion,
+        'email': email,
+        'nombre': nombre,
+        'apellido': apellido,
+        'presente': tipo == 'Entrada',
+        'hora': str(hora)
+    })
+
+def publicar_registros(cursor, registros):
+    """
+    Igual que `publicar_registro` para muchos registros, en un solo INSERT.
+
+    Args:
+        registros: Dicts con poblacion, id, email, nombre, apellido, fecha, hora y tipo
+    """
+    filas = []
+    for r in registros:
+        filas.append((EVENTO_REGISTRO, json.dumps({
+            'poblacion': r['poblacion'],
+            'id': r['id'],
+            'email': r['email'],
+            'nombre': r['nombre'],
+            'apellido': r['apellido'],
+            'fecha': str(r['fecha']),
+            'hora': str(r['hora']),
+            'tipo': r['tipo']
+        }, default=str)))
+        filas.append((EVENTO_PRESENCIA, json.dumps({
+            'poblacion': r['poblacion'],
+            'email': r['email'],
+            'nombre': r['nombre'],
+            'apellido': r['apellido'],
+            'presente': r['tipo'] == 'Entrada',
+            'hora': str(r['hora'])
+        }, default=str)))
+    if filas:
+        cursor.executemany("INSERT INTO eventos (tipo, datos) VALUES (%s, %s)", filas)
+
+def _fila_a_evento(fila):
+    return {'id': int(fila['id']), 'tipo': fila['tipo'], 'datos': fila['datos']}
+
+def leer_eventos_desde(cursor, ultimo_id, limite):
+    """Eventos con id mayor a `ultimo_id`, en orden"""
+    cursor.execute(
+        "SELECT id, tipo, datos FROM eventos WHERE id > %s ORDER BY id LIMIT %s",
+        (ultimo_id, limite)
+    )
+    return [_fila_a_evento(fila) for fila in cursor.fetchall()]
+
+def eventos_para_reanudar(ultimo_id, limite=None):
+    """
+    Eventos que un cliente perdió desde `ultimo_id`.
+
+    Returns:
+        Tupla (eventos, completo). `completo` es False si parte de los eventos
+        ya fue purgada o faltan más de `limite`; el cliente debe recargar.
+    """
+    limite = limite or Config.EVENTOS_REPLAY_MAX
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MIN(id) AS primero FROM eventos")
+            fila = cursor.fetchone()
+            primero = fila['primero'] if fila else None
+            if primero is not None and ultimo_id < int(primero) - 1:
+                return [], False
+
+            eventos = leer_eventos_desde(cursor, ultimo_id, limite + 1)
+    finally:
+        conn.close()
+
+    if len(eventos) > limite:
+        return [], False
+    return eventos, True
+
+def ultimo_evento_id():
+    """Id del evento más reciente (0 si no hay)"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS ultimo FROM eventos")
+            return int(cursor.fetchone()['ultimo'])
+    finally:
+        conn.close()
+
+def purgar_eventos(conn, horas=None):
+    """Elimina eventos más antiguos que la retención configurada"""
+    horas = horas or Config.EVENTOS_RETENCION_HORAS
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM eventos WHERE creado_at < NOW() - INTERVAL %s HOUR",
+            (horas,)
+        )
+        eliminados = cursor.rowcount
+    conn.commit()
+    return eliminados
+
+def formatear_sse(evento):
+    """Serializa un evento en el formato de Server-Sent Events (sin `id:` si no tiene id)"""
+    linea_id = f"id: {evento['id']}\n" if evento['id'] is not None else ''
+    return f"{linea_id}event: {evento['tipo']}\ndata: {evento['datos']}\n\n"
+
+class Suscripcion:
+    """Cola de eventos de una conexión SSE"""
+
+    def __init__(self, tamano_max):
+        self.cola = queue.Queue(maxsize=tamano_max)
+        self.desbordada = False
+
+class EventBroadcaster:
+    """Hilo por worker que lee eventos nuevos y los reparte a las suscripciones"""
+
+    def __init__(self, intervalo=0.5, lote=500, cola_max=1000, espera_hueco=2.0,
+                 espera_saltados=60.0, saltados_max=1000):
+        self.intervalo = intervalo
+        self.lote = lote
+        self.cola_max = cola_max
+        self.espera_hueco = espera_hueco
+        self.espera_saltados = espera_saltados
+        self.saltados_max = saltados_max
+        # {id saltado: instante (monotonic) hasta el que se sigue buscando}
+        self._saltados = {}
+        self._suscripciones = set()
+        self._lock = threading.Condition()
+        self._thread = None
+        self._ultimo_id = None
+        self._hueco_desde = None
+        self._posicion_lock = threading.Lock()
+
+    def suscribir(self):
+        suscripcion = Suscripcion(self.cola_max)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+            self._lock.notify()
+        # La posición se fija antes de que el cliente lea los eventos perdidos,
+        # así la reanudación y la difusión se solapan en vez de dejar un hueco.
+        self._inicializar_posicion()
+        self._asegurar_hilo()
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def clientes(self):
+        with self._lock:
+            return len(self._suscripciones)
+
+    def _inicializar_posicion(self):
+        with self._posicion_lock:
+            if self._ultimo_id is None:
+                self._ultimo_id = ultimo_evento_id()
+
+    def _asegurar_hilo(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='eventos-sse', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._suscripciones:
+                    # Sin clientes no se consulta la base de datos
+                    with self._posicion_lock:
+                        self._ultimo_id = None
+                    self._saltados.clear()
+                    self._lock.wait()
+            try:
+                self._sondear()
+            except Exception as e:
+                print(f"Error al leer eventos: {e}")
+                time.sleep(max(self.intervalo, 2.0))
+                continue
+            time.sleep(self.intervalo)
+
+    def _sondear(self):
+        self._inicializar_posicion()
+
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                tardios = self._confirmados_tarde(cursor)
+                eventos = leer_eventos_desde(cursor, self._ultimo_id, self.lote)
+        finally:
+            conn.close()
+
+        if tardios:
+            # Ya se difundieron ids posteriores: los clientes recargan el estado
+            self._difundir({
+                'id': None,
+                'tipo': EVENTO_RESET,
+                'datos': json.dumps({'motivo': 'evento_tardio', 'ids': tardios})
+            })
+
+        for evento in eventos:
+            if evento['id'] != self._ultimo_id + 1:
+                # Un id intermedio puede pertenecer a una transacción aún abierta;
+                # se espera un momento para no entregar eventos fuera de orden.
+                if self._hueco_desde is None:
+                    self._hueco_desde = time.monotonic()
+                if time.monotonic() - self._hueco_desde < self.espera_hueco:
+                    return
+                self._saltar(self._ultimo_id + 1, evento['id'])
+            self._hueco_desde = None
+            self._ultimo_id = evento['id']
+            self._difundir(evento)
+
+    def _saltar(self, desde, hasta):
+        """Recuerda los ids [desde, hasta) que se dejan atrás sin haberlos visto"""
+        limite = time.monotonic() + self.espera_saltados
+        for evento_id in range(max(desde, hasta - self.saltados_max), hasta):
+            self._saltados[evento_id] = limite
+        while len(self._saltados) > self.saltados_max:
+            del self._saltados[min(self._saltados)]
+
+    def _confirmados_tarde(self, cursor):
+        """Ids saltados que ya existen; olvida los que pasaron `espera_saltados`"""
+        ahora = time.monotonic()
+        self._saltados = {i: limite for i, limite in self._saltados.items() if limite > ahora}
+        if not self._saltados:
+            return []
+        ids = sorted(self._saltados)
+        cursor.execute(
+            f"SELECT id FROM eventos WHERE id IN ({', '.join(['%s'] * len(ids))})",
+            ids
+        )
+        tardios = sorted(int(fila['id']) for fila in cursor.fetchall())
+        for evento_id in tardios:
+            del self._saltados[evento_id]
+        return tardios
+
+    def _difundir(self, evento):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.cola.put_nowait(evento)
+            except queue.Full:
+                # Cliente demasiado lento: se corta y se reanuda con Last-Event-ID
+                suscripcion.desbordada = True
+                self.desuscribir(suscripcion)
+
+_broadcaster = None
+_broadcaster_pid = None
+_broadcaster_lock = threading.Lock()
+
+def get_broadcaster():
+    """Retorna el difusor de eventos del proceso actual (uno por worker)"""
+    global _broadcaster, _broadcaster_pid
+    pid = os.getpid()
+    if _broadcaster is None or _broadcaster_pid != pid:
+        with _broadcaster_lock:
+            if _broadcaster is None or _broadcaster_pid != pid:
+                _broadcaster = EventBroadcaster(intervalo=Config.EVENTOS_POLL_INTERVAL)
+                _broadcaster_pid = pid
+    return _broadcaster
+
+def ensure_eventos_table(conn):
+    """Crea la tabla de eventos si no existe"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_EVENTOS)
+    conn.commit()
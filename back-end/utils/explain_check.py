@@ -0,0 +1,103 @@
+# utils/explain_check.py - Verificación con EXPLAIN de los filtros por fecha
+"""
+Ejecuta EXPLAIN sobre las consultas de EST_registros que filtran por periodo y
+comprueba que MySQL puede usar los índices por fecha. Si una consulta vuelve a
+envolver la columna en una función (DATE(), YEARWEEK(), ...) el índice deja de
+aparecer o deja de usar la parte `fecha`, y la verificación falla.
+
+Uso:
+    flask --app app verificar-indices
+"""
+import json
+from utils.datetime_utils import rango_fechas, condicion_rango_fecha
+from utils.paginacion import condiciones_registros
+
+INDICES_FECHA = {'idx_fecha_hora', 'idx_email_fecha'}
+EMAIL_EJEMPLO = 'verificacion@ejemplo.com'
+
+def _consultas():
+    """(nombre, sql, params, alias de EST_registros) de las consultas a verificar"""
+    # Importación diferida: las rutas importan este paquete de utilidades
+    from routes.registros_estudiantes import SELECT_REGISTROS
+
+    consultas = []
+    for periodo in ('hoy', 'semana', 'mes'):
+        desde, hasta = rango_fechas(periodo)
+        condicion, params = condicion_rango_fecha('er.fecha', desde, hasta)
+        consultas.append((
+            f'registros_{periodo}',
+            f"{SELECT_REGISTROS} WHERE {condicion} ORDER BY er.fecha DESC, er.hora DESC",
+            params,
+            'er'
+        ))
+
+    desde, hasta = rango_fechas('hoy')
+    consultas.append((
+        'ultimo_registro_hoy',
+        "SELECT tipo FROM EST_registros er WHERE er.email = %s AND er.fecha >= %s AND er.fecha < %s "
+        "ORDER BY er.fecha DESC, er.hora DESC LIMIT 1",
+        [EMAIL_EJEMPLO, desde, hasta],
+        'er'
+    ))
+
+    condiciones, params = condiciones_registros({'email': EMAIL_EJEMPLO, 'desde': desde.isoformat()}, 'er')
+    consultas.append((
+        'registros_paginados_email',
+        f"{SELECT_REGISTROS} WHERE {' AND '.join(condiciones)} "
+        "ORDER BY er.fecha DESC, er.hora DESC, er.id DESC LIMIT 101",
+        params,
+        'er'
+    ))
+    return consultas
+
+def _tablas_plan(nodo, alias):
+    """Busca en el plan JSON de EXPLAIN los accesos a la tabla `alias`"""
+    if isinstance(nodo, dict):
+        tabla = nodo.get('table')
+        if isinstance(tabla, dict) and tabla.get('table_name') == alias:
+            yield tabla
+        for valor in nodo.values():
+            yield from _tablas_plan(valor, alias)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _tablas_plan(valor, alias)
+
+def verificar_indices(conn):
+    """
+    Ejecuta EXPLAIN FORMAT=JSON de cada consulta y revisa el acceso a EST_registros.
+
+    Una consulta pasa si algún índice por fecha está entre `possible_keys` y,
+    cuando MySQL elige un índice, éste usa la columna `fecha` (con tablas muy
+    pequeñas MySQL puede preferir recorrer la tabla aunque el índice sirva).
+
+    Con las tablas particionadas por mes, `partitions` muestra las particiones
+    que MySQL recorre (debería limitarse a los meses del periodo).
+
+    Returns:
+        Lista de dicts con nombre, ok, possible_keys, key, used_key_parts,
+        access_type y partitions
+    """
+    resultados = []
+    with conn.cursor() as cursor:
+        for nombre, sql, params, alias in _consultas():
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql}", params)
+            plan = json.loads(cursor.fetchone()['EXPLAIN'])
+            tablas = list(_tablas_plan(plan, alias))
+            if not tablas:
+                resultados.append({'nombre': nombre, 'ok': False, 'error': 'Tabla no encontrada en EXPLAIN'})
+                continue
+
+            tabla = tablas[0]
+            posibles = set(tabla.get('possible_keys') or [])
+            partes = tabla.get('used_key_parts') or []
+            ok = bool(posibles & INDICES_FECHA) and (not tabla.get('key') or 'fecha' in partes)
+            resultados.append({
+                'nombre': nombre,
+                'ok': ok,
+                'possible_keys': sorted(posibles),
+                'key': tabla.get('key'),
+                'used_key_parts': partes,
+                'access_type': tabla.get('access_type'),
+                'partitions': tabla.get('partitions')
+            })
+    return resultados
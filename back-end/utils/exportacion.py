@@ -0,0 +1,115 @@
+# utils/exportacion.py - Exportación en streaming de registros (CSV / NDJSON)
+"""
+Genera exportaciones de `registros` y `EST_registros` fila a fila con memoria
+constante: las filas se leen con un cursor sin buffer (SSCursor), se
+serializan en bloques y, si el cliente lo acepta, se comprimen con gzip a
+medida que se envían.
+
+Las filas salen ordenadas por id; una descarga interrumpida se reanuda
+pidiendo `after_id=<último id recibido>`. Un rango que empieza antes del
+semestre actual se lee de la vista histórica e incluye las filas archivadas.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from database import get_streaming_connection
+from utils.datetime_utils import format_hora
+from utils.retencion import origen_registros
+
+COLUMNAS_EXPORTACION = ['id', 'fecha', 'hora', 'dia', 'nombre', 'apellido', 'email', 'tipo', 'auto_generado']
+
+TABLAS_EXPORTACION = {
+    'ayudantes': 'registros',
+    'estudiantes': 'EST_registros'
+}
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+FILAS_POR_BLOQUE = 500
+
+def _valor(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return format_hora(valor)
+    return valor
+
+def iterar_filas(tabla, desde, hasta, after_id=0):
+    """
+    Recorre las filas de `tabla` con fecha en [desde, hasta) e id > after_id.
+
+    Usa una conexión dedicada con SSCursor; se cierra al agotar el generador o
+    cuando el cliente corta la descarga.
+    """
+    conn = get_streaming_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join(COLUMNAS_EXPORTACION)}
+            FROM {tabla}
+            WHERE fecha >= %s AND fecha < %s AND id > %s
+            ORDER BY id
+        """, (desde.isoformat(), hasta.isoformat(), after_id))
+
+        while True:
+            filas = cursor.fetchmany(FILAS_POR_BLOQUE)
+            if not filas:
+                break
+            for fila in filas:
+                yield fila
+    finally:
+        # Cerrar el socket directamente: cerrar el cursor leería las filas pendientes
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def serializar_csv(filas):
+    """Genera el CSV por bloques (encabezado incluido)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_EXPORTACION)
+
+    pendientes = 0
+    for fila in filas:
+        writer.writerow([_valor(v) for v in fila])
+        pendientes += 1
+        if pendientes >= FILAS_POR_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+
+    yield buffer.getvalue().encode('utf-8')
+
+def serializar_ndjson(filas):
+    """Genera un objeto JSON por línea, agrupados en bloques"""
+    lineas = []
+    for fila in filas:
+        lineas.append(json.dumps(dict(zip(COLUMNAS_EXPORTACION, (_valor(v) for v in fila))), ensure_ascii=False))
+        if len(lineas) >= FILAS_POR_BLOQUE:
+            yield ('\n'.join(lineas) + '\n').encode('utf-8')
+            lineas = []
+
+    if lineas:
+        yield ('\n'.join(lineas) + '\n').encode('utf-8')
+
+def comprimir_gzip(bloques):
+    """Comprime un flujo de bytes en formato gzip sin acumularlo"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+def generar_exportacion(poblacion, formato, desde, hasta, after_id=0, gzip=False):
+    """Generador de bytes de la exportación completa"""
+    filas = iterar_filas(origen_registros(TABLAS_EXPORTACION[poblacion], desde), desde, hasta, after_id)
+    bloques = serializar_csv(filas) if formato == 'csv' else serializar_ndjson(filas)
+    return comprimir_gzip(bloques) if gzip else bloques
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# utils/fake_esphome.py - Dispositivo ESPHome falso para pruebas locales de la puerta
+"""
+Servidor mínimo de la API nativa de ESPHome (protocolo en texto plano) que expone
+un único botón "Abrir". Permite probar `utils.door_client` sin el dispositivo real.
+
+Uso:
+    python -m utils.fake_esphome --port 6053
+
+y en el backend:
+    ESPHOME_HOST=127.0.0.1 ESPHOME_PORT=6053 ESPHOME_PLAINTEXT=true
+"""
+import argparse
+import asyncio
+import time
+from aioesphomeapi import api_pb2
+from aioesphomeapi.core import MESSAGE_TYPE_TO_PROTO
+
+PROTO_TO_MESSAGE_TYPE = {proto: msg_type for msg_type, proto in MESSAGE_TYPE_TO_PROTO.items()}
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+async def _read_varint(reader):
+    result = 0
+    shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result
+        shift += 7
+
+class FakeESPHomeDevice:
+    """Dispositivo falso con un botón de apertura; registra cada pulsación"""
+
+    def __init__(self, host='127.0.0.1', port=6053, name='arturito', button_name='Abrir',
+                 button_key=1234, response_delay=0.0):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.button_name = button_name
+        self.button_key = button_key
+        self.response_delay = response_delay
+        self.presses = []
+        self.connections = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        if not self.port:
+            self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        for writer in list(self._writers):
+            writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def drop_connections(self):
+        """Cierra las conexiones abiertas (simula un reinicio del dispositivo)"""
+        for writer in list(self._writers):
+            writer.close()
+
+    def _send(self, writer, message):
+        payload = message.SerializeToString()
+        msg_type = PROTO_TO_MESSAGE_TYPE[type(message)]
+        writer.write(b'\x00' + _encode_varint(len(payload)) + _encode_varint(msg_type) + payload)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                preamble = await reader.readexactly(1)
+                if preamble != b'\x00':
+                    break
+                length = await _read_varint(reader)
+                msg_type = await _read_varint(reader)
+                data = await reader.readexactly(length) if length else b''
+                proto = MESSAGE_TYPE_TO_PROTO.get(msg_type)
+                if proto is None:
+                    continue
+                message = proto()
+                message.ParseFromString(data)
+
+                if self.response_delay:
+                    await asyncio.sleep(self.response_delay)
+
+                if isinstance(message, api_pb2.HelloRequest):
+                    self._send(writer, api_pb2.HelloResponse(
+                        api_version_major=1, api_version_minor=9,
+                        server_info='fake-esphome', name=self.name
+                    ))
+                elif isinstance(message, api_pb2.ConnectRequest):
+                    self._send(writer, api_pb2.ConnectResponse(invalid_password=False))
+                elif isinstance(message, api_pb2.DeviceInfoRequest):
+                    self._send(writer, api_pb2.DeviceInfoResponse(
+                        name=self.name, uses_password=False, esphome_version='2024.1.0', model='fake'
+                    ))
+                elif isinstance(message, api_pb2.ListEntitiesRequest):
+                    self._send(writer, api_pb2.ListEntitiesButtonResponse(
+                        object_id=self.button_name.lower(), key=self.button_key,
+                        name=self.button_name, unique_id=f'{self.name}-{self.button_name.lower()}'
+                    ))
+                    self._send(writer, api_pb2.ListEntitiesDoneResponse())
+                elif isinstance(message, api_pb2.PingRequest):
+                    self._send(writer, api_pb2.PingResponse())
+                elif isinstance(message, api_pb2.GetTimeRequest):
+                    self._send(writer, api_pb2.GetTimeResponse(epoch_seconds=int(time.time())))
+                elif isinstance(message, api_pb2.ButtonCommandRequest):
+                    if message.key == self.button_key:
+                        self.presses.append(time.time())
+                        print(f"🚪 [fake-esphome] Botón '{self.button_name}' presionado ({len(self.presses)})")
+                elif isinstance(message, api_pb2.DisconnectRequest):
+                    self._send(writer, api_pb2.DisconnectResponse())
+                    await writer.drain()
+                    break
+
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+async def _main(args):
+    device = FakeESPHomeDevice(args.host, args.port, name=args.name, button_name=args.button)
+    await device.start()
+    print(f"✅ Fake ESPHome escuchando en {device.host}:{device.port} (botón '{args.button}')")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await device.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dispositivo ESPHome falso para pruebas de la puerta')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6053)
+    parser.add_argument('--name', default='arturito')
+    parser.add_argument('--button', default='Abrir')
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,182 @@
+# utils/horas_ledger.py - Libro de horas acumuladas por usuario y día
+from datetime import date
+from utils.datetime_utils import convert_to_time
+from utils.retencion import VISTAS_HISTORIAL
+
+DDL_HORAS_DIARIAS = """
+CREATE TABLE IF NOT EXISTS horas_diarias (
+    email VARCHAR(100) NOT NULL,
+    fecha DATE NOT NULL,
+    segundos INT NOT NULL DEFAULT 0,
+    pares INT NOT NULL DEFAULT 0,
+    registros INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (email, fecha),
+    INDEX idx_fecha (fecha)
+)
+"""
+
+def _segundos(hora):
+    t = convert_to_time(hora)
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+def emparejar_dia(eventos):
+    """
+    Empareja entradas y salidas de un día.
+
+    Args:
+        eventos: Lista de (tipo, hora) ordenada por hora
+
+    Returns:
+        Lista de (hora_entrada, hora_salida, segundos). Cada salida se empareja
+        con la entrada pendiente más antigua; los pares con salida anterior a la
+        entrada se descartan.
+    """
+    pendientes = []
+    inicio = 0
+    pares = []
+
+    for tipo, hora in eventos:
+        if tipo == 'Entrada':
+            pendientes.append(hora)
+        elif tipo == 'Salida' and inicio < len(pendientes):
+            entrada = pendientes[inicio]
+            inicio += 1
+            segundos = _segundos(hora) - _segundos(entrada)
+            if segundos > 0:
+                pares.append((entrada, hora, segundos))
+
+    return pares
+
+def calcular_horas_dia(eventos):
+    """
+    Suma el tiempo trabajado en un día según `emparejar_dia`.
+
+    Returns:
+        Tupla (segundos, pares)
+    """
+    pares = emparejar_dia(eventos)
+    return sum(par[2] for par in pares), len(pares)
+
+def calcular_ledger(registros):
+    """
+    Filas del libro a partir de registros ordenados por email, fecha, hora.
+
+    Args:
+        registros: Iterable de dicts con email, fecha, tipo y hora
+
+    Yields:
+        Tuplas (email, fecha, segundos, pares, registros) por usuario y día
+    """
+    clave_actual = None
+    eventos_dia = []
+    for r in registros:
+        clave = (r['email'], r['fecha'])
+        if clave != clave_actual:
+            if eventos_dia:
+                yield clave_actual + calcular_horas_dia(eventos_dia) + (len(eventos_dia),)
+            clave_actual = clave
+            eventos_dia = []
+        eventos_dia.append((r['tipo'], r['hora']))
+    if eventos_dia:
+        yield clave_actual + calcular_horas_dia(eventos_dia) + (len(eventos_dia),)
+
+def _upsert_filas(cursor, filas):
+    if not filas:
+        return
+    cursor.executemany("""
+        INSERT INTO horas_diarias (email, fecha, segundos, pares, registros)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            segundos = VALUES(segundos),
+            pares = VALUES(pares),
+            registros = VALUES(registros)
+    """, filas)
+
+def actualizar_dias(cursor, claves):
+    """
+    Recalcula las filas del libro para los pares (email, fecha) indicados.
+
+    Se usa dentro de la misma transacción que inserta cada registro (Entrada o
+    Salida), de modo que el libro y `registros` se confirman juntos y un día con
+    sólo una Entrada cuenta igual que en `reconstruir_ledger`. Sólo lee los
+    registros de esos días (índice idx_email_fecha); si un día ya no tiene
+    registros, su fila se elimina.
+    """
+    claves = sorted({(email, str(fecha)) for email, fecha in claves})
+    if not claves:
+        return
+
+    condiciones = " OR ".join(["(email = %s AND fecha = %s)"] * len(claves))
+    params = [valor for clave in claves for valor in clave]
+    cursor.execute(f"""
+        SELECT email, fecha, tipo, hora
+        FROM registros
+        WHERE {condiciones}
+        ORDER BY email, fecha, hora, id
+    """, params)
+
+    eventos = {}
+    for r in cursor.fetchall():
+        fecha = r['fecha'].isoformat() if isinstance(r['fecha'], date) else str(r['fecha'])
+        eventos.setdefault((r['email'], fecha), []).append((r['tipo'], r['hora']))
+
+    filas = []
+    vacios = []
+    for email, fecha in claves:
+        eventos_dia = eventos.get((email, fecha), [])
+        if not eventos_dia:
+            vacios.append((email, fecha))
+            continue
+        segundos, pares = calcular_horas_dia(eventos_dia)
+        filas.append((email, fecha, segundos, pares, len(eventos_dia)))
+
+    _upsert_filas(cursor, filas)
+    if vacios:
+        cursor.executemany("DELETE FROM horas_diarias WHERE email = %s AND fecha = %s", vacios)
+
+def actualizar_dia(cursor, email, fecha):
+    """Recalcula la fila del libro de un usuario para una fecha"""
+    actualizar_dias(cursor, [(email, fecha)])
+
+def reconstruir_ledger(conn, email=None, lote=1000):
+    """
+    Reconstruye el libro de horas desde el historial completo de `registros`,
+    incluidos los semestres archivados (vista `registros_historial`).
+
+    Args:
+        conn: Conexión a la base de datos
+        email: Si se indica, sólo reconstruye ese usuario
+        lote: Filas por inserción
+
+    Returns:
+        Número de filas (usuario, día) escritas
+    """
+    filtro = "WHERE email = %s" if email else ""
+    params = (email,) if email else ()
+
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_HORAS_DIARIAS)
+        cursor.execute(f"DELETE FROM horas_diarias {filtro}", params)
+        cursor.execute(f"""
+            SELECT email, fecha, tipo, hora
+            FROM {VISTAS_HISTORIAL['registros']}
+            {filtro}
+            ORDER BY email, fecha, hora, id
+        """, params)
+        registros = cursor.fetchall()
+
+        filas = []
+        escritas = 0
+        for fila in calcular_ledger(registros):
+            filas.append(fila)
+            if len(filas) >= lote:
+                _upsert_filas(cursor, filas)
+                escritas += len(filas)
+                filas = []
+
+        _upsert_filas(cursor, filas)
+        escritas += len(filas)
+
+    conn.commit()
+    return escritas
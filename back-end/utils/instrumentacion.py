@@ -0,0 +1,121 @@
+# utils/instrumentacion.py - Consultas por petición y detector de N+1
+"""
+Cuenta las consultas que ejecuta cada petición (vía el hook del cursor de
+`database`) y, al responder:
+
+- agrega la cabecera `Server-Timing` con el tiempo en base de datos, el
+  número de consultas y la más lenta;
+- escribe una línea JSON con el resumen de la petición;
+- marca la petición si supera el presupuesto de consultas o si repite la
+  misma sentencia demasiadas veces (patrón N+1).
+
+El presupuesto global es `CONSULTAS_PRESUPUESTO`; un endpoint puede fijar el
+suyo con `@presupuesto_consultas(n)`. Con `CONSULTAS_ESTRICTO=true` (por
+ejemplo, al probar con el cliente de pruebas de Flask) exceder el presupuesto
+lanza `PresupuestoConsultasExcedido` en lugar de sólo registrarlo.
+"""
+import json
+import time
+from flask import g, request, current_app, has_request_context
+from config import Config
+from database import agregar_hook_consulta
+
+class PresupuestoConsultasExcedido(Exception):
+    """La petición ejecutó más consultas que su presupuesto"""
+
+def presupuesto_consultas(maximo):
+    """Decorador que fija el máximo de consultas de un endpoint"""
+    def decorador(f):
+        f.presupuesto_consultas = maximo
+        return f
+    return decorador
+
+def _normalizar(sql):
+    return ' '.join(sql.split())
+
+def _registrar_consulta(sql, duracion, filas):
+    """Hook del cursor: acumula la consulta en la petición actual"""
+    if not has_request_context():
+        return
+    metricas = g.get('consultas')
+    if metricas is None:
+        return
+    metricas['total'] += 1
+    metricas['tiempo'] += duracion
+    sentencia = _normalizar(sql if isinstance(sql, str) else sql.decode(errors='replace'))
+    metricas['repeticiones'][sentencia] = metricas['repeticiones'].get(sentencia, 0) + 1
+    if duracion > metricas['mas_lenta'][0]:
+        metricas['mas_lenta'] = (duracion, sentencia)
+
+def _presupuesto_endpoint():
+    vista = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(vista, 'presupuesto_consultas', Config.CONSULTAS_PRESUPUESTO)
+
+def resumen_consultas():
+    """Métricas de consultas de la petición actual (None fuera de una petición)"""
+    metricas = g.get('consultas') if has_request_context() else None
+    if metricas is None:
+        return None
+    sentencia_repetida, repeticiones = max(
+        metricas['repeticiones'].items(), key=lambda item: item[1], default=(None, 0)
+    )
+    duracion_lenta, sentencia_lenta = metricas['mas_lenta']
+    return {
+        'consultas': metricas['total'],
+        'db_ms': round(metricas['tiempo'] * 1000, 3),
+        'mas_lenta_ms': round(duracion_lenta * 1000, 3),
+        'mas_lenta': (sentencia_lenta or '')[:200],
+        'max_repeticiones': repeticiones,
+        'sentencia_repetida': (sentencia_repetida or '')[:200] if repeticiones > 1 else None
+    }
+
+def _antes_de_peticion():
+    g.consultas = {'total': 0, 'tiempo': 0.0, 'mas_lenta': (0.0, None), 'repeticiones': {}}
+    g.consultas_inicio = time.perf_counter()
+
+def _despues_de_peticion(response):
+    resumen = resumen_consultas()
+    if resumen is None:
+        return response
+
+    total_ms = (time.perf_counter() - g.consultas_inicio) * 1000
+    presupuesto = _presupuesto_endpoint()
+    excede = presupuesto is not None and resumen['consultas'] > presupuesto
+    n_mas_uno = resumen['max_repeticiones'] > Config.CONSULTAS_REPETICION_MAX
+
+    response.headers.add('Server-Timing', (
+        f'db;dur={resumen["db_ms"]:.3f};desc="{resumen["consultas"]} consultas", '
+        f'db-lenta;dur={resumen["mas_lenta_ms"]:.3f}, '
+        f'total;dur={total_ms:.3f}'
+    ))
+
+    if excede or n_mas_uno or Config.CONSULTAS_LOG:
+        print(json.dumps({
+            'evento': 'consultas_peticion',
+            'metodo': request.method,
+            'endpoint': request.endpoint,
+            'ruta': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 3),
+            'presupuesto': presupuesto,
+            'excede_presupuesto': excede,
+            'posible_n_mas_uno': n_mas_uno,
+            **resumen
+        }, ensure_ascii=False))
+
+    if excede and Config.CONSULTAS_ESTRICTO:
+        raise PresupuestoConsultasExcedido(
+            f"{request.endpoint}: {resumen['consultas']} consultas (presupuesto {presupuesto})"
+        )
+    return response
+
+_hook_instalado = False
+
+def instalar_instrumentacion(app):
+    """Registra el hook del cursor y los before/after_request en la aplicación"""
+    global _hook_instalado
+    if not _hook_instalado:
+        agregar_hook_consulta(_registrar_consulta)
+        _hook_instalado = True
+    app.before_request(_antes_de_peticion)
+    app.after_request(_despues_de_peticion)
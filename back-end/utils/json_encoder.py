@@ -1,20 +1,70 @@
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from flask.json.provider import JSONProvider
+from utils.datetime_utils import format_hora
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+def convertir_valor(obj):
+    """
+    Convierte los tipos que devuelve PyMySQL y no son JSON nativos.
+
+    - timedelta (columnas TIME): 'HH:MM:SS'
+    - Decimal: float
+    - datetime/date/time: ISO 8601 (sólo usado por el encoder de la biblioteca estándar;
+      orjson los serializa de forma nativa con el mismo formato)
+    """
+    if isinstance(obj, timedelta):
+        return format_hora(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, time):
+        return obj.strftime('%H:%M:%S')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 class CustomJSONEncoder(json.JSONEncoder):
-    """Encoder personalizado para manejar objetos datetime y timedelta"""
+    """Encoder de la biblioteca estándar con los mismos formatos que orjson"""
     def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, timedelta):
-            return str(obj)
-        return super().default(obj)
+        try:
+            return convertir_valor(obj)
+        except TypeError:
+            return super().default(obj)
+
+ORJSON_OPCIONES = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+def dumps_bytes(obj):
+    """Serializa a bytes UTF-8 (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=convertir_valor, option=ORJSON_OPCIONES)
+    return json.dumps(obj, cls=CustomJSONEncoder, ensure_ascii=False).encode('utf-8')
 
 class CustomJSONProvider(JSONProvider):
-    """Provider JSON personalizado para Flask"""
+    """
+    Provider JSON de Flask respaldado por orjson.
+
+    Fechas, horas (TIME como 'HH:MM:SS') y Decimal se serializan aquí, por lo
+    que las rutas pueden pasar las filas de la base de datos tal cual a jsonify.
+    """
     def dumps(self, obj, **kwargs):
-        return json.dumps(obj, cls=CustomJSONEncoder, **kwargs)
-    
+        if kwargs:
+            # Opciones propias de la biblioteca estándar (indent, sort_keys, ...)
+            return json.dumps(obj, cls=CustomJSONEncoder, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
     def loads(self, s, **kwargs):
-        return json.loads(s, **kwargs)
\ No newline at end of file
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Respuesta JSON sin pasar por str: orjson entrega bytes directamente"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
@@ -0,0 +1,161 @@
+# utils/metricas.py - Métricas Prometheus en proceso
+"""
+Métricas expuestas en `GET /api/metrics` (formato de texto de Prometheus).
+
+Con varios workers de gunicorn, `PROMETHEUS_MULTIPROC_DIR` debe apuntar a un
+directorio vacío y escribible al arrancar: cada worker escribe sus valores en
+archivos mapeados en memoria y el endpoint los agrega, sin importar qué worker
+atienda la petición. Sin esa variable se usan los valores del proceso actual.
+
+Si `prometheus_client` no está instalado las funciones no hacen nada y el
+endpoint responde 503.
+"""
+import os
+import time
+from functools import wraps
+from flask import g, request
+from database import agregar_hook_consulta, get_pool_stats
+
+try:
+    from prometheus_client import (
+        Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+        generate_latest, CONTENT_TYPE_LATEST, multiprocess
+    )
+except ImportError:  # pragma: no cover - prometheus_client es opcional
+    Counter = None
+
+METRICAS_DISPONIBLES = Counter is not None
+
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_DB = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+BUCKETS_PUERTA = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5)
+BUCKETS_TAREAS = (0.1, 0.5, 1, 5, 15, 60, 300)
+
+if METRICAS_DISPONIBLES:
+    HTTP_DURACION = Histogram(
+        'http_request_duration_seconds', 'Duración de las peticiones HTTP',
+        ['method', 'endpoint', 'status'], buckets=BUCKETS_HTTP
+    )
+    DB_CONSULTA_DURACION = Histogram(
+        'db_query_duration_seconds', 'Duración de las consultas a MySQL',
+        ['operacion'], buckets=BUCKETS_DB
+    )
+    DB_POOL_EN_USO = Gauge(
+        'db_pool_connections_in_use', 'Conexiones del pool prestadas', multiprocess_mode='livesum'
+    )
+    DB_POOL_OCIOSAS = Gauge(
+        'db_pool_connections_idle', 'Conexiones del pool ociosas', multiprocess_mode='livesum'
+    )
+    DB_POOL_TIMEOUTS = Gauge(
+        'db_pool_timeouts', 'Esperas por una conexión que agotaron el tiempo (por worker vivo)',
+        multiprocess_mode='livesum'
+    )
+    PUERTA_DURACION = Histogram(
+        'door_open_duration_seconds', 'Latencia de la orden de apertura de la puerta',
+        buckets=BUCKETS_PUERTA
+    )
+    PUERTA_RESULTADOS = Counter(
+        'door_open_total', 'Intentos de apertura de la puerta', ['resultado']
+    )
+    TAREA_DURACION = Histogram(
+        'scheduled_job_duration_seconds', 'Duración de las tareas programadas',
+        ['tarea'], buckets=BUCKETS_TAREAS
+    )
+    TAREA_EJECUCIONES = Counter(
+        'scheduled_job_runs_total', 'Ejecuciones de tareas programadas', ['tarea', 'resultado']
+    )
+    PRESENCIA_DENTRO = Gauge(
+        'presence_inside', 'Personas dentro del laboratorio', ['tipo_usuario'],
+        multiprocess_mode='mostrecent'
+    )
+
+def _operacion(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors='replace')
+    partes = sql.split(None, 1)
+    return partes[0].upper() if partes else ''
+
+def observar_consulta(sql, duracion, filas):
+    """Hook del cursor de `database`: latencia por tipo de sentencia"""
+    DB_CONSULTA_DURACION.labels(_operacion(sql)).observe(duracion)
+
+def observar_peticion(method, endpoint, status, duracion):
+    if METRICAS_DISPONIBLES:
+        HTTP_DURACION.labels(method, endpoint or 'sin_ruta', str(status)).observe(duracion)
+
+def actualizar_pool(stats):
+    """Copia las estadísticas del pool del worker a sus gauges"""
+    if METRICAS_DISPONIBLES:
+        DB_POOL_EN_USO.set(stats['in_use'])
+        DB_POOL_OCIOSAS.set(stats['idle'])
+        DB_POOL_TIMEOUTS.set(stats['timeouts'])
+
+def observar_puerta(resultado, duracion=None):
+    """resultado: abierta, error o no_autorizado"""
+    if METRICAS_DISPONIBLES:
+        PUERTA_RESULTADOS.labels(resultado).inc()
+        if duracion is not None:
+            PUERTA_DURACION.observe(duracion)
+
+def actualizar_presencia(conteos):
+    """conteos: {tipo_usuario: personas dentro}"""
+    if METRICAS_DISPONIBLES:
+        for tipo, dentro in conteos.items():
+            PRESENCIA_DENTRO.labels(tipo).set(dentro)
+
+def medir_tarea(nombre):
+    """Decorador para tareas programadas: duración y resultado de cada ejecución"""
+    def decorador(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = f(*args, **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                if METRICAS_DISPONIBLES:
+                    TAREA_DURACION.labels(nombre).observe(time.perf_counter() - inicio)
+                    TAREA_EJECUCIONES.labels(nombre, resultado).inc()
+        return decorated
+    return decorador
+
+def contar_tarea(nombre, resultado):
+    """Ejecución que no pasó por `medir_tarea` (p. ej. omitida porque otro worker la tomó)"""
+    if METRICAS_DISPONIBLES:
+        TAREA_EJECUCIONES.labels(nombre, resultado).inc()
+
+def generar_metricas():
+    """(cuerpo, content type) con las métricas de todos los workers"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def marcar_worker_terminado(pid):
+    """Para el hook `child_exit` de gunicorn: descarta los gauges `live*` del worker"""
+    if METRICAS_DISPONIBLES and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+def _antes_de_peticion():
+    g.metricas_inicio = time.perf_counter()
+
+def _despues_de_peticion(response):
+    inicio = g.get('metricas_inicio')
+    if inicio is not None:
+        observar_peticion(request.method, request.endpoint, response.status_code,
+                          time.perf_counter() - inicio)
+    actualizar_pool(get_pool_stats())
+    return response
+
+def instalar_metricas(app):
+    """Registra la latencia por ruta y de consultas en la aplicación"""
+    if not METRICAS_DISPONIBLES:
+        print("ADVERTENCIA: prometheus_client no está instalado; /api/metrics deshabilitado")
+        return
+    agregar_hook_consulta(observar_consulta)
+    app.before_request(_antes_de_peticion)
+    app.after_request(_despues_de_peticion)
@@ -0,0 +1,153 @@
+# utils/nonce_cache.py - Protección contra reenvío de tokens del lector QR
+"""
+Recuerda qué usuario ya usó cada token QR del lector (`jti` o `nonce` del
+payload) hasta que el token expira. Un mismo QR lo escanean varias personas,
+por lo que la clave es (nonce, email): el reenvío del mismo usuario se
+detecta en O(1) antes de tocar la base de datos y se responde con el resultado
+del primer escaneo, sin insertar otro registro ni volver a abrir la puerta.
+
+Backends (`READER_NONCE_BACKEND`):
+- memoria: diccionario por worker de gunicorn.
+- sqlite: archivo local compartido por todos los workers de la máquina
+  (`READER_NONCE_DB`).
+"""
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+# Marca de un escaneo que aún se está procesando
+EN_PROCESO = 'en_proceso'
+
+def clave_token(payload, token, email):
+    """Clave de deduplicación: jti/nonce del token y email del usuario"""
+    identificador = payload.get('jti') or payload.get('nonce')
+    if not identificador:
+        identificador = hashlib.sha256(token.encode()).hexdigest()
+    return f"{identificador}|{email.strip().lower()}"
+
+def expiracion_token(payload):
+    """Instante (epoch) hasta el que se recuerda el token"""
+    exp = payload.get('exp')
+    if exp is None:
+        return time.time() + Config.READER_NONCE_TTL
+    return float(exp)
+
+class NonceCacheMemoria:
+    """Nonces vistos por este worker, con expiración por entrada"""
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = {}
+        self._expiraciones = []
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora):
+        while self._expiraciones and (self._expiraciones[0][0] <= ahora or len(self._datos) > self.maximo):
+            exp, clave = heapq.heappop(self._expiraciones)
+            entrada = self._datos.get(clave)
+            if entrada and entrada[0] == exp:
+                del self._datos[clave]
+
+    def reclamar(self, clave, exp):
+        """
+        Intenta reservar `clave`.
+
+        Returns:
+            None si se reservó (primer uso); si no, el resultado guardado del
+            primer escaneo o EN_PROCESO
+        """
+        ahora = time.time()
+        with self._lock:
+            self._purgar(ahora)
+            entrada = self._datos.get(clave)
+            if entrada and entrada[0] > ahora:
+                return entrada[1]
+            self._datos[clave] = (exp, EN_PROCESO)
+            heapq.heappush(self._expiraciones, (exp, clave))
+            return None
+
+    def completar(self, clave, resultado):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada:
+                self._datos[clave] = (entrada[0], resultado)
+
+    def liberar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+class NonceCacheSQLite:
+    """Nonces compartidos entre los workers de la máquina en un archivo SQLite"""
+    PURGAR_CADA = 200
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._contador = 0
+        conn = self._conexion()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nonces (
+                clave TEXT PRIMARY KEY,
+                exp REAL NOT NULL,
+                resultado TEXT NOT NULL
+            )
+        """)
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def reclamar(self, clave, exp):
+        ahora = time.time()
+        conn = self._conexion()
+        self._contador += 1
+        if self._contador % self.PURGAR_CADA == 0:
+            conn.execute("DELETE FROM nonces WHERE exp <= ?", (ahora,))
+
+        # Inserta o reemplaza una entrada vencida en una sola sentencia atómica
+        cursor = conn.execute("""
+            INSERT INTO nonces (clave, exp, resultado) VALUES (?, ?, ?)
+            ON CONFLICT(clave) DO UPDATE SET exp = excluded.exp, resultado = excluded.resultado
+            WHERE nonces.exp <= ?
+        """, (clave, exp, EN_PROCESO, ahora))
+        if cursor.rowcount:
+            return None
+
+        fila = conn.execute("SELECT resultado FROM nonces WHERE clave = ?", (clave,)).fetchone()
+        if not fila:
+            return EN_PROCESO
+        return fila[0] if fila[0] == EN_PROCESO else json.loads(fila[0])
+
+    def completar(self, clave, resultado):
+        self._conexion().execute(
+            "UPDATE nonces SET resultado = ? WHERE clave = ?",
+            (json.dumps(resultado), clave)
+        )
+
+    def liberar(self, clave):
+        self._conexion().execute("DELETE FROM nonces WHERE clave = ?", (clave,))
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_nonce_cache():
+    """Caché de nonces del proceso actual (se recrea tras un fork)"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            if Config.READER_NONCE_BACKEND == 'sqlite':
+                _cache = NonceCacheSQLite(Config.READER_NONCE_DB)
+            else:
+                _cache = NonceCacheMemoria(Config.READER_NONCE_MAX)
+            _cache_pid = os.getpid()
+        return _cache
@@ -0,0 +1,169 @@
+# utils/paginacion.py - Paginación por cursor (keyset) de registros
+"""
+Pagina `registros` y `EST_registros` por la clave (fecha, hora, id) en orden
+descendente. Cada página continúa desde la última fila de la anterior, por lo
+que MySQL recorre el índice idx_fecha_hora (o idx_email_fecha al filtrar por
+email) sólo hasta llenar la página, sin OFFSET ni ordenar la tabla completa.
+
+Los filtros se traducen a condiciones sobre columnas sin funciones, para que
+sigan usando los índices.
+"""
+import base64
+import json
+from datetime import datetime
+from utils.datetime_utils import format_hora
+from utils.validators import validate_email
+
+LIMITE_DEFECTO = 100
+LIMITE_MAXIMO = 500
+
+TIPOS_REGISTRO = {'entrada': 'Entrada', 'salida': 'Salida'}
+
+class FiltroInvalido(ValueError):
+    """Parámetro de filtro o cursor inválido (responder 400)"""
+
+def codificar_cursor(fecha, hora, registro_id):
+    """Cursor opaco con la clave de la última fila entregada"""
+    fecha_str = fecha.strftime('%Y-%m-%d') if hasattr(fecha, 'strftime') else str(fecha)
+    clave = [fecha_str, format_hora(hora), int(registro_id)]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Retorna (fecha, hora, id) desde un cursor generado por `codificar_cursor`"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, hora, registro_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        datetime.strptime(fecha, '%Y-%m-%d')
+        datetime.strptime(hora, '%H:%M:%S')
+        return fecha, hora, int(registro_id)
+    except (ValueError, TypeError):
+        raise FiltroInvalido('Cursor inválido')
+
+def _fecha(valor, nombre):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise FiltroInvalido(f'Formato de fecha inválido en {nombre}. Use YYYY-MM-DD')
+
+def leer_filtros_registros(args):
+    """
+    Lee y valida los parámetros de consulta de un listado de registros.
+
+    Parámetros: email, desde, hasta (YYYY-MM-DD), tipo (entrada/salida),
+    auto_generado (0/1), limit y cursor.
+
+    Raises:
+        FiltroInvalido si algún parámetro no es válido
+    """
+    filtros = {}
+
+    email = (args.get('email') or '').strip().lower()
+    if email:
+        if not validate_email(email):
+            raise FiltroInvalido('Email inválido')
+        filtros['email'] = email
+
+    if args.get('desde'):
+        filtros['desde'] = _fecha(args['desde'], 'desde')
+    if args.get('hasta'):
+        filtros['hasta'] = _fecha(args['hasta'], 'hasta')
+    if 'desde' in filtros and 'hasta' in filtros and filtros['desde'] > filtros['hasta']:
+        raise FiltroInvalido('La fecha desde no puede ser posterior a hasta')
+
+    tipo = (args.get('tipo') or '').strip().lower()
+    if tipo:
+        if tipo not in TIPOS_REGISTRO:
+            raise FiltroInvalido('Tipo de registro debe ser "entrada" o "salida"')
+        filtros['tipo'] = TIPOS_REGISTRO[tipo]
+
+    auto_generado = (args.get('auto_generado') or '').strip().lower()
+    if auto_generado:
+        if auto_generado not in ('0', '1', 'true', 'false'):
+            raise FiltroInvalido('auto_generado debe ser 0 o 1')
+        filtros['auto_generado'] = 1 if auto_generado in ('1', 'true') else 0
+
+    try:
+        limite = int(args.get('limit', LIMITE_DEFECTO))
+    except (TypeError, ValueError):
+        raise FiltroInvalido('limit debe ser un número')
+    filtros['limite'] = max(1, min(limite, LIMITE_MAXIMO))
+
+    if args.get('cursor'):
+        filtros['cursor'] = decodificar_cursor(args['cursor'])
+
+    return filtros
+
+def condiciones_registros(filtros, alias):
+    """Condiciones WHERE y parámetros para los filtros y el cursor"""
+    condiciones = []
+    params = []
+
+    if 'email' in filtros:
+        condiciones.append(f"{alias}.email = %s")
+        params.append(filtros['email'])
+    if 'desde' in filtros:
+        condiciones.append(f"{alias}.fecha >= %s")
+        params.append(filtros['desde'])
+    if 'hasta' in filtros:
+        condiciones.append(f"{alias}.fecha <= %s")
+        params.append(filtros['hasta'])
+    if 'tipo' in filtros:
+        condiciones.append(f"{alias}.tipo = %s")
+        params.append(filtros['tipo'])
+    if 'auto_generado' in filtros:
+        condiciones.append(f"{alias}.auto_generado = %s")
+        params.append(filtros['auto_generado'])
+
+    if 'cursor' in filtros:
+        fecha, hora, registro_id = filtros['cursor']
+        # `fecha <= ?` acota el rango del índice; el resto desempata dentro del día
+        condiciones.append(f"""{alias}.fecha <= %s AND (
+            {alias}.fecha < %s
+            OR ({alias}.fecha = %s AND {alias}.hora < %s)
+            OR ({alias}.fecha = %s AND {alias}.hora = %s AND {alias}.id < %s)
+        )""")
+        params.extend([fecha, fecha, fecha, hora, fecha, hora, registro_id])
+
+    return condiciones, params
+
+def paginar_registros(cursor, select_sql, filtros, alias, params_select=(),
+                      campo_hora='hora', condiciones_extra=None):
+    """
+    Ejecuta una página de registros.
+
+    Args:
+        cursor: Cursor de la base de datos
+        select_sql: "SELECT ... FROM tabla alias [JOIN ...]" sin WHERE ni ORDER BY
+        filtros: Resultado de `leer_filtros_registros`
+        alias: Alias de la tabla de registros en `select_sql`
+        params_select: Parámetros de `select_sql`
+        campo_hora: Nombre con el que `select_sql` devuelve la hora
+        condiciones_extra: Lista de (condición, parámetros) adicionales
+
+    Returns:
+        Tupla (filas, paginacion) con `next_cursor`, `has_more` y `limit`
+    """
+    condiciones, params = condiciones_registros(filtros, alias)
+    for condicion, params_condicion in condiciones_extra or []:
+        condiciones.append(condicion)
+        params.extend(params_condicion)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    limite = filtros['limite']
+
+    cursor.execute(f"""
+        {select_sql}
+        {where}
+        ORDER BY {alias}.fecha DESC, {alias}.hora DESC, {alias}.id DESC
+        LIMIT %s
+    """, (*params_select, *params, limite + 1))
+    filas = list(cursor.fetchall())
+
+    has_more = len(filas) > limite
+    filas = filas[:limite]
+    next_cursor = None
+    if has_more:
+        ultima = filas[-1]
+        next_cursor = codificar_cursor(ultima['fecha'], ultima[campo_hora], ultima['id'])
+
+    return filas, {'next_cursor': next_cursor, 'has_more': has_more, 'limit': limite}
@@ -0,0 +1,270 @@
+# utils/presence.py - Índice de presencia (quién está dentro del laboratorio)
+"""
+Mantiene en la base de datos el conjunto de personas dentro del laboratorio
+(`presencia`) y un contador por tipo de usuario (`presencia_contador`).
+
+Ambos se actualizan en la misma transacción que escribe el registro de
+entrada/salida (ayudantes en `registros`, estudiantes en `EST_registros`), por
+lo que la autorización de la puerta y los listados de presentes consultan el
+índice en lugar de reconstruir el día desde los registros.
+`verificar_presencia` compara el índice con los registros del día y
+`reconciliar_presencia` lo reconstruye desde ellos.
+"""
+from utils.datetime_utils import get_current_datetime
+
+TIPO_AYUDANTE = 'AYUDANTE'
+TIPO_ESTUDIANTE = 'ESTUDIANTE'
+
+DDL_PRESENCIA = """
+CREATE TABLE IF NOT EXISTS presencia (
+    email VARCHAR(100) NOT NULL PRIMARY KEY,
+    tipo_usuario ENUM('AYUDANTE', 'ESTUDIANTE') NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    fecha DATE NOT NULL,
+    hora_entrada TIME NOT NULL,
+    INDEX idx_tipo_hora (tipo_usuario, hora_entrada)
+)
+"""
+
+DDL_PRESENCIA_CONTADOR = """
+CREATE TABLE IF NOT EXISTS presencia_contador (
+    tipo_usuario ENUM('AYUDANTE', 'ESTUDIANTE') NOT NULL PRIMARY KEY,
+    dentro INT NOT NULL DEFAULT 0,
+    reconciliado_at DATETIME NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+# Tabla de registros que alimenta cada tipo de usuario
+TABLAS_REGISTROS = {
+    TIPO_AYUDANTE: 'registros',
+    TIPO_ESTUDIANTE: 'EST_registros'
+}
+
+def marcar_entrada(cursor, email, tipo_usuario, nombre, apellido, fecha, hora):
+    """Agrega a `email` al conjunto de presentes e incrementa el contador si no estaba"""
+    cursor.execute("""
+        INSERT INTO presencia (email, tipo_usuario, nombre, apellido, fecha, hora_entrada)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            nombre = VALUES(nombre),
+            apellido = VALUES(apellido),
+            fecha = VALUES(fecha),
+            hora_entrada = VALUES(hora_entrada)
+    """, (email, tipo_usuario, nombre, apellido, fecha, hora))
+
+    # rowcount: 1 = fila nueva, 2 = actualizada, 0 = sin cambios
+    if cursor.rowcount == 1:
+        cursor.execute(
+            "UPDATE presencia_contador SET dentro = dentro + 1 WHERE tipo_usuario = %s",
+            (tipo_usuario,)
+        )
+
+def marcar_salida(cursor, email, tipo_usuario):
+    """Quita a `email` del conjunto de presentes y decrementa el contador si estaba"""
+    cursor.execute(
+        "DELETE FROM presencia WHERE email = %s AND tipo_usuario = %s",
+        (email, tipo_usuario)
+    )
+    if cursor.rowcount:
+        cursor.execute(
+            "UPDATE presencia_contador SET dentro = GREATEST(dentro - %s, 0) WHERE tipo_usuario = %s",
+            (cursor.rowcount, tipo_usuario)
+        )
+
+def registrar_movimiento(cursor, email, tipo_usuario, tipo, nombre, apellido, fecha, hora):
+    """Aplica un registro de Entrada/Salida al índice de presencia"""
+    if tipo == 'Entrada':
+        marcar_entrada(cursor, email, tipo_usuario, nombre, apellido, fecha, hora)
+    else:
+        marcar_salida(cursor, email, tipo_usuario)
+
+def recalcular_presencia(cursor, email, tipo_usuario, fecha):
+    """
+    Recalcula la presencia de `email` desde sus registros de `fecha` (su último
+    registro del día decide, por hora y luego por id). Para escrituras fuera de
+    orden, como registros manuales con otra hora o eliminaciones.
+    """
+    tabla = TABLAS_REGISTROS[tipo_usuario]
+    cursor.execute(f"""
+        SELECT nombre, apellido, fecha, hora, tipo
+        FROM {tabla}
+        WHERE email = %s AND fecha = %s
+        ORDER BY hora DESC, id DESC
+        LIMIT 1
+    """, (email, fecha))
+    ultimo = cursor.fetchone()
+    if ultimo and ultimo['tipo'] == 'Entrada':
+        marcar_entrada(cursor, email, tipo_usuario, ultimo['nombre'], ultimo['apellido'],
+                       ultimo['fecha'], ultimo['hora'])
+    else:
+        marcar_salida(cursor, email, tipo_usuario)
+
+def marcar_estado_usuario(cursor, email, nombre, apellido, tipo):
+    """Deja `estado_usuarios` en dentro/fuera según el tipo de registro (Entrada/Salida)"""
+    estado = 'dentro' if tipo == 'Entrada' else 'fuera'
+    cursor.execute("""
+        INSERT INTO estado_usuarios (email, nombre, apellido, estado, ultima_entrada, ultima_salida)
+        VALUES (%s, %s, %s, %s,
+            CASE WHEN %s = 'dentro' THEN NOW() ELSE NULL END,
+            CASE WHEN %s = 'fuera' THEN NOW() ELSE NULL END)
+        ON DUPLICATE KEY UPDATE
+            estado = %s,
+            ultima_entrada = CASE WHEN %s = 'dentro' THEN NOW() ELSE ultima_entrada END,
+            ultima_salida = CASE WHEN %s = 'fuera' THEN NOW() ELSE ultima_salida END
+    """, (email, nombre, apellido, estado, estado, estado, estado, estado, estado))
+
+def contar_dentro(cursor, tipo_usuario=TIPO_AYUDANTE):
+    """Cantidad de personas dentro de un tipo (lectura por clave primaria)"""
+    cursor.execute("SELECT dentro FROM presencia_contador WHERE tipo_usuario = %s", (tipo_usuario,))
+    row = cursor.fetchone()
+    return int(row['dentro']) if row else 0
+
+def listar_presentes(cursor, tipo_usuario=TIPO_AYUDANTE):
+    """Personas dentro de un tipo, más recientes primero"""
+    cursor.execute("""
+        SELECT email, nombre, apellido, fecha, hora_entrada
+        FROM presencia
+        WHERE tipo_usuario = %s
+        ORDER BY hora_entrada DESC
+    """, (tipo_usuario,))
+    return cursor.fetchall()
+
+def foto_presencia(cursor, fecha=None):
+    """
+    Personas dentro de ambos tipos en una sola lectura del índice.
+
+    Returns:
+        Dict con fecha y una lista por tipo de usuario (más recientes primero)
+    """
+    fecha = fecha or get_current_datetime().strftime('%Y-%m-%d')
+    cursor.execute("""
+        SELECT tipo_usuario, email, nombre, apellido, hora_entrada
+        FROM presencia
+        WHERE fecha = %s
+        ORDER BY tipo_usuario, hora_entrada DESC
+    """, (fecha,))
+    foto = {'fecha': fecha, TIPO_AYUDANTE: [], TIPO_ESTUDIANTE: []}
+    for fila in cursor.fetchall():
+        foto[fila.pop('tipo_usuario')].append(fila)
+    return foto
+
+def _dentro_segun_registros(tabla):
+    """
+    Subconsulta: personas cuyo último registro de la fecha (%s) es una Entrada.
+
+    "Último" se decide por hora y luego por id, igual que `recalcular_presencia`
+    y el alternado de entrada/salida del QR, para que un registro manual con
+    hora anterior no pase por delante de uno posterior.
+    """
+    return f"""
+        SELECT r.email, r.nombre, r.apellido, r.fecha, r.hora
+        FROM (
+            SELECT email, nombre, apellido, fecha, hora, tipo,
+                   ROW_NUMBER() OVER (PARTITION BY email ORDER BY hora DESC, id DESC) AS orden
+            FROM {tabla}
+            WHERE fecha = %s
+        ) r
+        WHERE r.orden = 1 AND r.tipo = 'Entrada'
+    """
+
+def verificar_presencia(cursor, tipo_usuario=TIPO_AYUDANTE, fecha=None):
+    """
+    Compara el índice de un tipo de usuario con sus registros del día, sin modificarlo.
+
+    Returns:
+        Dict con los emails faltantes (dentro según los registros, no en el
+        índice), sobrantes (en el índice, fuera según los registros), el
+        contador y el total de filas del índice
+    """
+    tabla = TABLAS_REGISTROS[tipo_usuario]
+    fecha = fecha or get_current_datetime().strftime('%Y-%m-%d')
+    dentro = _dentro_segun_registros(tabla)
+
+    cursor.execute(f"""
+        SELECT d.email, 'faltante' AS diferencia
+        FROM ({dentro}) d
+        LEFT JOIN presencia p ON p.email = d.email AND p.tipo_usuario = %s
+        WHERE p.email IS NULL
+        UNION ALL
+        SELECT p.email, 'sobrante'
+        FROM presencia p
+        LEFT JOIN ({dentro}) d ON d.email = p.email
+        WHERE p.tipo_usuario = %s AND d.email IS NULL
+    """, (fecha, tipo_usuario, fecha, tipo_usuario))
+    diferencias = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT
+            (SELECT dentro FROM presencia_contador WHERE tipo_usuario = %s) AS contador,
+            (SELECT COUNT(*) FROM presencia WHERE tipo_usuario = %s) AS filas
+    """, (tipo_usuario, tipo_usuario))
+    totales = cursor.fetchone()
+    contador = int(totales['contador'] or 0)
+    filas = int(totales['filas'] or 0)
+
+    faltantes = sorted(d['email'] for d in diferencias if d['diferencia'] == 'faltante')
+    sobrantes = sorted(d['email'] for d in diferencias if d['diferencia'] == 'sobrante')
+    return {
+        'tipo_usuario': tipo_usuario,
+        'fecha': fecha,
+        'consistente': not faltantes and not sobrantes and contador == filas,
+        'faltantes': faltantes,
+        'sobrantes': sobrantes,
+        'contador': contador,
+        'filas': filas
+    }
+
+def reconciliar_presencia(conn, tipo_usuario=TIPO_AYUDANTE, fecha=None):
+    """
+    Recalcula el índice de un tipo de usuario desde los registros del día.
+
+    Una persona está dentro si su último registro del día es una Entrada.
+
+    Returns:
+        Dict con el contador antes y después de reconciliar
+    """
+    tabla = TABLAS_REGISTROS[tipo_usuario]
+    fecha = fecha or get_current_datetime().strftime('%Y-%m-%d')
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT dentro FROM presencia_contador WHERE tipo_usuario = %s FOR UPDATE",
+            (tipo_usuario,)
+        )
+        row = cursor.fetchone()
+        antes = int(row['dentro']) if row else 0
+
+        cursor.execute("DELETE FROM presencia WHERE tipo_usuario = %s", (tipo_usuario,))
+        cursor.execute(f"""
+            INSERT INTO presencia (email, tipo_usuario, nombre, apellido, fecha, hora_entrada)
+            SELECT d.email, %s, d.nombre, d.apellido, d.fecha, d.hora
+            FROM ({_dentro_segun_registros(tabla)}) d
+        """, (tipo_usuario, fecha))
+        despues = cursor.rowcount
+
+        cursor.execute("""
+            INSERT INTO presencia_contador (tipo_usuario, dentro, reconciliado_at)
+            VALUES (%s, %s, NOW())
+            ON DUPLICATE KEY UPDATE dentro = VALUES(dentro), reconciliado_at = NOW()
+        """, (tipo_usuario, despues))
+
+    conn.commit()
+    return {'tipo_usuario': tipo_usuario, 'antes': antes, 'despues': despues}
+
+def ensure_presence_tables(conn):
+    """Crea las tablas del índice y lo inicializa la primera vez"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_PRESENCIA)
+        cursor.execute(DDL_PRESENCIA_CONTADOR)
+        cursor.execute("""
+            INSERT IGNORE INTO presencia_contador (tipo_usuario, dentro)
+            VALUES ('AYUDANTE', 0), ('ESTUDIANTE', 0)
+        """)
+        nuevas = cursor.rowcount
+    conn.commit()
+
+    if nuevas:
+        for tipo_usuario in TABLAS_REGISTROS:
+            reconciliar_presencia(conn, tipo_usuario)
@@ -0,0 +1,478 @@
+# utils/retencion.py - Particionado mensual y archivo de registros antiguos
+"""
+`registros` y `EST_registros` sólo crecen, pero casi todas las lecturas piden
+el día o la semana actual. Este módulo:
+
+- particiona ambas tablas por mes (`PARTITION BY RANGE (TO_DAYS(fecha))`, una
+  partición `pAAAAMM` por mes más `p_futuro`), así un filtro por fecha sólo
+  recorre los meses pedidos;
+- crea por adelantado las particiones de los próximos PARTICIONES_MESES_ADELANTE
+  meses (en la tarea mensual y con `flask --app app mantener-particiones`; al
+  iniciar, sólo si falta la del mes actual);
+- mueve los semestres cerrados a `registros_archivo` / `EST_registros_archivo`
+  (InnoDB comprimido) y, si ARCHIVO_DIR está definido, además a un CSV gzip por
+  tabla y semestre;
+- mantiene las vistas `registros_historial` / `EST_registros_historial`
+  (UNION ALL de la tabla viva y su archivo) para los reportes históricos.
+
+Los semestres son mitades del año: AAAA-1 (enero a junio) y AAAA-2 (julio a
+diciembre). El semestre actual nunca se archiva, así que una lectura que empieza
+en él usa la tabla viva y una que empieza antes usa la vista (`origen_registros`).
+"""
+import gzip
+import os
+import re
+from datetime import date, datetime
+from config import Config
+from utils.datetime_utils import get_current_datetime
+
+TABLAS_RETENCION = ('registros', 'EST_registros')
+
+ARCHIVOS = {
+    'registros': 'registros_archivo',
+    'EST_registros': 'EST_registros_archivo'
+}
+
+VISTAS_HISTORIAL = {
+    'registros': 'registros_historial',
+    'EST_registros': 'EST_registros_historial'
+}
+
+COLUMNAS_REGISTRO = ['id', 'fecha', 'hora', 'dia', 'nombre', 'apellido', 'email', 'tipo', 'auto_generado', 'created_at']
+
+PARTICION_MAXIMA = 'p_futuro'
+
+# Filas por DELETE al vaciar meses que no ocupan una partición completa
+LOTE_BORRADO = 5000
+
+# TO_DAYS('0001-01-01') = 366 y date(1, 1, 1).toordinal() = 1
+_DESFASE_TO_DAYS = 365
+
+def ddl_archivo(tabla):
+    """DDL de la tabla de archivo de `tabla` (misma clave que la tabla particionada)"""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {ARCHIVOS[tabla]} (
+        id INT NOT NULL,
+        fecha DATE NOT NULL,
+        hora TIME NOT NULL,
+        dia VARCHAR(20),
+        nombre VARCHAR(100) NOT NULL,
+        apellido VARCHAR(100) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        tipo ENUM('Entrada', 'Salida') NOT NULL,
+        auto_generado BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP NULL,
+        archivado_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, fecha),
+        INDEX idx_email_fecha (email, fecha),
+        INDEX idx_fecha_hora (fecha, hora)
+    ) ROW_FORMAT=COMPRESSED
+    """
+
+def ddl_vista(tabla, reemplazar=False):
+    """
+    Vista histórica: tabla viva más su archivo. Las filas archivadas que siguen
+    en la tabla viva (entre la copia y el borrado de un semestre) aparecen una vez.
+    """
+    columnas = ', '.join(COLUMNAS_REGISTRO)
+    columnas_archivo = ', '.join(f"a.{columna}" for columna in COLUMNAS_REGISTRO)
+    return f"""
+    {'CREATE OR REPLACE VIEW' if reemplazar else 'CREATE VIEW'} {VISTAS_HISTORIAL[tabla]} AS
+    SELECT {columnas} FROM {tabla}
+    UNION ALL
+    SELECT {columnas_archivo} FROM {ARCHIVOS[tabla]} a
+    WHERE NOT EXISTS (SELECT 1 FROM {tabla} t WHERE t.id = a.id AND t.fecha = a.fecha)
+    """
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor))
+
+def _primer_dia(fecha):
+    return fecha.replace(day=1)
+
+def _mes_siguiente(fecha):
+    return date(fecha.year + fecha.month // 12, fecha.month % 12 + 1, 1)
+
+def _meses(desde, hasta):
+    """Primer día de cada mes en [desde, hasta)"""
+    mes = _primer_dia(desde)
+    while mes < hasta:
+        yield mes
+        mes = _mes_siguiente(mes)
+
+def inicio_semestre(fecha):
+    fecha = _fecha(fecha)
+    return date(fecha.year, 1 if fecha.month <= 6 else 7, 1)
+
+def _semestre_anterior(inicio):
+    return date(inicio.year - 1, 7, 1) if inicio.month == 1 else date(inicio.year, 1, 1)
+
+def semestre_de(fecha):
+    """Etiqueta 'AAAA-N' del semestre de `fecha`"""
+    inicio = inicio_semestre(fecha)
+    return f"{inicio.year}-{1 if inicio.month == 1 else 2}"
+
+def rango_semestre(etiqueta):
+    """'AAAA-1' | 'AAAA-2' → (primer día, primer día del semestre siguiente)"""
+    coincidencia = re.fullmatch(r'(\d{4})-([12])', str(etiqueta).strip())
+    if not coincidencia:
+        raise ValueError(f"Semestre inválido: {etiqueta!r} (use AAAA-1 o AAAA-2)")
+    anio, numero = int(coincidencia.group(1)), int(coincidencia.group(2))
+    if numero == 1:
+        return date(anio, 1, 1), date(anio, 7, 1)
+    return date(anio, 7, 1), date(anio + 1, 1, 1)
+
+def origen_registros(tabla, desde):
+    """
+    Tabla o vista desde la que leer `tabla` a partir de `desde`.
+
+    El semestre actual siempre está en la tabla viva; un rango que empieza
+    antes (o sin fecha de inicio) puede incluir filas archivadas.
+    """
+    if desde is not None and _fecha(desde) >= inicio_semestre(get_current_datetime().date()):
+        return tabla
+    return VISTAS_HISTORIAL[tabla]
+
+def particiones(cursor, tabla):
+    """Particiones de `tabla` en orden, con su límite superior (None = MAXVALUE)"""
+    cursor.execute("""
+        SELECT PARTITION_NAME AS nombre, PARTITION_DESCRIPTION AS descripcion, TABLE_ROWS AS filas
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (tabla,))
+    resultado = []
+    for fila in cursor.fetchall():
+        descripcion = str(fila['descripcion'])
+        limite = None if descripcion == 'MAXVALUE' else date.fromordinal(int(descripcion) - _DESFASE_TO_DAYS)
+        resultado.append({'nombre': fila['nombre'], 'limite': limite, 'filas': int(fila['filas'] or 0)})
+    return resultado
+
+def _definicion_particiones(meses):
+    partes = [
+        f"PARTITION p{mes:%Y%m} VALUES LESS THAN (TO_DAYS('{_mes_siguiente(mes).isoformat()}'))"
+        for mes in meses
+    ]
+    partes.append(f"PARTITION {PARTICION_MAXIMA} VALUES LESS THAN MAXVALUE")
+    return ",\n            ".join(partes)
+
+def _hasta_meses_adelante(now, meses_adelante):
+    """Primer día del mes siguiente al último que debe tener partición"""
+    hasta = _primer_dia(_fecha(now))
+    for _ in range(meses_adelante + 1):
+        hasta = _mes_siguiente(hasta)
+    return hasta
+
+def _con_lock(cursor, nombre, espera=30):
+    cursor.execute("SELECT GET_LOCK(%s, %s) AS obtenido", (nombre, espera))
+    return bool(cursor.fetchone()['obtenido'])
+
+def _soltar_lock(cursor, nombre):
+    cursor.execute("SELECT RELEASE_LOCK(%s)", (nombre,))
+    cursor.fetchall()
+
+def particionar_tabla(conn, tabla, now=None, meses_adelante=None):
+    """
+    Convierte `tabla` en particionada por mes. Reconstruye la tabla completa
+    (copia todas las filas), así que se ejecuta a mano y fuera de horario.
+
+    La clave primaria pasa a ser (id, fecha): MySQL exige que la columna de
+    partición forme parte de toda clave única. `id` sigue siendo autoincremental.
+
+    Returns:
+        Cantidad de particiones mensuales creadas, o 0 si ya estaba particionada
+    """
+    now = now or get_current_datetime()
+    meses_adelante = Config.PARTICIONES_MESES_ADELANTE if meses_adelante is None else meses_adelante
+    lock = f'particiones:{tabla}'
+    with conn.cursor() as cursor:
+        if not _con_lock(cursor, lock):
+            raise RuntimeError(f"No se obtuvo el lock {lock}")
+        try:
+            if particiones(cursor, tabla):
+                return 0
+            cursor.execute(f"SELECT MIN(fecha) AS primera FROM {tabla}")
+            primera = cursor.fetchone()['primera'] or _fecha(now)
+            meses = list(_meses(_fecha(primera), _hasta_meses_adelante(now, meses_adelante)))
+            cursor.execute(f"""
+                ALTER TABLE {tabla}
+                DROP PRIMARY KEY, ADD PRIMARY KEY (id, fecha)
+                PARTITION BY RANGE (TO_DAYS(fecha)) (
+                {_definicion_particiones(meses)}
+                )
+            """)
+            return len(meses)
+        finally:
+            _soltar_lock(cursor, lock)
+
+def crear_particiones_futuras(conn, tabla, now=None, meses_adelante=None):
+    """
+    Divide la partición MAXVALUE para que existan las particiones del mes actual
+    y de los `meses_adelante` siguientes. Idempotente y protegido con un lock
+    de MySQL para que workers y tareas no reorganicen la tabla a la vez.
+
+    Returns:
+        Nombres de las particiones creadas, o None si la tabla no está particionada
+    """
+    now = now or get_current_datetime()
+    meses_adelante = Config.PARTICIONES_MESES_ADELANTE if meses_adelante is None else meses_adelante
+    lock = f'particiones:{tabla}'
+    with conn.cursor() as cursor:
+        if not _con_lock(cursor, lock):
+            raise RuntimeError(f"No se obtuvo el lock {lock}")
+        try:
+            actuales = particiones(cursor, tabla)
+            if not actuales:
+                return None
+            maxima = next((p['nombre'] for p in actuales if p['limite'] is None), None)
+            if maxima is None:
+                raise RuntimeError(f"{tabla} no tiene partición MAXVALUE")
+
+            limites = [p['limite'] for p in actuales if p['limite'] is not None]
+            desde = max(limites) if limites else _primer_dia(_fecha(now))
+            nuevos = list(_meses(desde, _hasta_meses_adelante(now, meses_adelante)))
+            if not nuevos:
+                return []
+
+            cursor.execute(f"""
+                ALTER TABLE {tabla} REORGANIZE PARTITION {maxima} INTO (
+                {_definicion_particiones(nuevos)}
+                )
+            """)
+            return [f"p{mes:%Y%m}" for mes in nuevos]
+        finally:
+            _soltar_lock(cursor, lock)
+
+def exportar_semestre(tabla, etiqueta, directorio):
+    """Escribe el semestre de `tabla` (vivo y archivado) en `<directorio>/<tabla>_<semestre>.csv.gz`"""
+    # Importación diferida: exportacion usa origen_registros de este módulo
+    from utils.exportacion import iterar_filas, serializar_csv
+
+    inicio, fin = rango_semestre(etiqueta)
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{tabla}_{etiqueta}.csv.gz")
+    temporal = f"{ruta}.tmp"
+    with gzip.open(temporal, 'wb') as salida:
+        for bloque in serializar_csv(iterar_filas(VISTAS_HISTORIAL[tabla], inicio, fin)):
+            salida.write(bloque)
+    os.replace(temporal, ruta)
+    return ruta
+
+def _copiar_al_archivo(cursor, tabla, etiqueta, rango):
+    """Copia el rango al archivo (INSERT IGNORE) y verifica que no falte ninguna fila viva"""
+    columnas = ', '.join(COLUMNAS_REGISTRO)
+    cursor.execute(f"""
+        INSERT IGNORE INTO {ARCHIVOS[tabla]} ({columnas})
+        SELECT {columnas} FROM {tabla}
+        WHERE fecha >= %s AND fecha < %s
+    """, rango)
+    cursor.execute(f"""
+        SELECT COUNT(*) AS filas, COUNT(*) - COUNT(a.id) AS faltantes
+        FROM {tabla} t
+        LEFT JOIN {ARCHIVOS[tabla]} a ON a.id = t.id AND a.fecha = t.fecha
+        WHERE t.fecha >= %s AND t.fecha < %s
+    """, rango)
+    conteo = cursor.fetchone()
+    filas, faltantes = int(conteo['filas'] or 0), int(conteo['faltantes'] or 0)
+    if faltantes:
+        raise RuntimeError(f"{faltantes} filas de {tabla} {etiqueta} no llegaron al archivo; no se borra nada")
+    return filas
+
+def _particiones_completas(cursor, tabla, inicio, fin):
+    """Particiones de `tabla` que sólo pueden contener filas entre `inicio` y `fin`"""
+    # Sin filas vivas anteriores al semestre (ya archivadas), una partición
+    # cuyo límite inferior quedó antes del semestre sólo contiene filas de él
+    cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {tabla} WHERE fecha < %s) AS previas", (inicio.isoformat(),))
+    sin_previas = not cursor.fetchone()['previas']
+
+    completas = []
+    limite_inferior = None
+    for particion in particiones(cursor, tabla):
+        limite = particion['limite']
+        desde_inicio = sin_previas or (limite_inferior is not None and limite_inferior >= inicio)
+        if limite is not None and limite <= fin and desde_inicio:
+            completas.append(particion['nombre'])
+        limite_inferior = limite
+    return completas
+
+def archivar_semestre(conn, tabla, etiqueta, now=None, directorio=None):
+    """
+    Mueve un semestre cerrado de `tabla` a su tabla de archivo.
+
+    1. Con `directorio`, exporta antes el semestre a un CSV gzip.
+    2. Copia las filas al archivo (INSERT IGNORE: repetir es seguro) y verifica
+       que ninguna fila viva del semestre falte en él.
+    3. Si la tabla está particionada, con `LOCK TABLES ... WRITE` (nadie inserta
+       mientras tanto) vuelve a copiar y verificar, y elimina las particiones que
+       sólo contienen filas del semestre (DROP PARTITION, sin recorrer filas).
+       Así una fila con fecha atrasada insertada durante la copia no se pierde.
+    4. Borra por lotes lo que quede (tabla sin particionar o particiones
+       compartidas con meses anteriores), sólo las filas que ya están en el archivo.
+
+    Todo ocurre con el lock `particiones:{tabla}`, el mismo que usan
+    `particionar_tabla` y `crear_particiones_futuras`.
+
+    Returns:
+        Dict con tabla, semestre, filas archivadas, particiones eliminadas y archivo
+    """
+    inicio, fin = rango_semestre(etiqueta)
+    now = now or get_current_datetime()
+    if fin > inicio_semestre(now):
+        raise ValueError(f"El semestre {etiqueta} no está cerrado")
+
+    archivo = exportar_semestre(tabla, etiqueta, directorio) if directorio else None
+    rango = (inicio.isoformat(), fin.isoformat())
+    lock = f'particiones:{tabla}'
+
+    with conn.cursor() as cursor:
+        cursor.execute(ddl_archivo(tabla))
+        if not _con_lock(cursor, lock):
+            raise RuntimeError(f"No se obtuvo el lock {lock}")
+        try:
+            filas = _copiar_al_archivo(cursor, tabla, etiqueta, rango)
+            conn.commit()
+
+            completas = []
+            if particiones(cursor, tabla):
+                # Las consultas con alias necesitan su propio lock bajo LOCK TABLES
+                cursor.execute(f"""
+                    LOCK TABLES {tabla} WRITE, {tabla} AS t READ,
+                                {ARCHIVOS[tabla]} WRITE, {ARCHIVOS[tabla]} AS a READ
+                """)
+                try:
+                    filas = _copiar_al_archivo(cursor, tabla, etiqueta, rango)
+                    conn.commit()
+                    completas = _particiones_completas(cursor, tabla, inicio, fin)
+                    if completas:
+                        cursor.execute(f"ALTER TABLE {tabla} DROP PARTITION {', '.join(completas)}")
+                finally:
+                    cursor.execute("UNLOCK TABLES")
+
+            while True:
+                cursor.execute(f"""
+                    DELETE FROM {tabla}
+                    WHERE fecha >= %s AND fecha < %s
+                    AND EXISTS (
+                        SELECT 1 FROM {ARCHIVOS[tabla]} a
+                        WHERE a.id = {tabla}.id AND a.fecha = {tabla}.fecha
+                    )
+                    LIMIT %s
+                """, rango + (LOTE_BORRADO,))
+                borradas = cursor.rowcount
+                conn.commit()
+                if borradas < LOTE_BORRADO:
+                    break
+        finally:
+            _soltar_lock(cursor, lock)
+
+    return {
+        'tabla': tabla,
+        'semestre': etiqueta,
+        'filas': filas,
+        'particiones_eliminadas': completas,
+        'archivo': archivo
+    }
+
+def semestres_vencidos(conn, tabla, now=None, semestres_vivos=None):
+    """Semestres con filas en la tabla viva anteriores a los ARCHIVO_SEMESTRES_VIVOS más recientes"""
+    now = now or get_current_datetime()
+    semestres_vivos = max(1, Config.ARCHIVO_SEMESTRES_VIVOS if semestres_vivos is None else semestres_vivos)
+    corte = inicio_semestre(_fecha(now))
+    for _ in range(semestres_vivos - 1):
+        corte = _semestre_anterior(corte)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(fecha) AS primera FROM {tabla}")
+        primera = cursor.fetchone()['primera']
+    if primera is None:
+        return []
+
+    vencidos = []
+    semestre = inicio_semestre(primera)
+    while semestre < corte:
+        vencidos.append(semestre_de(semestre))
+        semestre = rango_semestre(semestre_de(semestre))[1]
+    return vencidos
+
+def mantener_registros(conn, now=None, meses_adelante=None, archivar=False, directorio=None):
+    """
+    Mantenimiento de ambas tablas: particiones futuras y, con `archivar`, el
+    archivo de los semestres vencidos.
+
+    Returns:
+        {tabla: {'particiones_nuevas': [...] | None, 'archivados': [...]}}
+    """
+    now = now or get_current_datetime()
+    resultado = {}
+    for tabla in TABLAS_RETENCION:
+        resultado[tabla] = {
+            'particiones_nuevas': crear_particiones_futuras(conn, tabla, now, meses_adelante),
+            'archivados': []
+        }
+        if archivar:
+            for etiqueta in semestres_vencidos(conn, tabla, now):
+                resultado[tabla]['archivados'].append(
+                    archivar_semestre(conn, tabla, etiqueta, now=now, directorio=directorio)
+                )
+    return resultado
+
+def _vista_existe(cursor, vista):
+    cursor.execute("""
+        SELECT COUNT(*) AS existe
+        FROM information_schema.VIEWS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (vista,))
+    return bool(cursor.fetchone()['existe'])
+
+def crear_vistas(conn, reemplazar=False):
+    """
+    Crea las vistas históricas que falten. Con `reemplazar`, las vuelve a definir
+    aunque existan (para aplicar un cambio de `ddl_vista`).
+
+    Returns:
+        Vistas creadas o reemplazadas
+    """
+    creadas = []
+    with conn.cursor() as cursor:
+        for tabla in TABLAS_RETENCION:
+            vista = VISTAS_HISTORIAL[tabla]
+            if not reemplazar and _vista_existe(cursor, vista):
+                continue
+            try:
+                cursor.execute(ddl_vista(tabla, reemplazar))
+            except Exception:
+                # Otro worker la creó entre la consulta y el CREATE VIEW
+                if reemplazar or not _vista_existe(cursor, vista):
+                    raise
+                continue
+            creadas.append(vista)
+    conn.commit()
+    return creadas
+
+def ensure_archivo_tables(conn, now=None):
+    """
+    Crea las tablas de archivo y las vistas históricas que falten. No reemplaza
+    vistas ni reorganiza particiones: eso queda para la tarea mensual y
+    `flask --app app mantener-particiones`.
+
+    Returns:
+        Dict con las tablas vivas sin particionar (`sin_particionar`) y las
+        particionadas que no tienen partición para el mes actual (`sin_mes_actual`)
+    """
+    mes_siguiente = _mes_siguiente(_primer_dia(_fecha(now or get_current_datetime())))
+    estado = {'sin_particionar': [], 'sin_mes_actual': []}
+    with conn.cursor() as cursor:
+        for tabla in TABLAS_RETENCION:
+            cursor.execute(ddl_archivo(tabla))
+            actuales = particiones(cursor, tabla)
+            if not actuales:
+                estado['sin_particionar'].append(tabla)
+            elif not any(p['limite'] is not None and p['limite'] >= mes_siguiente for p in actuales):
+                estado['sin_mes_actual'].append(tabla)
+    conn.commit()
+    crear_vistas(conn)
+    return estado
@@ -4,6 +4,7 @@ import { StyleSheet, Text, View, FlatList, Platform, RefreshControl, Image, Acti
 
 // Usar una constante directa para la URL de la API - con HTTPS
 import { API_ENDPOINTS } from '../../../constants/ApiConfig';
+import { useEventos } from '../../../hooks/useEventos';
 
 export default function AyudantesScreen() {
   const [ayudantes, setAyudantes] = useState([]);
@@ -56,11 +57,38 @@ export default function AyudantesScreen() {
       });
   };
 
+  // Cambios de presencia en tiempo real
+  const conectado = useEventos({
+    onPresencia: (evento) => {
+      if (evento.poblacion !== 'ayudantes') return;
+      setAyudantes(prev => {
+        const resto = prev.filter(ayudante => ayudante.email !== evento.email);
+        if (!evento.presente) return resto;
+        return [{
+          id: evento.email,
+          nombre: evento.nombre || 'Sin nombre',
+          apellido: evento.apellido || 'Sin apellido',
+          email: evento.email,
+          ultima_entrada: evento.hora || '--:--',
+          foto_url: null,
+          estado: 'dentro'
+        }, ...resto];
+      });
+      setLastUpdated(new Date());
+    },
+    onReset: () => loadAyudantes()
+  });
+
   useEffect(() => {
     loadAyudantes();
+  }, []);
+
+  useEffect(() => {
+    // Consultar periódicamente sólo si no hay stream de eventos
+    if (conectado) return;
     const interval = setInterval(loadAyudantes, 120000); // Actualizar cada 2 minutos
     return () => clearInterval(interval);
-  }, []);
+  }, [conectado]);
 
   const onRefresh = () => {
     loadAyudantes();
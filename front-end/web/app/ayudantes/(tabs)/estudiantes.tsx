@@ -3,6 +3,7 @@ import React, { useEffect, useState } from 'react';
 import { StyleSheet, Text, View, FlatList, Platform, RefreshControl, Image, ActivityIndicator, TouchableOpacity, Alert, Modal } from 'react-native';
 
 import { API_ENDPOINTS } from '../../../constants/ApiConfig';
+import { useEventos } from '../../../hooks/useEventos';
 
 export default function EstudiantesScreen() {
   const [estudiantes, setEstudiantes] = useState([]);
@@ -55,11 +56,38 @@ export default function EstudiantesScreen() {
       });
   };
 
+  // Cambios de presencia en tiempo real
+  const conectado = useEventos({
+    onPresencia: (evento) => {
+      if (evento.poblacion !== 'estudiantes') return;
+      setEstudiantes(prev => {
+        const resto = prev.filter(estudiante => estudiante.email !== evento.email);
+        if (!evento.presente) return resto;
+        return [{
+          id: evento.email,
+          nombre: evento.nombre || 'Sin nombre',
+          apellido: evento.apellido || 'Sin apellido',
+          email: evento.email,
+          ultima_entrada: evento.hora || '--:--',
+          foto_url: null,
+          estado: 'dentro'
+        }, ...resto];
+      });
+      setLastUpdated(new Date());
+    },
+    onReset: () => loadEstudiantes()
+  });
+
   useEffect(() => {
     loadEstudiantes();
+  }, []);
+
+  useEffect(() => {
+    // Consultar periódicamente sólo si no hay stream de eventos
+    if (conectado) return;
     const interval = setInterval(loadEstudiantes, 120000); // Actualizar cada 2 minutos
     return () => clearInterval(interval);
-  }, []);
+  }, [conectado]);
 
   const onRefresh = () => {
     loadEstudiantes();
@@ -147,8 +175,10 @@ export default function EstudiantesScreen() {
           Alert.alert('Éxito', `Salida registrada para ${estudiante.nombre} ${estudiante.apellido}`);
         }
 
-        // Recargar la lista
-        loadEstudiantes();
+        // Sin stream de eventos, recargar la lista
+        if (!conectado) {
+          loadEstudiantes();
+        }
       })
       .catch(err => {
         console.error('Error al marcar salida:', err);
@@ -5,6 +5,7 @@ import { Platform } from 'react-native';
 
 // Importar configuración unificada
 import { API_ENDPOINTS } from '../../../constants/ApiConfig';
+import { useEventos } from '../../../hooks/useEventos';
 
 export default function RegistrosScreen() {
   const [registros, setRegistros] = useState([]);
@@ -60,6 +61,29 @@ export default function RegistrosScreen() {
       });
   };
 
+  // Registros nuevos en tiempo real
+  const conectado = useEventos({
+    onRegistro: (evento) => {
+      if (evento.poblacion !== 'ayudantes') return;
+      setRegistros(prev => {
+        if (prev.some(registro => registro.id === evento.id)) return prev;
+        return [{
+          id: evento.id,
+          fecha: evento.fecha || '',
+          hora: evento.hora || '',
+          dia: '',
+          nombre: evento.nombre || 'Sin nombre',
+          apellido: evento.apellido || 'Sin apellido',
+          email: evento.email || 'sin-email@example.com',
+          tipo: evento.tipo || '',
+          estado: ''
+        }, ...prev];
+      });
+      setLastUpdateTime(new Date().toLocaleTimeString());
+    },
+    onReset: () => loadRegistros()
+  });
+
   // Only run on the client side
   useEffect(() => {
     // Set initial last update time to prevent hydration mismatch
@@ -67,15 +91,18 @@ export default function RegistrosScreen() {
     
     // Use useEffect to ensure this only runs on the client
     loadRegistros();
-    
-    // Configurar intervalo para recargar datos
+  }, []);
+
+  useEffect(() => {
+    // Configurar intervalo para recargar datos sólo si no hay stream de eventos
+    if (conectado) return;
     const interval = setInterval(loadRegistros, 300000); // 5 minutos
     
     // Limpiar intervalo cuando el componente se desmonte
     return () => {
       clearInterval(interval);
     };
-  }, []);
+  }, [conectado]);
 
   const onRefresh = () => {
     loadRegistros();
@@ -42,8 +42,11 @@ export default function RegistrosScreen() {
   const [refreshing, setRefreshing] = useState(false);
   const [searchText, setSearchText] = useState('');
   const [error, setError] = useState<string | null>(null);
-  const [filter, setFilter] = useState('hoy'); // 'hoy', 'semana', 'mes'
+  const [filter, setFilter] = useState('hoy'); // 'hoy', 'semana', 'mes', 'todos'
   const [showFilterModal, setShowFilterModal] = useState(false);
+  // Paginación por cursor de la vista 'todos'
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Cargar datos iniciales
   useEffect(() => {
@@ -84,6 +87,12 @@ export default function RegistrosScreen() {
       if (result.status === 'success' && Array.isArray(result.data)) {
         setRegistros(result.data);
         setFilteredRegistros(result.data);
+        setNextCursor(null);
+      } else if (result.status === 'success' && result.data && Array.isArray(result.data.registros)) {
+        // Vista 'todos': primera página de {registros, paginacion}
+        setRegistros(result.data.registros);
+        setFilteredRegistros(result.data.registros);
+        setNextCursor(result.data.paginacion?.next_cursor ?? null);
       } else {
         console.error('Estructura de datos inesperada:', result);
         throw new Error('Formato de datos inesperado');
@@ -97,6 +106,34 @@ export default function RegistrosScreen() {
     }
   };
 
+  // Cargar la página siguiente de la vista 'todos'
+  const loadMoreRegistros = async () => {
+    if (filter !== 'todos' || !nextCursor || loadingMore) {
+      return;
+    }
+    setLoadingMore(true);
+
+    try {
+      const endpoint = `${API_ENDPOINTS.ESTUDIANTES.REGISTROS}?cursor=${encodeURIComponent(nextCursor)}`;
+      const response = await fetch(endpoint);
+      if (!response.ok) {
+        throw new Error('Error al cargar más registros');
+      }
+
+      const result = await response.json();
+      if (result.status === 'success' && result.data && Array.isArray(result.data.registros)) {
+        setRegistros(prev => [...prev, ...result.data.registros]);
+        setNextCursor(result.data.paginacion?.next_cursor ?? null);
+      } else {
+        console.error('Estructura de datos inesperada:', result);
+      }
+    } catch (error) {
+      console.error('Error cargando más registros:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Filtrar registros según búsqueda
   const filterRegistros = () => {
     if (!searchText.trim()) {
@@ -239,6 +276,8 @@ export default function RegistrosScreen() {
         return 'Esta semana';
       case 'mes':
         return 'Este mes';
+      case 'todos':
+        return 'Todos';
       default:
         return 'Registros';
     }
@@ -286,6 +325,11 @@ export default function RegistrosScreen() {
         keyExtractor={item => item.fecha}
         contentContainerStyle={styles.listContainer}
         refreshControl={<RefreshControl refreshing={refreshing} onRefresh={onRefresh} />}
+        onEndReached={loadMoreRegistros}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={
+          loadingMore ? <ActivityIndicator style={styles.loadingMore} color="#0066CC" /> : null
+        }
         ListEmptyComponent={
           <View style={styles.emptyContainer}>
             <Ionicons name="document-text" size={60} color="#ccc" />
@@ -337,6 +381,17 @@ export default function RegistrosScreen() {
               <Text style={styles.filterOptionText}>Este mes</Text>
               {filter === 'mes' && <Ionicons name="checkmark" size={20} color="#0066CC" />}
             </TouchableOpacity>
+
+            <TouchableOpacity 
+              style={[styles.filterOption, filter === 'todos' && styles.selectedFilter]}
+              onPress={() => {
+                setFilter('todos');
+                setShowFilterModal(false);
+              }}
+            >
+              <Text style={styles.filterOptionText}>Todos</Text>
+              {filter === 'todos' && <Ionicons name="checkmark" size={20} color="#0066CC" />}
+            </TouchableOpacity>
             
             <TouchableOpacity 
               style={styles.closeButton}
@@ -356,6 +411,9 @@ const styles = StyleSheet.create({
     flex: 1,
     backgroundColor: '#f5f5f5',
   },
+  loadingMore: {
+    marginVertical: 16,
+  },
   centerContainer: {
     flex: 1,
     justifyContent: 'center',
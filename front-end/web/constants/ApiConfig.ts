@@ -59,6 +59,9 @@ export const API_ENDPOINTS = {
     VALIDATE: `${API_BASE_URL}/lector/validar`
   },
 
+  // Eventos en tiempo real (Server-Sent Events)
+  EVENTOS: `${API_BASE_URL}/eventos`,
+
   // Health check
   HEALTH: `${API_BASE_URL}/health`
 };
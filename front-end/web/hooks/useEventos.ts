@@ -0,0 +1,89 @@
+// hooks/useEventos.ts
+// Suscripción al stream SSE del backend (/api/eventos).
+// El navegador reconecta solo y reenvía Last-Event-ID, así que el backend
+// entrega únicamente los eventos perdidos durante la desconexión.
+import { useEffect, useRef, useState } from 'react';
+
+import { API_ENDPOINTS } from '@/constants/ApiConfig';
+
+export type Poblacion = 'ayudantes' | 'estudiantes';
+
+export interface EventoRegistro {
+  poblacion: Poblacion;
+  id: number;
+  email: string;
+  nombre: string;
+  apellido: string;
+  fecha: string;
+  hora: string;
+  tipo: 'Entrada' | 'Salida';
+}
+
+export interface EventoPresencia {
+  poblacion: Poblacion;
+  email: string;
+  nombre: string;
+  apellido: string;
+  presente: boolean;
+  hora: string;
+}
+
+export interface EventosHandlers {
+  onRegistro?: (evento: EventoRegistro) => void;
+  onPresencia?: (evento: EventoPresencia) => void;
+  // Los eventos perdidos ya no están disponibles: recargar las listas completas
+  onReset?: () => void;
+}
+
+/**
+ * Escucha los eventos de registros y presencia.
+ * Retorna `conectado`; mientras sea false la pantalla puede seguir consultando
+ * periódicamente (por ejemplo, si el navegador no soporta EventSource).
+ */
+export function useEventos(handlers: EventosHandlers): boolean {
+  const [conectado, setConectado] = useState(false);
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+      return;
+    }
+
+    const source = new EventSource(API_ENDPOINTS.EVENTOS);
+
+    const parse = (event: MessageEvent) => {
+      try {
+        return JSON.parse(event.data);
+      } catch (e) {
+        console.warn('Evento SSE inválido:', e);
+        return null;
+      }
+    };
+
+    source.onopen = () => setConectado(true);
+    source.onerror = () => {
+      // EventSource reintenta automáticamente; sólo se informa el estado
+      setConectado(source.readyState === EventSource.OPEN);
+    };
+
+    source.addEventListener('registro', (event) => {
+      const datos = parse(event as MessageEvent);
+      if (datos) handlersRef.current.onRegistro?.(datos);
+    });
+    source.addEventListener('presencia', (event) => {
+      const datos = parse(event as MessageEvent);
+      if (datos) handlersRef.current.onPresencia?.(datos);
+    });
+    source.addEventListener('reset', () => {
+      handlersRef.current.onReset?.();
+    });
+
+    return () => {
+      source.close();
+      setConectado(false);
+    };
+  }, []);
+
+  return conectado;
+}
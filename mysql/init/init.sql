@@ -26,8 +26,9 @@ CREATE TABLE IF NOT EXISTS usuarios_estudiantes (
 );
 
 -- Tabla de registros de estudiantes
+-- Particionada por mes: la tarea de mantenimiento divide p_futuro en pAAAAMM
 CREATE TABLE IF NOT EXISTS EST_registros (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT NOT NULL,
     fecha DATE NOT NULL,
     hora TIME NOT NULL,
     dia VARCHAR(20),
@@ -37,9 +38,13 @@ CREATE TABLE IF NOT EXISTS EST_registros (
     tipo ENUM('Entrada', 'Salida') NOT NULL,
     auto_generado BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha),
     INDEX idx_email_fecha (email, fecha),
     INDEX idx_fecha_hora (fecha, hora),
     INDEX idx_tipo (tipo)
+)
+PARTITION BY RANGE (TO_DAYS(fecha)) (
+    PARTITION p_futuro VALUES LESS THAN MAXVALUE
 );
 
 -- Tabla de usuarios ayudantes (ejemplo)
@@ -55,9 +60,31 @@ CREATE TABLE IF NOT EXISTS usuarios_ayudantes (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- Ayudantes habilitados para entrar al laboratorio
+CREATE TABLE IF NOT EXISTS usuarios_permitidos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    TP VARCHAR(50) DEFAULT 'AYUDANTE',
+    activo BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bloques horarios asignados a cada ayudante
+CREATE TABLE IF NOT EXISTS horarios_asignados (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    dia VARCHAR(20) NOT NULL,
+    hora_entrada TIME NOT NULL,
+    hora_salida TIME NOT NULL,
+    INDEX idx_usuario (usuario_id)
+);
+
 -- Tabla de registros de ayudantes
+-- Particionada por mes: la tarea de mantenimiento divide p_futuro en pAAAAMM
 CREATE TABLE IF NOT EXISTS registros (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT NOT NULL,
     fecha DATE NOT NULL,
     hora TIME NOT NULL,
     dia VARCHAR(20),
@@ -67,9 +94,13 @@ CREATE TABLE IF NOT EXISTS registros (
     tipo ENUM('Entrada', 'Salida') NOT NULL,
     auto_generado BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha),
     INDEX idx_email_fecha (email, fecha),
     INDEX idx_fecha_hora (fecha, hora),
     INDEX idx_tipo (tipo)
+)
+PARTITION BY RANGE (TO_DAYS(fecha)) (
+    PARTITION p_futuro VALUES LESS THAN MAXVALUE
 );
 
 -- Estado de usuarios (entrada/salida)
@@ -84,6 +115,146 @@ CREATE TABLE IF NOT EXISTS estado_usuarios (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- Libro de horas acumuladas por usuario y día (se actualiza en cada Salida)
+CREATE TABLE IF NOT EXISTS horas_diarias (
+    email VARCHAR(100) NOT NULL,
+    fecha DATE NOT NULL,
+    segundos INT NOT NULL DEFAULT 0,
+    pares INT NOT NULL DEFAULT 0,
+    registros INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (email, fecha),
+    INDEX idx_fecha (fecha)
+);
+
+-- Cumplimiento materializado: una fila por bloque asignado y semana
+CREATE TABLE IF NOT EXISTS cumplimiento_semana (
+    semana_inicio DATE NOT NULL,
+    horario_id INT NOT NULL,
+    usuario_id INT NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    fecha DATE NULL,
+    bloque VARCHAR(60) NOT NULL,
+    hora_entrada TIME NOT NULL,
+    hora_salida TIME NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    razon VARCHAR(120) NULL,
+    cumplido BOOLEAN NOT NULL DEFAULT FALSE,
+    incompleto BOOLEAN NOT NULL DEFAULT FALSE,
+    entrada_id INT NULL,
+    salida_id INT NULL,
+    entradas INT NOT NULL DEFAULT 0,
+    salidas INT NOT NULL DEFAULT 0,
+    evaluado_at DATETIME NOT NULL,
+    PRIMARY KEY (semana_inicio, horario_id),
+    INDEX idx_semana_usuario (semana_inicio, usuario_id),
+    INDEX idx_estado_fecha (estado, fecha)
+);
+
+-- Historial de ejecuciones de tareas programadas (una fila por tarea y hora programada)
+CREATE TABLE IF NOT EXISTS tareas_ejecuciones (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tarea VARCHAR(50) NOT NULL,
+    programada DATETIME NOT NULL,
+    inicio DATETIME(3) NOT NULL,
+    fin DATETIME(3) NULL,
+    duracion_ms INT NULL,
+    estado VARCHAR(20) NOT NULL,
+    recuperada BOOLEAN NOT NULL DEFAULT FALSE,
+    worker VARCHAR(100) NOT NULL,
+    resultado TEXT NULL,
+    UNIQUE KEY uk_tarea_programada (tarea, programada),
+    INDEX idx_tarea_inicio (tarea, inicio)
+);
+
+-- Índice de presencia: personas dentro del laboratorio y contador por tipo
+CREATE TABLE IF NOT EXISTS presencia (
+    email VARCHAR(100) NOT NULL PRIMARY KEY,
+    tipo_usuario ENUM('AYUDANTE', 'ESTUDIANTE') NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    fecha DATE NOT NULL,
+    hora_entrada TIME NOT NULL,
+    INDEX idx_tipo_hora (tipo_usuario, hora_entrada)
+);
+
+CREATE TABLE IF NOT EXISTS presencia_contador (
+    tipo_usuario ENUM('AYUDANTE', 'ESTUDIANTE') NOT NULL PRIMARY KEY,
+    dentro INT NOT NULL DEFAULT 0,
+    reconciliado_at DATETIME NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO presencia_contador (tipo_usuario, dentro) VALUES
+('AYUDANTE', 0),
+('ESTUDIANTE', 0);
+
+-- Eventos difundidos por SSE (/api/eventos); el id es el Last-Event-ID
+CREATE TABLE IF NOT EXISTS eventos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(40) NOT NULL,
+    datos TEXT NOT NULL,
+    creado_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_creado (creado_at)
+);
+
+-- Último escaneo aceptado por email (antirrebote e idempotencia de /qr/validate y /lector/validar)
+CREATE TABLE IF NOT EXISTS escaneo_reciente (
+    email VARCHAR(100) NOT NULL PRIMARY KEY,
+    ultimo_at DATETIME(6) NOT NULL,
+    clave VARCHAR(191) NULL,
+    registro_id INT NULL,
+    tipo ENUM('Entrada', 'Salida') NULL
+);
+
+-- Semestres archivados de registros y EST_registros (utils/retencion.py)
+CREATE TABLE IF NOT EXISTS registros_archivo (
+    id INT NOT NULL,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    dia VARCHAR(20),
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    tipo ENUM('Entrada', 'Salida') NOT NULL,
+    auto_generado BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP NULL,
+    archivado_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha),
+    INDEX idx_email_fecha (email, fecha),
+    INDEX idx_fecha_hora (fecha, hora)
+) ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE IF NOT EXISTS EST_registros_archivo (
+    id INT NOT NULL,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    dia VARCHAR(20),
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    tipo ENUM('Entrada', 'Salida') NOT NULL,
+    auto_generado BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP NULL,
+    archivado_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha),
+    INDEX idx_email_fecha (email, fecha),
+    INDEX idx_fecha_hora (fecha, hora)
+) ROW_FORMAT=COMPRESSED;
+
+-- Historial completo (tabla viva + archivo) para reportes históricos
+CREATE OR REPLACE VIEW registros_historial AS
+SELECT id, fecha, hora, dia, nombre, apellido, email, tipo, auto_generado, created_at FROM registros
+UNION ALL
+SELECT a.id, a.fecha, a.hora, a.dia, a.nombre, a.apellido, a.email, a.tipo, a.auto_generado, a.created_at FROM registros_archivo a
+WHERE NOT EXISTS (SELECT 1 FROM registros t WHERE t.id = a.id AND t.fecha = a.fecha);
+
+CREATE OR REPLACE VIEW EST_registros_historial AS
+SELECT id, fecha, hora, dia, nombre, apellido, email, tipo, auto_generado, created_at FROM EST_registros
+UNION ALL
+SELECT a.id, a.fecha, a.hora, a.dia, a.nombre, a.apellido, a.email, a.tipo, a.auto_generado, a.created_at FROM EST_registros_archivo a
+WHERE NOT EXISTS (SELECT 1 FROM EST_registros t WHERE t.id = a.id AND t.fecha = a.fecha);
+
 -- Insertar datos de ejemplo para desarrollo
 INSERT IGNORE INTO usuarios_estudiantes (nombre, apellido, email, TP) VALUES
 ('Juan', 'Pérez', 'juan.perez@ejemplo.com', 'Ingeniería Informática'),